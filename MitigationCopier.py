@@ -1,58 +1,753 @@
 import sys
 import argparse
+import csv
 import logging
+import logging.handlers
 import json
 import datetime
 import os
+import bisect
+import hashlib
+import gzip
+import time
+import random
+import email.utils
+import zlib
+import threading
+import functools
+import itertools
+import contextlib
+import re
+import hmac
+import http.server
+import importlib.util
+import queue
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import anticrlf
-from veracode_api_py.api import VeracodeAPI as vapi, Applications, Findings, SCAApplications, Sandboxes
-from veracode_api_py.constants import Constants
+from urllib import parse
 from veracode_api_signing.credentials import get_credentials
+from veracode_api_signing.regions import get_region_for_api_credential
+from veracode_api_signing.utils import get_host_from_url
+from veracode_api_signing.veracode_hmac_auth import generate_veracode_hmac_header
+
+class LazyModule():
+    # a module imported by the first attribute read rather than here, so --help and library imports skip what a run
+    # never touches. Until then nothing is put in sys.modules, and then only by the ordinary import.
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+def lazy_import(name):
+    # a LazyModule for the module, or None if it is not installed
+    if importlib.util.find_spec(name) is None:
+        return None
+    return LazyModule(name)
+
+asyncio = lazy_import('asyncio')
+requests = lazy_import('requests')
+yaml = lazy_import('yaml') # optional, only needed for YAML manifests
+aiohttp = lazy_import('aiohttp') # optional, only needed for --asyncio
+yarl = lazy_import('yarl')
+
+@functools.lru_cache(maxsize=None)
+def veracode_constants():
+    # veracode_api_py imports all of its API modules, none of which this script uses, so it waits until needed
+    from veracode_api_py.constants import Constants
+    return Constants
 
 log = logging.getLogger(__name__)
+audit = logging.getLogger(__name__ + '.audit') # --audit_log events, one JSON object per line
+copy_prefix = contextvars.ContextVar('copy_prefix', default='') # per-copy prefix so interleaved --workers output stays attributable
+current_copy = contextvars.ContextVar('current_copy', default=None) # (to_app_guid, label) of the copy being run
+current_telemetry = contextvars.ContextVar('current_telemetry', default=None) # a MitigationCopier run's own RunTelemetry
+log_queue = queue.Queue() # log records waiting for the listener thread started by setup_logger()
+
+DETAIL = 15 # per-flaw messages: always in the log file, on the console with --verbosity detail
+logging.addLevelName(DETAIL, 'DETAIL')
+audit.setLevel(logging.CRITICAL + 1) # off until setup_logger() is given an --audit_log, or a library caller sets a level
+VERBOSITY_LEVELS = {'quiet': logging.WARNING, 'progress': logging.INFO, 'detail': DETAIL, 'debug': logging.DEBUG} # lowest level shown on the console
+CONSOLE = {'console': True} # marks records meant for the console as well as the log file
+PROGRESS_INTERVAL = 10 # seconds between progress lines for long loops
 
 ALLOWED_ACTIONS = ['COMMENT', 'FP', 'APPDESIGN', 'OSENV', 'NETENV', 'REJECTED', 'ACCEPTED', 'LIBRARY', 'ACCEPTRISK', 
                    'APPROVE', 'REJECT', 'BYENV', 'BYDESIGN', 'LEGAL', 'COMMERCIAL', 'EXPERIMENTAL', 'INTERNAL', 'APPROVED']
 
-class VeracodeApiCredentials():
-    api_key_id = None
-    api_key_secret = None
+LINE_NUMBER_SLOP = 3 # default --fuzzy_window: fuzzy matching looks this many lines either side of the target line
+
+PAGE_SIZE = 500 # largest page the findings and applications APIs return, fewer round trips than the default
+ANNOTATION_BATCH_SIZE = 100 # flaws or SCA issues per annotation call, keeps each request well under the API payload limits
+CACHE_TTL_HOURS = 6 # default --cache_ttl
+CACHE_MAX_SIZE_MB = 1024 # default --cache_max_mb
+CONNECTION_POOL_SIZE = 32 # keep-alive connections per credential set, enough for --workers plus the source fetches
+API_MAX_RETRIES = 5 # default --max_retries: attempts after the first for throttled calls and failed reads
+API_BACKOFF_SECONDS = 0.5 # first retry waits up to this long, doubling with each attempt
+API_BACKOFF_MAX_SECONDS = 30 # longest wait between two attempts, unless Retry-After asks for more
+MANIFEST_SCAN_LABELS = {'STATIC': 'SAST', 'DYNAMIC': 'DAST', 'vulnerability': 'SCA vulnerabilities', 'license': 'SCA licenses'}
+WATCH_POLL_SECONDS = 300 # default --poll_interval
+WATCH_COALESCE_SECONDS = 30 # default --coalesce
+DIRECTORY_BULK_NAMES = 5 # below this many application names, one search per name always beats counting the applications first
+ANNOTATION_QUEUE_SIZE = 64 # annotation calls --asyncio queues for its writers before matching waits for them to catch up
+SCA_TARGET_ANNOTATION_STATUSES = [None, 'PROPOSED'] # target SCA annotations read for the comparison: the default (approved) listing and the proposed ones
+
+class RequestThrottle():
+    # shared by every call made with one set of credentials. A token bucket caps the request rate (when
+    # rate > 0) and an AIMD window caps how many calls are in flight: halved when the platform answers 429,
+    # grown by one for each window of calls that are not throttled. Like TCP, the window is halved at most
+    # once per round trip: a 429 for a call started before the last cut does not cut it again.
+    # A Retry-After pauses every caller.
+    def __init__(self, rate=0, max_concurrency=CONNECTION_POOL_SIZE):
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.requests = 0
+        self.throttled = 0
+        self.retried = 0
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0 and self._in_flight < int(self.concurrency):
+                    if self.rate <= 0:
+                        break
+                    self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                    self._refilled_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    wait = (1 - self._tokens) / self.rate
+                self._condition.wait(timeout=wait if wait > 0 else None)
+            self._in_flight += 1
+            self.requests += 1
+            return now
+
+    def release(self, started, throttled=False, retry_after=None):
+        # started is the value acquire() returned for this call
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                if started > self._decreased_at:
+                    self.concurrency = max(1.0, self.concurrency / 2)
+                    self._decreased_at = now
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+            else:
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+            self._condition.notify_all()
 
-    def __init__(self, api_key_id, api_key_secret):
-        self.api_key_id = api_key_id
-        self.api_key_secret = api_key_secret
+    def count_retry(self):
+        with self._condition:
+            self.retried += 1
 
-    def run_with_credentials(self, to_run):
-        old_id = os.environ.get('veracode_api_key_id', "")
-        old_secret = os.environ.get('veracode_api_key_secret', "")
-        os.environ['veracode_api_key_id'] = self.api_key_id
-        os.environ['veracode_api_key_secret'] = self.api_key_secret
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (email.utils.parsedate_to_datetime(value) - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt):
+    # exponential backoff with jitter, so callers throttled together do not retry together
+    return random.uniform(0.5, 1.0) * min(API_BACKOFF_MAX_SECONDS, API_BACKOFF_SECONDS * 2 ** attempt)
+
+def next_attempt_delay(api, method, uri, attempt, started, status=None, size=0, retry_after=None, unsent=False):
+    # the retry decision shared by the API clients, made after each attempt at a call: records the attempt and
+    # releases its throttle slot, then returns how long to wait before trying again, or None when the call is over.
+    # status is None for a connection error, unsent True if that request never went out. Throttled calls and
+    # failed reads are tried again; a write only if it never reached the platform, as it may have been applied.
+    if status is None:
+        run_telemetry().record_http(method, uri, 'error', time.monotonic() - started, 0)
+        api.throttle.release(started)
+        if (method != 'GET' and not unsent) or attempt == api.max_retries:
+            return None
+        retry_after = None
+        reason = 'connection error'
+    else:
+        run_telemetry().record_http(method, uri, status, time.monotonic() - started, size)
+        throttled = status == 429
+        retry_after = parse_retry_after(retry_after) if throttled else None
+        api.throttle.release(started, throttled, retry_after)
+        if not (throttled or (method == 'GET' and status in (502, 503, 504))) or attempt == api.max_retries:
+            return None
+        reason = 'error code {}'.format(status)
+    delay = retry_after if retry_after is not None else backoff_delay(attempt)
+    api.throttle.count_retry()
+    log.debug('Retrying {} {} in {:.1f}s, {} received'.format(method, uri, delay, reason))
+    return delay
+
+def request_unsent(error):
+    # True when a request failed before any of it went out (connection refused, name lookup or connect timeout),
+    # so even a write can be sent again
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    import urllib3
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+def request_rejected(error):
+    # True when the platform refused a request outright with a 4xx (other than 429), so nothing in it was applied
+    response = getattr(error, 'response', None)
+    return response is not None and 400 <= response.status_code < 500 and response.status_code != 429
+
+def api_endpoint(uri):
+    # the URI with application and sandbox GUIDs taken out, so calls to the same endpoint are counted together
+    return re.sub(r'(applications|sandboxes)/[^/?]+', r'\1/{guid}', uri)
+
+class RunTelemetry():
+    # timings and counts for the whole run, for --summary_json and --metrics_file. Each copy (one target and
+    # scan type) records the seconds it spent fetching, indexing, matching and writing along with what happened
+    # to the target's flaws; each "from" result set records its own fetch and index time; and every API call
+    # is counted by endpoint, status, latency and bytes received. Copies that merge several "from" applications
+    # also list the flaws and SCA issues those applications mitigated differently. Copies are found through
+    # current_copy, which run_copy_task sets for the copy it runs.
+    PHASES = ('fetch', 'index', 'match', 'write')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.time()
+        self.copies = {} # (to_app_guid, label) -> {'seconds': {phase: seconds}, 'counts': {name: count}, ...}
+        self.sources = {} # source label -> {'seconds': {phase: seconds}, 'findings': count}
+        self.http = {} # (method, endpoint, status) -> {'calls', 'seconds', 'max_seconds', 'bytes'}
+
+    def start_copy(self, to_app_guid, label):
+        current_copy.set((to_app_guid, label))
+        with self._lock:
+            self.copies[(to_app_guid, label)] = {'to_app_guid': to_app_guid, 'label': label, 'result': None, 'total_seconds': 0.0,
+                                                 'seconds': dict.fromkeys(self.PHASES, 0.0), 'counts': {}, 'conflicts': []}
+
+    def finish_copy(self, result, seconds):
+        copy_key = current_copy.get()
+        current_copy.set(None)
+        with self._lock:
+            self.copies[copy_key].update({'result': 'failed' if result is None else 'ok', 'total_seconds': seconds})
+
+    def _entry(self, source):
+        # the record a phase or count belongs to: the named source, or else the copy being run
+        if source is not None:
+            return self.sources.setdefault(source, {'seconds': dict.fromkeys(('fetch', 'index'), 0.0), 'findings': 0})
+        return self.copies.get(current_copy.get())
+
+    def add_time(self, phase, seconds, source=None):
+        with self._lock:
+            entry = self._entry(source)
+            if entry is not None:
+                entry['seconds'][phase] = entry['seconds'].get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def timer(self, phase, source=None):
+        started = time.monotonic()
         try:
-            return to_run(None)
+            yield
         finally:
-            os.environ['veracode_api_key_id'] = old_id
-            os.environ['veracode_api_key_secret'] = old_secret
+            self.add_time(phase, time.monotonic() - started, source)
+
+    def timed_pages(self, pages, source=None, waited=None):
+        # passes pages through, counting the time spent waiting for each one as fetch time (also appended to waited)
+        pages = iter(pages)
+        while True:
+            started = time.monotonic()
+            page = next(pages, None)
+            self.add_time('fetch', time.monotonic() - started, source)
+            if waited is not None:
+                waited.append(time.monotonic() - started)
+            if page is None:
+                return
+            yield page
+
+    def add_counts(self, **counts):
+        with self._lock:
+            entry = self._entry(None)
+            if entry is not None:
+                for name, count in counts.items():
+                    entry['counts'][name] = entry['counts'].get(name, 0) + count
+
+    def add_conflict(self, **conflict):
+        with self._lock:
+            entry = self._entry(None)
+            if entry is not None:
+                entry['conflicts'].append(conflict)
+
+    def set_source_findings(self, source, count):
+        with self._lock:
+            self._entry(source)['findings'] = count
+
+    def record_http(self, method, uri, status, seconds, size):
+        key = (method, api_endpoint(uri), str(status))
+        with self._lock:
+            stats = self.http.setdefault(key, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0})
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['bytes'] += size
+
+    def summary(self):
+        with self._lock:
+            copies = [dict(copy, seconds=dict(copy['seconds']), counts=dict(copy['counts']), conflicts=list(copy['conflicts'])) for copy in self.copies.values()]
+            sources = [dict(source, source=label, seconds=dict(source['seconds'])) for label, source in self.sources.items()]
+            http = [dict(stats, method=method, endpoint=endpoint, status=status) for (method, endpoint, status), stats in self.http.items()]
+        totals = {'seconds': {phase: sum(entry['seconds'].get(phase, 0.0) for entry in copies + sources) for phase in self.PHASES},
+                  'api_calls': sum(stats['calls'] for stats in http), 'bytes_received': sum(stats['bytes'] for stats in http),
+                  'copies': len(copies), 'failed_copies': sum(1 for copy in copies if copy['result'] == 'failed'),
+                  'conflicts': sum(len(copy['conflicts']) for copy in copies)}
+        for copy in copies:
+            for name, count in copy['counts'].items():
+                totals[name] = totals.get(name, 0) + count
+        return {'started_at': datetime.datetime.fromtimestamp(self.started_at, datetime.timezone.utc).isoformat(),
+                'duration_seconds': time.time() - self.started_at, 'totals': totals, 'copies': copies, 'sources': sources, 'http': http}
+
+    def write_summary(self, summary_file):
+        write_file_atomically(summary_file, json.dumps(self.summary(), indent=2))
+
+    def write_metrics(self, metrics_file):
+        # Prometheus text format, for the node exporter's textfile collector
+        summary = self.summary()
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append('# HELP mitigation_copier_{} {}'.format(name, help_text))
+            lines.append('# TYPE mitigation_copier_{} {}'.format(name, metric_type))
+            for labels, value in samples:
+                label_text = ','.join('{}="{}"'.format(key, str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, label in labels.items())
+                lines.append('mitigation_copier_{}{} {}'.format(name, '{' + label_text + '}' if label_text else '', value))
+
+        metric('run_start_timestamp_seconds', 'gauge', 'When the run started', [({}, self.started_at)])
+        metric('run_duration_seconds', 'gauge', 'How long the run took', [({}, summary['duration_seconds'])])
+        metric('phase_seconds', 'gauge', 'Seconds spent in each phase, for each copy and "from" result set',
+               [({'to_app_guid': copy['to_app_guid'], 'copy': copy['label'], 'phase': phase}, seconds) for copy in summary['copies'] for phase, seconds in copy['seconds'].items()] +
+               [({'source': source['source'], 'phase': phase}, seconds) for source in summary['sources'] for phase, seconds in source['seconds'].items()])
+        metric('flaws', 'gauge', 'Target flaws by outcome, for each copy',
+               [({'to_app_guid': copy['to_app_guid'], 'copy': copy['label'], 'outcome': name}, count) for copy in summary['copies'] for name, count in copy['counts'].items()])
+        metric('conflicts', 'gauge', 'Target flaws and SCA issues that the merged "from" applications mitigated differently, for each copy',
+               [({'to_app_guid': copy['to_app_guid'], 'copy': copy['label']}, len(copy['conflicts'])) for copy in summary['copies']])
+        metric('copy_failed', 'gauge', '1 if the copy failed', [({'to_app_guid': copy['to_app_guid'], 'copy': copy['label']}, int(copy['result'] == 'failed')) for copy in summary['copies']])
+        http_labels = [({'method': stats['method'], 'endpoint': stats['endpoint'], 'status': stats['status']}, stats) for stats in summary['http']]
+        metric('http_requests_total', 'counter', 'API requests by endpoint and status', [(labels, stats['calls']) for labels, stats in http_labels])
+        metric('http_request_seconds_total', 'counter', 'Seconds spent waiting for API responses', [(labels, stats['seconds']) for labels, stats in http_labels])
+        metric('http_request_max_seconds', 'gauge', 'Slowest API response', [(labels, stats['max_seconds']) for labels, stats in http_labels])
+        metric('http_response_bytes_total', 'counter', 'Bytes received from the API', [(labels, stats['bytes']) for labels, stats in http_labels])
+        write_file_atomically(metrics_file, '\n'.join(lines) + '\n')
+
+    def log_phases(self):
+        seconds = self.summary()['totals']['seconds']
+        logprint('[*] Time spent: {}'.format(', '.join('{} {:.1f}s'.format(phase, seconds[phase]) for phase in self.PHASES)))
+
+def write_file_atomically(path, text):
+    # readers such as the textfile collector never see a half-written file
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+telemetry = RunTelemetry()
+
+def run_telemetry():
+    # the telemetry of the run in progress: the process-wide one for main(), or the one MitigationCopier.copy_many
+    # set for its own run
+    return current_telemetry.get() or telemetry
+
+class VeracodeApiClient():
+    # REST client bound to a single set of API credentials. Each instance signs with its own keys and
+    # keeps its own pooled keep-alive session, so "from" and "to" credentials can be used from any
+    # number of threads at once without touching os.environ. Every call goes through the instance's
+    # RequestThrottle; throttled calls and failed reads are retried with backoff, writes only on a 429
+    # since the platform has not applied them.
+    base_rest_url = None
+    session = None
+    max_retries = API_MAX_RETRIES
+    recorder = None # ApiFixtures saving each response, with --record_dir
+
+    def __init__(self, api_key_id, api_key_secret, pool_size=CONNECTION_POOL_SIZE, rate_limit=0, max_retries=API_MAX_RETRIES):
+        from veracode_api_signing.plugin_requests import RequestsAuthPluginVeracodeHMAC
+        self.base_rest_url = veracode_constants().REGIONS[get_region_for_api_credential(api_key_id)]['base_rest_url']
+        self.session = requests.Session()
+        self.session.auth = RequestsAuthPluginVeracodeHMAC(api_key_id=api_key_id, api_key_secret=api_key_secret)
+        self.session.headers.update({'User-Agent': 'MitigationCopier.py'})
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.directory = ApplicationDirectory(self, hashlib.sha1(api_key_id.encode('utf8')).hexdigest()[0:16])
+        self.throttle = RequestThrottle(rate=rate_limit, max_concurrency=pool_size)
+        self.max_retries = max_retries
+
+    def _rest_request(self, uri, method, params=None, body=None):
+        headers = {'Content-type': 'application/json'} if body is not None else None
+        for attempt in range(self.max_retries + 1):
+            started = self.throttle.acquire()
+            try:
+                response = self.session.request(method, self.base_rest_url + uri, params=params, data=body, headers=headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                delay = next_attempt_delay(self, method, uri, attempt, started, unsent=request_unsent(e))
+                if delay is None:
+                    raise
+            else:
+                delay = next_attempt_delay(self, method, uri, attempt, started, response.status_code, len(response.content),
+                                           response.headers.get('Retry-After'))
+                if delay is None:
+                    break
+            time.sleep(delay)
+        if not response.ok:
+            log.error('Error [{}]: {} for request {}'.format(response.status_code, response.text, response.request.url))
+            response.raise_for_status()
+        if self.recorder is not None:
+            self.recorder.record(method, response.request.path_url, response.status_code, response.text)
+        return response.json() if response.text != '' else ''
+
+    def _rest_paged_request(self, uri, element, params=None):
+        all_data = []
+        for page_data in self._rest_pages(uri, element, params=params):
+            all_data += page_data
+        return all_data
+
+    def _rest_pages(self, uri, element, params=None):
+        # yields one page of elements at a time, the next page is only requested once the caller asks for it
+        params = dict(params or {})
+        params['size'] = PAGE_SIZE
+        page = 0
+        total_pages = 1
+        while page < total_pages:
+            params['page'] = page
+            page_data = self._rest_request(uri, 'GET', params=params)
+            total_pages = page_data.get('page', {}).get('total_pages', 0)
+            yield page_data.get('_embedded', {}).get(element, [])
+            page += 1
+
+    def get_creds(self):
+        return self._rest_request('api/authn/v2/api_credentials', 'GET')
+
+    def get_application(self, guid=None, legacy_id=None):
+        if legacy_id is None:
+            return self._rest_request('appsec/v1/applications/{}'.format(guid), 'GET')
+        return self._rest_request('appsec/v1/applications', 'GET', params={'legacy_id': legacy_id})
+
+    def get_applications_by_name(self, app_name):
+        return self._rest_paged_request('appsec/v1/applications', 'applications', params={'name': parse.quote(app_name)})
+
+    def get_applications(self):
+        return self._rest_paged_request('appsec/v1/applications', 'applications')
+
+    def count_applications(self):
+        return self._rest_request('appsec/v1/applications', 'GET', params={'size': 1}).get('page', {}).get('total_elements', 0)
+
+    def get_sandboxes(self, app_guid):
+        return self._rest_paged_request('appsec/v1/applications/{}/sandboxes'.format(app_guid), 'sandboxes')
+
+    def get_findings(self, app_guid, scan_type='STATIC', annot='TRUE', sandbox_guid=None):
+        params = {'scan_type': scan_type, 'include_annot': annot}
+        if sandbox_guid is not None:
+            params['context'] = sandbox_guid
+        return self._rest_paged_request('appsec/v2/applications/{}/findings'.format(app_guid), 'findings', params=params)
+
+    def iter_findings(self, app_guid, scan_type='STATIC', annot='TRUE', sandbox_guid=None):
+        params = {'scan_type': scan_type, 'include_annot': annot}
+        if sandbox_guid is not None:
+            params['context'] = sandbox_guid
+        return self._rest_pages('appsec/v2/applications/{}/findings'.format(app_guid), 'findings', params=params)
+
+    def add_annotation(self, app_guid, flaw_id_list, comment, action, sandbox_guid=None):
+        params = {'context': sandbox_guid} if sandbox_guid is not None else None
+        annotation_def = {'comment': comment, 'action': action, 'issue_list': ','.join(str(flaw_id) for flaw_id in flaw_id_list)}
+        return self._rest_request('appsec/v2/applications/{}/annotations'.format(app_guid), 'POST', params=params, body=json.dumps(annotation_def))
+
+    def get_sca_annotations(self, app_guid, annotation_type, annotation_status=None):
+        params = {'annotation_type': annotation_type}
+        if annotation_status is not None:
+            params['annotation_status'] = annotation_status
+        return self._rest_request('srcclr/v3/applications/{}/sca_annotations'.format(app_guid), 'GET', params=params)
+
+    def add_sca_annotation(self, app_guid, action, comment, annotation_type, annotations):
+        # annotations is a list of {'component_id', 'cve_name'} or {'component_id', 'license_id'} dicts
+        if action not in veracode_constants().SCA_ANNOT_ACTION:
+            raise ValueError('{} is not in the list of valid actions ({})'.format(action, veracode_constants().SCA_ANNOT_ACTION))
+        payload = {'action': action, 'comment': comment, 'annotation_type': annotation_type, 'annotations': annotations}
+        return self._rest_request('srcclr/v3/applications/{}/sca_annotations'.format(app_guid), 'POST', body=json.dumps(payload))
+
+class ApplicationDirectory():
+    # application and sandbox lookups for one set of credentials, answered from memory once fetched:
+    # GUID -> name, name search -> candidates and app -> sandboxes. load_all() fetches every application
+    # in one paged request, after which name searches and GUID -> name need no calls at all. A snapshot
+    # file can carry all of this over to later runs while it is younger than its TTL.
+    api = None
+    snapshot_key = None
+
+    def __init__(self, api, snapshot_key):
+        self.api = api
+        self.snapshot_key = snapshot_key
+        self._lock = threading.Lock()
+        self._names = {} # app guid -> profile name
+        self._searches = {} # name searched for -> candidate guids
+        self._sandboxes = {} # app guid -> sandboxes
+        self._all_loaded = False
+        self._from_snapshot = False
+
+    def _remember(self, applications):
+        with self._lock:
+            for app in applications:
+                self._names[app['guid']] = app['profile']['name']
+
+    def _candidate(self, guid):
+        return {'guid': guid, 'profile': {'name': self._names[guid]}}
+
+    def load_all(self):
+        if not self._all_loaded:
+            self._remember(self.api.get_applications())
+            self._all_loaded = True
+
+    def prefetch(self, app_names):
+        # about to look up app_names: loads every application instead when that takes fewer calls than a search
+        # for each name not searched for yet, i.e. when the application list has fewer pages than there are names
+        app_names = {name for name in app_names if name not in self._searches}
+        if self._all_loaded or len(app_names) < DIRECTORY_BULK_NAMES:
+            return
+        pages = -(-self.api.count_applications() // PAGE_SIZE)
+        if pages < len(app_names):
+            self.load_all()
+
+    def find_applications(self, app_name):
+        # same candidates as the applications API name search, which matches on part of the name
+        if self._all_loaded:
+            with self._lock:
+                candidates = [self._candidate(guid) for guid, name in self._names.items() if app_name.lower() in name.lower()]
+            # an application created since the snapshot was taken is only found by searching
+            if candidates or not self._from_snapshot:
+                return candidates
+        if app_name not in self._searches:
+            candidates = self.api.get_applications_by_name(app_name)
+            self._remember(candidates)
+            self._searches[app_name] = [app['guid'] for app in candidates]
+        return [self._candidate(guid) for guid in self._searches[app_name]]
+
+    def get_name(self, guid):
+        if guid not in self._names:
+            self._remember([self.api.get_application(guid)])
+        return self._names[guid]
+
+    def get_sandboxes(self, app_guid):
+        if app_guid not in self._sandboxes:
+            sandboxes = [{'guid': sandbox['guid'], 'name': sandbox['name']} for sandbox in self.api.get_sandboxes(app_guid)]
+            with self._lock:
+                self._sandboxes[app_guid] = sandboxes
+        return self._sandboxes[app_guid]
+
+    def load_snapshot(self, snapshot_file, ttl_hours=CACHE_TTL_HOURS):
+        try:
+            with open(snapshot_file, encoding='utf8') as f:
+                entry = json.load(f).get(self.snapshot_key)
+        except (OSError, ValueError):
+            return
+        if entry is None or time.time() - entry['stored_at'] > ttl_hours * 3600:
+            return
+        with self._lock:
+            self._names.update(entry['names'])
+            self._sandboxes.update(entry['sandboxes'])
+            self._all_loaded = self._all_loaded or entry['all_loaded']
+            self._from_snapshot = True
+        log.info('Using application directory snapshot from {}'.format(snapshot_file))
+
+    def save_snapshot(self, snapshot_file):
+        # other credentials' sections of the file are kept
+        try:
+            with open(snapshot_file, encoding='utf8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            snapshot = {}
+        with self._lock:
+            snapshot[self.snapshot_key] = {'stored_at': time.time(), 'all_loaded': self._all_loaded,
+                                           'names': dict(self._names), 'sandboxes': dict(self._sandboxes)}
+        temp_path = snapshot_file + '.tmp'
+        with open(temp_path, 'w', encoding='utf8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(temp_path, snapshot_file)
 
+class VeracodeApiCredentials():
+    api_key_id = None
+    api_key_secret = None
+    api = None
 
-def setup_logger():
+    def __init__(self, api_key_id, api_key_secret, rate_limit=0, max_retries=API_MAX_RETRIES, api=None):
+        # api: an existing VeracodeApiClient to use, e.g. one already pointed at another base_rest_url
+        self.api_key_id = api_key_id
+        self.api_key_secret = api_key_secret
+        self.api = api or VeracodeApiClient(api_key_id, api_key_secret, rate_limit=rate_limit, max_retries=max_retries)
+
+class AsyncVeracodeApiClient():
+    # asyncio counterpart of VeracodeApiClient used by --asyncio: the same calls, signed the same way, over
+    # one pooled aiohttp session. It shares the RequestThrottle of the credentials' VeracodeApiClient, retries
+    # the same calls in the same way and raises the same requests exceptions, so callers handle both alike.
+    # The pages of a paged call after the first are all requested at once.
+    base_rest_url = None
+    max_retries = API_MAX_RETRIES
+
+    def __init__(self, credentials):
+        api = credentials.api
+        self.base_rest_url = api.base_rest_url
+        self.throttle = api.throttle
+        self.max_retries = api.max_retries
+        self.recorder = api.recorder
+        self._api_key_id = credentials.api_key_id
+        self._api_key_secret = credentials.api_key_secret
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.throttle.max_concurrency),
+                                              headers={'User-Agent': 'MitigationCopier.py'})
+        # RequestThrottle.acquire() blocks, so callers wait for it here rather than on the event loop
+        self._acquirer = ThreadPoolExecutor(max_workers=self.throttle.max_concurrency, thread_name_prefix='throttle')
+
+    async def close(self):
+        await self._session.close()
+        self._acquirer.shutdown()
+
+    def _signed_request(self, method, uri, params=None, body=None):
+        url = self.base_rest_url + uri
+        if params:
+            url += '?' + parse.urlencode(params)
+        parsed = parse.urlparse(url)
+        path = parsed.path + ('?' + parsed.query if parsed.query else '')
+        headers = {'Authorization': generate_veracode_hmac_header(get_host_from_url(url), path, method, self._api_key_id, self._api_key_secret)}
+        if body is not None:
+            headers['Content-type'] = 'application/json'
+        # the URL is already encoded exactly as it was signed
+        return self._session.request(method, yarl.URL(url, encoded=True), data=body, headers=headers), url
+
+    async def _rest_request(self, uri, method, params=None, body=None):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            started = await loop.run_in_executor(self._acquirer, self.throttle.acquire)
+            request, url = self._signed_request(method, uri, params, body)
+            try:
+                async with request as response:
+                    status = response.status
+                    size = len(await response.read())
+                    text = await response.text()
+                    retry_after_header = response.headers.get('Retry-After')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = next_attempt_delay(self, method, uri, attempt, started, unsent=isinstance(e, aiohttp.ClientConnectorError))
+                if delay is None:
+                    raise requests.exceptions.ConnectionError('{} {} failed: {}'.format(method, url, e)) from e
+            else:
+                delay = next_attempt_delay(self, method, uri, attempt, started, status, size, retry_after_header)
+                if delay is None:
+                    break
+            await asyncio.sleep(delay)
+        if status >= 400:
+            log.error('Error [{}]: {} for request {}'.format(status, text, url))
+            error_response = requests.Response() # for request_rejected(), as raise_for_status() would give
+            error_response.status_code = status
+            error_response.url = url
+            raise requests.exceptions.HTTPError('{} Error for url: {}'.format(status, url), response=error_response)
+        if self.recorder is not None:
+            parsed = parse.urlsplit(url)
+            self.recorder.record(method, parsed.path + ('?' + parsed.query if parsed.query else ''), status, text)
+        return json.loads(text) if text != '' else ''
+
+    async def _rest_paged_request(self, uri, element, params=None):
+        params = dict(params or {})
+        params['size'] = PAGE_SIZE
+        first_page = await self._rest_request(uri, 'GET', params=dict(params, page=0))
+        total_pages = first_page.get('page', {}).get('total_pages', 0)
+        pages = [first_page] + list(await asyncio.gather(*(self._rest_request(uri, 'GET', params=dict(params, page=page)) for page in range(1, total_pages))))
+        return [item for page_data in pages for item in page_data.get('_embedded', {}).get(element, [])]
+
+    async def get_application(self, guid):
+        return await self._rest_request('appsec/v1/applications/{}'.format(guid), 'GET')
+
+    async def get_findings(self, app_guid, scan_type='STATIC', annot='TRUE', sandbox_guid=None):
+        params = {'scan_type': scan_type, 'include_annot': annot}
+        if sandbox_guid is not None:
+            params['context'] = sandbox_guid
+        return await self._rest_paged_request('appsec/v2/applications/{}/findings'.format(app_guid), 'findings', params=params)
+
+    async def add_annotation(self, app_guid, flaw_id_list, comment, action, sandbox_guid=None):
+        params = {'context': sandbox_guid} if sandbox_guid is not None else None
+        annotation_def = {'comment': comment, 'action': action, 'issue_list': ','.join(str(flaw_id) for flaw_id in flaw_id_list)}
+        return await self._rest_request('appsec/v2/applications/{}/annotations'.format(app_guid), 'POST', params=params, body=json.dumps(annotation_def))
+
+    async def get_sca_annotations(self, app_guid, annotation_type, annotation_status=None):
+        params = {'annotation_type': annotation_type}
+        if annotation_status is not None:
+            params['annotation_status'] = annotation_status
+        return await self._rest_request('srcclr/v3/applications/{}/sca_annotations'.format(app_guid), 'GET', params=params)
+
+    async def add_sca_annotation(self, app_guid, action, comment, annotation_type, annotations):
+        if action not in veracode_constants().SCA_ANNOT_ACTION:
+            raise ValueError('{} is not in the list of valid actions ({})'.format(action, veracode_constants().SCA_ANNOT_ACTION))
+        payload = {'action': action, 'comment': comment, 'annotation_type': annotation_type, 'annotations': annotations}
+        return await self._rest_request('srcclr/v3/applications/{}/sca_annotations'.format(app_guid), 'POST', body=json.dumps(payload))
+
+
+class AuditFormatter(logging.Formatter):
+    # --audit_log lines; json.dumps escapes CR and LF, so a line is always one record
+    def format(self, record):
+        return json.dumps(dict(time=datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(), **record.audit), separators=(',', ':'))
+
+def is_audit_record(record):
+    return record.name == audit.name
+
+def setup_logger(verbosity='progress', audit_log=None):
+    # records are queued and written by a listener thread, so logging never waits on the console or the disk.
+    # Returns the listener; stopping it writes out whatever is still queued.
     handler = logging.FileHandler('MitigationCopier.log', encoding='utf8')
-    handler.setFormatter(anticrlf.LogFormatter('%(asctime)s - %(levelname)s - %(funcName)s - %(message)s'))
-    log = logging.getLogger(__name__)
-    log.addHandler(handler)
-    log.setLevel(logging.INFO)
-
-def creds_expire_days_warning():
-    creds = vapi().get_creds()
+    handler.setFormatter(anticrlf.LogFormatter('%(asctime)s - %(levelname)s - %(threadName)s - %(funcName)s - %(message)s'))
+    handler.setLevel(min(DETAIL, VERBOSITY_LEVELS[verbosity]))
+    handler.addFilter(lambda record: not is_audit_record(record))
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(anticrlf.LogFormatter('%(message)s'))
+    console.setLevel(VERBOSITY_LEVELS[verbosity])
+    # the console shows logprint() messages; --verbosity debug shows everything
+    console.addFilter(lambda record: not is_audit_record(record) and (getattr(record, 'console', False) or verbosity == 'debug'))
+    handlers = [handler, console]
+    if audit_log:
+        audit_handler = logging.FileHandler(audit_log, encoding='utf8')
+        audit_handler.setFormatter(AuditFormatter())
+        audit_handler.addFilter(is_audit_record)
+        handlers.append(audit_handler)
+    audit.setLevel(logging.INFO if audit_log else logging.CRITICAL + 1)
+    log.handlers = [logging.handlers.QueueHandler(log_queue)]
+    log.setLevel(handler.level)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def flush_log():
+    # waits until the listener has written every queued record, e.g. before prompting on the console
+    if any(isinstance(handler, logging.handlers.QueueHandler) for handler in log.handlers):
+        log_queue.join()
+
+def creds_expire_days_warning(api):
+    creds = api.get_creds()
     exp = datetime.datetime.strptime(creds['expiration_ts'], "%Y-%m-%dT%H:%M:%S.%f%z")
     delta = exp - datetime.datetime.now().astimezone() #we get a datetime with timezone...
     if (delta.days < 7):
-        print('These API credentials expire ', creds['expiration_ts'])
+        logprint('These API credentials expire {}'.format(creds['expiration_ts']), logging.WARNING)
 
-def prompt_for_app(prompt_text):
+def prompt_for_app(api, prompt_text):
     appguid = ""
+    flush_log()
     app_name_search = input(prompt_text)
-    app_candidates = Applications().get_by_name(app_name_search)
+    app_candidates = api.get_applications_by_name(app_name_search)
     if len(app_candidates) == 0:
         print("No matches were found!")
     elif len(app_candidates) > 1:
@@ -70,28 +765,263 @@ def prompt_for_app(prompt_text):
 
     return appguid
 
-def get_app_guid_from_legacy_id(app_id):
-    app = Applications().get(legacy_id=app_id)
+def get_app_guid_from_legacy_id(api, app_id):
+    app = api.get_application(legacy_id=app_id)
     if app is None:
         return
     return app['_embedded']['applications'][0]['guid']
 
-def get_application_name(guid):
-    app = Applications().get(guid)
-    return app['profile']['name']
+def get_application_name(api, guid):
+    return api.directory.get_name(guid)
+
+def get_last_scan_date(api, app_guid):
+    app = api.get_application(app_guid)
+    return app.get('last_completed_scan_date')
+
+def get_findings_by_type(api, app_guid, scan_type='STATIC', sandbox_guid=None, cache=None):
+    if sandbox_guid is not None:
+        cache = None # sandbox scans do not move the application's last scan date, so a cached sandbox could not be seen to be stale
+    if cache is not None:
+        cache_key = (app_guid, sandbox_guid, scan_type, 'TRUE')
+        last_scan_date = get_last_scan_date(api, app_guid)
+        findings = cache.get(cache_key, last_scan_date)
+        if findings is not None:
+            return findings
 
-def get_findings_by_type(app_guid, scan_type='STATIC', sandbox_guid=None):
     findings = []
     if scan_type == 'STATIC':
-        findings = Findings().get_findings(app_guid,scantype=scan_type,annot='TRUE',sandbox=sandbox_guid)
+        findings = api.get_findings(app_guid,scan_type=scan_type,annot='TRUE',sandbox_guid=sandbox_guid)
     elif scan_type == 'DYNAMIC':
-        findings = Findings().get_findings(app_guid,scantype=scan_type,annot='TRUE')
+        findings = api.get_findings(app_guid,scan_type=scan_type,annot='TRUE')
 
+    if cache is not None:
+        cache.put(cache_key, last_scan_date, findings)
     return findings
 
-def logprint(log_msg):
-    log.info(log_msg)
-    print(log_msg)
+def iter_findings_by_type(api, app_guid, scan_type='STATIC', sandbox_guid=None):
+    # same findings as get_findings_by_type, one page at a time and without the cache
+    if scan_type == 'STATIC':
+        return api.iter_findings(app_guid,scan_type=scan_type,annot='TRUE',sandbox_guid=sandbox_guid)
+    elif scan_type == 'DYNAMIC':
+        return api.iter_findings(app_guid,scan_type=scan_type,annot='TRUE')
+    return iter([])
+
+class FindingsCache():
+    # Opt-in on-disk cache of "from" result sets, so several invocations that copy from the same
+    # profile download it once. Entries are gzip-compressed JSON keyed by (app_guid, sandbox_guid,
+    # scan_type, annot). An entry is stale once it is older than the TTL or the application has
+    # completed a scan since it was stored; the least recently used entries are evicted to stay
+    # under the size cap. Sandbox result sets are not cached, since sandbox scans leave the
+    # application's last scan date as it was.
+    cache_dir = None
+    ttl_seconds = 0
+    max_size_bytes = 0
+
+    def __init__(self, cache_dir, ttl_hours=CACHE_TTL_HOURS, max_size_mb=CACHE_MAX_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(json.dumps(key).encode('utf8')).hexdigest() + '.json.gz')
+
+    def get(self, key, freshness):
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != list(key) or entry.get('freshness') != freshness or time.time() - entry.get('stored_at', 0) > self.ttl_seconds:
+            log.info('Cache entry for {} is stale'.format(key))
+            return None
+        try:
+            os.utime(path) # mark as recently used
+        except OSError:
+            pass # evicted by another run since it was read
+        log.info('Using cached findings for {}'.format(key))
+        return entry['data']
+
+    def put(self, key, freshness, data):
+        path = self._path(key)
+        temp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+        with gzip.open(temp_path, 'wt', encoding='utf8') as f:
+            json.dump({'key': list(key), 'freshness': freshness, 'stored_at': time.time(), 'data': data}, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json.gz'):
+                    try:
+                        stat = os.stat(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        continue # removed by another run
+                    entries.append((stat.st_mtime, stat.st_size, name))
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total_size <= self.max_size_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+                total_size -= size
+
+class ApiFixtures():
+    # API responses saved by --record_dir and served back by --replay_dir, one gzip-compressed JSON file
+    # per request, keyed by method, path and query parameters (in any order). Only successful reads are
+    # recorded. Recorded responses are sanitized: names, comments, user names and other free text become
+    # pseudonyms, and file paths, procedures and URLs are pseudonymized one segment at a time, so a value
+    # always maps to the same pseudonym and findings still match one another. GUIDs, IDs, CWEs, line numbers,
+    # statuses and dates are kept. Pseudonyms are keyed with the recording credentials' secret, so they
+    # cannot be reversed by guessing. Query values that name things (e.g. an application name search) get
+    # the same pseudonyms before they key the fixture, so a replay searches for the names its responses hold.
+    SANITIZED_TEXT = {'name', 'comment', 'user_name', 'description', 'email', 'business_unit', 'business_owners', 'teams',
+                      'tags', 'custom_fields', 'policies', 'api_id', 'username', 'first_name', 'last_name'}
+    SANITIZED_PATHS = {'file_path', 'file_name', 'filename', 'path', 'procedure', 'module', 'url', 'vulnerable_parameter'}
+    KEPT_SEGMENTS = {'', 'teamcity', 'buildagent', 'work'} # format_file_path() looks for these
+
+    def __init__(self, fixture_dir, sanitize_key=None):
+        self.fixture_dir = fixture_dir
+        self.sanitize_key = sanitize_key.encode('utf8') if sanitize_key else None
+        self.recorded = 0
+        self._lock = threading.Lock()
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    @staticmethod
+    def request_key(method, path, params):
+        return json.dumps([method, '/' + path.lstrip('/'), sorted([str(name), str(value)] for name, value in params)], separators=(',', ':'))
+
+    def _path(self, key):
+        return os.path.join(self.fixture_dir, hashlib.sha1(key.encode('utf8')).hexdigest() + '.json.gz')
+
+    def put(self, method, path, params, status, body):
+        # body is the decoded JSON response; params is a list of (name, value) pairs
+        key = self.request_key(method, path, params)
+        temp_path = '{}.{}.tmp'.format(self._path(key), threading.get_ident())
+        with gzip.open(temp_path, 'wt', encoding='utf8') as f:
+            json.dump({'status': status, 'body': body}, f, separators=(',', ':'))
+        os.replace(temp_path, self._path(key))
+
+    def record(self, method, path_url, status, text):
+        # path_url is the path and query string the request was sent to
+        if method != 'GET' or status >= 400 or text == '':
+            return
+        parsed = parse.urlsplit(path_url)
+        self.put(method, parsed.path, self.sanitize_params(parse.parse_qsl(parsed.query, keep_blank_values=True)), status, self.sanitize(json.loads(text)))
+        with self._lock:
+            self.recorded += 1
+
+    def response(self, method, path_url):
+        # returns (status, decoded body); writes are accepted and read requests without a fixture are not found
+        if method != 'GET':
+            return 200, None
+        parsed = parse.urlsplit(path_url)
+        key = self.request_key(method, parsed.path, parse.parse_qsl(parsed.query, keep_blank_values=True))
+        try:
+            with gzip.open(self._path(key), 'rt', encoding='utf8') as f:
+                fixture = json.load(f)
+        except OSError:
+            return 404, {'message': 'no fixture recorded for {}'.format(key)}
+        return fixture['status'], fixture['body']
+
+    def _pseudonym(self, value):
+        return 'x' + hmac.new(self.sanitize_key or b'', value.encode('utf8'), hashlib.sha256).hexdigest()[0:12]
+
+    def _sanitize_path(self, value):
+        segments = value.split('/')
+        kept_next = False
+        for index, segment in enumerate(segments):
+            if segment in self.KEPT_SEGMENTS or kept_next:
+                kept_next = segment == 'work' # the TeamCity build directory after it is kept too, format_file_path() skips it by length
+                continue
+            stem, dot, extension = segment.rpartition('.')
+            segments[index] = self._pseudonym(stem) + dot + extension if dot and stem else self._pseudonym(segment)
+        return '/'.join(segments)
+
+    def sanitize_params(self, params):
+        # get_app_by_name() quotes the name before requests encodes it again, so undo that before taking the pseudonym
+        return [(name, self._pseudonym(parse.unquote(value)) if name in self.SANITIZED_TEXT and value != '' else self.sanitize(value, name)) for name, value in params]
+
+    def sanitize(self, value, field=None, scrub=False):
+        if isinstance(value, dict):
+            return {key: self.sanitize(item, key, scrub or key in self.SANITIZED_TEXT) for key, item in value.items() if key != '_links'}
+        if isinstance(value, list):
+            return [self.sanitize(item, field, scrub) for item in value]
+        if isinstance(value, str) and value != '':
+            if field in self.SANITIZED_PATHS:
+                return self._sanitize_path(value)
+            if scrub:
+                return self._pseudonym(value)
+        return value
+
+class FixtureReplayServer():
+    # --replay_dir: a local HTTP server answering API requests from ApiFixtures, or from anything else with the
+    # same response(method, path_url) method. The clients are pointed at it in place of the platform, so runs
+    # go through the same HTTP, signing, throttling and retry code as usual.
+    def __init__(self, responses):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                status, body = responses.response(self.command, self.path)
+                payload = json.dumps(body).encode('utf8') if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                log.debug('Replay: ' + format % args)
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}/'.format(self._server.server_address[1])
+        threading.Thread(target=self._server.serve_forever, name='replay', daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def logprint(log_msg, level=logging.INFO):
+    # to the log file and, at the --verbosity level or above, the console
+    log.log(level, copy_prefix.get() + log_msg, extra=CONSOLE, stacklevel=2)
+
+def logdetail(log_msg):
+    # per-flaw messages, too many for the console unless --verbosity detail is set
+    log.log(DETAIL, copy_prefix.get() + log_msg, extra=CONSOLE, stacklevel=2)
+
+def audit_event(event, **fields):
+    # one --audit_log line per action taken on a flaw or SCA issue
+    if audit.isEnabledFor(logging.INFO):
+        copy_key = current_copy.get()
+        audit.info('', extra={'audit': dict(event=event, copy=copy_key[1] if copy_key else None, **fields)})
+
+class ProgressLog():
+    # sampled progress for long loops: at most one line every PROGRESS_INTERVAL seconds
+    def __init__(self, description, total):
+        self.description = description
+        self.total = total
+        self.done = 0
+        self._next_at = time.monotonic() + PROGRESS_INTERVAL
+
+    def update(self, count=1):
+        self.done += count
+        now = time.monotonic()
+        if now >= self._next_at:
+            self._next_at = now + PROGRESS_INTERVAL
+            logprint('{}: {} of {} ({:.0f}%)'.format(self.description, self.done, self.total, self.done * 100.0 / max(1, self.total)))
 
 def filter_approved(findings,id_list, skip_id_list):
     if skip_id_list is not None:
@@ -113,6 +1043,23 @@ def filter_proposed(findings,id_list, skip_id_list):
 
     return [f for f in findings if (f['finding_status']['resolution_status'] == 'PROPOSED')]
 
+def count_source_statuses(statuses, id_list, skip_id_list):
+    # filter_approved and filter_proposed for streamed "from" findings, of which only (issue id, resolution status)
+    # pairs are kept: returns how many approved and how many proposed findings those filters would keep
+    if skip_id_list is not None:
+        logprint('Skipping the following findings provided in skip_id_list: {}'.format(skip_id_list))
+        statuses = ((issue_id, status) for issue_id, status in statuses if issue_id not in skip_id_list)
+    elif id_list is not None:
+        logprint('Only copying the following findings provided in id_list: {}'.format(id_list))
+        statuses = ((issue_id, status) for issue_id, status in statuses if issue_id in id_list)
+    count_approved = count_proposed = 0
+    for _, status in statuses:
+        if status == 'APPROVED':
+            count_approved += 1
+        elif status == 'PROPOSED':
+            count_proposed += 1
+    return count_approved, count_proposed
+
 def format_file_path(file_path):
 
     # special case - omit prefix for teamcity work directories, which look like this:
@@ -133,31 +1080,205 @@ def format_file_path(file_path):
 
     return formatted_file_path
 
-def create_match_format_policy(app_guid, sandbox_guid, policy_findings, finding_type):
-    findings = []
-
-    if finding_type == 'STATIC':
-        thesefindings = [{'app_guid': app_guid,
-                'sandbox_guid': sandbox_guid,
-                'id': pf['issue_id'],
-                'resolution': pf['finding_status']['resolution'],
-                'cwe': pf['finding_details']['cwe']['id'],
-                'procedure': pf['finding_details'].get('procedure'),
-                'relative_location': pf['finding_details'].get('relative_location'),
-                'source_file': format_file_path(pf['finding_details'].get('file_path')),
-                'line': pf['finding_details'].get('file_line_number'),
-                'finding': pf} for pf in policy_findings]
-        findings.extend(thesefindings)
-    elif finding_type == 'DYNAMIC':
-        thesefindings = [{'app_guid': app_guid,
-                'id': pf['issue_id'],
-                'resolution': pf['finding_status']['resolution'],
-                'cwe': pf['finding_details']['cwe']['id'],
-                'path': pf['finding_details']['path'],
-                'vulnerable_parameter': pf['finding_details'].get('vulnerable_parameter',''), # vulnerable_parameter may not be populated for some info leak findings
-                'finding': pf} for pf in policy_findings]
-        findings.extend(thesefindings)
-    return findings
+interned_numbers = {} # numbers many findings share, e.g. relative_location; CPython only shares the small ones itself
+
+def intern_or_none(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if type(value) is int: # not bool, which would come back as 0 or 1
+        return interned_numbers.setdefault(value, value)
+    return value
+
+class MatchRecord():
+    # compact match form of a finding: only the match keys, the resolution status and
+    # the (action, comment, user_name) of each annotation are kept, with file paths, procedures, relative
+    # locations and dynamic paths interned since many findings share them. The API payload is not referenced.
+    __slots__ = ('id', 'cwe', 'resolution_status', 'procedure', 'relative_location', 'source_file', 'line',
+                 'path', 'vulnerable_parameter', 'annotations')
+
+    def __init__(self, finding, finding_type):
+        details = finding['finding_details']
+        self.id = finding['issue_id']
+        self.cwe = int(details['cwe']['id'])
+        self.resolution_status = finding['finding_status']['resolution_status']
+        self.procedure = self.relative_location = self.source_file = self.line = None
+        self.path = self.vulnerable_parameter = None
+        if finding_type == 'STATIC':
+            self.procedure = intern_or_none(details.get('procedure'))
+            self.relative_location = intern_or_none(details.get('relative_location'))
+            self.source_file = sys.intern(format_file_path(details.get('file_path')))
+            self.line = details.get('file_line_number')
+        elif finding_type == 'DYNAMIC':
+            self.path = intern_or_none(details['path'])
+            self.vulnerable_parameter = intern_or_none(details.get('vulnerable_parameter','')) # vulnerable_parameter may not be populated for some info leak findings
+        annotations = finding.get('annotations')
+        self.annotations = None if annotations is None else tuple((a['action'], a['comment'], a.get('user_name')) for a in annotations)
+
+class FindingsMatchIndex():
+    # index over the "from" findings, built once per source result set, that returns the same match as
+    # Findings().match without walking the whole source list for every target finding.
+    # Each bucket keeps source order, so the first candidate that passes the remaining checks is the
+    # same finding Findings().match would have returned. Fuzzy matches are the exception: they pick the
+    # closest line in the window rather than the first one in source order.
+    # findings_from can be any iterable (e.g. findings streamed page by page); each candidate is kept
+    # as a MatchRecord.
+    scan_type = None
+    potential_matches = None
+    source_statuses = None
+
+    def __init__(self, findings_from, scan_type, approved_matches_only=True, fuzzy_window=LINE_NUMBER_SLOP):
+        self.scan_type = scan_type
+        self.fuzzy_window = fuzzy_window
+        self._signature = None
+        self.source_statuses = {} # issue id -> resolution status of every "from" finding, matchable or not
+        self.potential_matches = []
+        for finding in findings_from:
+            status = sys.intern(finding['finding_status']['resolution_status'])
+            self.source_statuses[finding['issue_id']] = status
+            if approved_matches_only and status != 'APPROVED':
+                continue
+            self.potential_matches.append(MatchRecord(finding, scan_type))
+
+        self._by_cwe_line = {} # STATIC: (cwe, line) -> candidates, used for exact matches
+        self._by_cwe_location = {} # STATIC: (cwe, relative_location) -> candidates, used for nondebug matches
+        self._by_dynamic_key = {} # DYNAMIC: (cwe, path, vulnerable_parameter) -> first candidate
+        self._fuzzy_groups = {} # STATIC: cwe -> source_file -> (sorted lines, (line, issue id, candidate) sorted the same way)
+        self._fuzzy_files = {} # STATIC: (cwe, target source_file) -> fuzzy groups whose source_file is contained in it
+        self._fuzzy_file_lengths = {} # STATIC: cwe -> lengths of the source files in its fuzzy groups
+
+        for pf in self.potential_matches:
+            if scan_type == 'STATIC':
+                self._by_cwe_line.setdefault((pf.cwe, pf.line), []).append(pf)
+                self._by_cwe_location.setdefault((pf.cwe, pf.relative_location), []).append(pf)
+                if isinstance(pf.line, int):
+                    self._fuzzy_groups.setdefault(pf.cwe, {}).setdefault(pf.source_file, []).append((pf.line, pf.id, pf))
+            elif scan_type == 'DYNAMIC':
+                self._by_dynamic_key.setdefault((pf.cwe, pf.path, pf.vulnerable_parameter), pf)
+
+        for cwe, groups in self._fuzzy_groups.items():
+            for source_file, entries in groups.items():
+                entries.sort(key=lambda entry: (entry[0], entry[1]))
+                groups[source_file] = ([entry[0] for entry in entries], entries)
+            self._fuzzy_file_lengths[cwe] = sorted({len(source_file) for source_file in groups})
+
+    def __len__(self):
+        return len(self.potential_matches)
+
+    def signature(self):
+        # changes whenever a source finding that can be matched, or its annotation history, changes
+        if self._signature is None:
+            digest = hashlib.sha1()
+            for pf in sorted(self.potential_matches, key=lambda pf: pf.id):
+                digest.update(json.dumps([pf.id, pf.resolution_status, pf.annotations]).encode('utf8'))
+            self._signature = digest.hexdigest()
+        return self._signature
+
+    def match(self, origin_finding, allow_fuzzy_match=False):
+        # returns the MatchRecord of the "from" finding whose mitigations apply to origin_finding, or None
+        if self.scan_type not in ('STATIC', 'DYNAMIC'):
+            return None
+        return self.match_record(MatchRecord(origin_finding, self.scan_type), allow_fuzzy_match)
+
+    def match_record(self, origin, allow_fuzzy_match=False):
+        # match() for a target finding already in MatchRecord form
+        if self.scan_type == 'STATIC':
+            return self._match_static(origin, allow_fuzzy_match)
+        elif self.scan_type == 'DYNAMIC':
+            return self._by_dynamic_key.get((origin.cwe, origin.path, origin.vulnerable_parameter))
+
+    def _match_static(self, origin, allow_fuzzy_match):
+        match = None
+        if origin.source_file not in ('', None):
+            #attempt precise match first
+            match = self._first_in_file(origin, self._by_cwe_line.get((origin.cwe, origin.line), []))
+
+            if match is None and allow_fuzzy_match:
+                match = self._match_fuzzy(origin)
+
+        if match is None:
+            # fall to procedure and relative location as a last resort, or if we don't have source file info
+            match = self._match_nondebug(origin)
+
+        return match
+
+    def _first_in_file(self, origin, candidates):
+        # same containment check as Findings().match: the source path must appear within the target path
+        return next((pf for pf in candidates if origin.source_file.find(pf.source_file) > -1), None)
+
+    def _match_fuzzy(self, origin):
+        # bisect into each source file's sorted lines and take the closest line in the window,
+        # breaking ties on the lowest issue id so repeated runs always pick the same source flaw
+        if not isinstance(origin.line, int):
+            return None
+        best = None
+        low, high = origin.line - self.fuzzy_window, origin.line + self.fuzzy_window
+        for lines, entries in self._fuzzy_groups_for(origin.cwe, origin.source_file):
+            for i in range(bisect.bisect_left(lines, low), bisect.bisect_right(lines, high)):
+                line, issue_id, pf = entries[i]
+                rank = (abs(line - origin.line), issue_id)
+                if best is None or rank < best[0]:
+                    best = (rank, pf)
+        return best[1] if best else None
+
+    def _fuzzy_groups_for(self, cwe, target_file):
+        # source files are matched by containment in the target path, so look up (and remember)
+        # every source file for this cwe that appears within the target path. With many source files it is
+        # cheaper to look up each substring of the target path that is as long as one of them.
+        key = (cwe, target_file)
+        if key not in self._fuzzy_files:
+            groups = self._fuzzy_groups.get(cwe, {})
+            lengths = [length for length in self._fuzzy_file_lengths.get(cwe, []) if length <= len(target_file)]
+            if sum(len(target_file) - length + 1 for length in lengths) < len(groups):
+                substrings = {target_file[start:start + length] for length in lengths for start in range(len(target_file) - length + 1)}
+                self._fuzzy_files[key] = [groups[source_file] for source_file in substrings if source_file in groups]
+            else:
+                self._fuzzy_files[key] = [group for source_file, group in groups.items() if target_file.find(source_file) > -1]
+        return self._fuzzy_files[key]
+
+    def _match_nondebug(self, origin):
+        procedure = origin.procedure or ''
+        return next((pf for pf in self._by_cwe_location.get((origin.cwe, origin.relative_location), [])
+                     if procedure.find(pf.procedure or '') > -1), None)
+
+class MergedMatchIndex():
+    # the match indexes of several "from" result sets copied into the same targets, highest precedence first,
+    # queried as one. A target finding takes the match of the first source that has one; lower-precedence
+    # sources that match it with a different annotation history are reported as conflicts. A single source is
+    # wrapped the same way, so the matching loop does not tell the two apart.
+    def __init__(self, sources):
+        self.sources = sources # [(from_app_guid, from_sandbox_guid, FindingsMatchIndex)]
+        self.scan_type = sources[0][2].scan_type
+
+    def __len__(self):
+        return sum(len(index) for _, _, index in self.sources)
+
+    def source_statuses(self):
+        # (issue id, resolution status) of every "from" finding in every source
+        for _, _, index in self.sources:
+            yield from index.source_statuses.items()
+
+    def signature(self):
+        if len(self.sources) == 1:
+            return self.sources[0][2].signature() # the same as the unmerged index, so --incremental state carries over
+        return hashlib.sha1(':'.join(index.signature() for _, _, index in self.sources).encode('utf8')).hexdigest()
+
+    def match(self, origin_finding, allow_fuzzy_match=False):
+        # returns (source number, MatchRecord, [(source number, MatchRecord)] of conflicting matches), or None
+        origin = MatchRecord(origin_finding, self.scan_type)
+        best = None
+        for number, (_, _, index) in enumerate(self.sources):
+            match = index.match_record(origin, allow_fuzzy_match)
+            if match is None:
+                continue
+            if best is None:
+                best = (number, match, [])
+            elif annotation_history(match.annotations) != annotation_history(best[1].annotations):
+                best[2].append((number, match))
+        return best
+
+def annotation_history(annotations):
+    # the (action, comment) pairs of a MatchRecord's annotations, which decide whether two sources agree
+    return [annotation[0:2] for annotation in annotations or ()]
 
 def format_application_name(guid, app_name, sandbox_guid=None):
     if sandbox_guid is None:
@@ -166,222 +1287,1534 @@ def format_application_name(guid, app_name, sandbox_guid=None):
         formatted_name = 'sandbox {} in application {} (guid: {})'.format(sandbox_guid,app_name,guid)
     return formatted_name
 
-def submit_sca_mitigation(app_guid, action, comment, component_id, annotation_type, issue_id):
-    try:
-        if annotation_type == "vulnerability":
-            SCAApplications().add_annotation(app_guid=app_guid, action=action, comment=comment, annotation_type="VULNERABILITY",
-                                             component_id=component_id,cve_name=issue_id)
-        else:
-            SCAApplications().add_annotation(app_guid=app_guid, action=action, comment=comment, annotation_type="LICENSE",
-                                             component_id=component_id,license_id=issue_id)
-        logprint(f'Updated {annotation_type} mitigation information to {action} for component {component_id} and issue_id {issue_id} in application {app_guid}')
-        return True
-    except:
-        log.error(f'Unable to submit {annotation_type} mitigation information to {action} for component {component_id} and issue_id {issue_id} in application {app_guid}')
-    return False
-
-def update_sca_mitigation_info_rest(app_guid, action, comment, annotation_type, component_id, issue_id, propose_only):
+def sca_annotation_payload(annotation_type, issues):
+    # issues is a list of (component_id, issue_id) tuples; returns the annotation type and annotations to send
+    if annotation_type == "vulnerability":
+        return "VULNERABILITY", [{'component_id': component_id, 'cve_name': issue_id} for component_id, issue_id in issues]
+    return "LICENSE", [{'component_id': component_id, 'license_id': issue_id} for component_id, issue_id in issues]
+
+def submit_sca_mitigation(api, app_guid, action, comment, annotation_type, issues):
+    # issues is a list of (component_id, issue_id) tuples that all get the same action and comment; errors are left to the caller
+    payload_type, annotations = sca_annotation_payload(annotation_type, issues)
+    api.add_sca_annotation(app_guid=app_guid, action=action, comment=comment, annotation_type=payload_type, annotations=annotations)
+    logdetail(f'Updated {annotation_type} mitigation information to {action} for (component, issue_id) {issues} in application {app_guid}')
+    return True
+
+async def submit_sca_mitigation_async(api, app_guid, action, comment, annotation_type, issues):
+    # submit_sca_mitigation with an AsyncVeracodeApiClient
+    payload_type, annotations = sca_annotation_payload(annotation_type, issues)
+    await api.add_sca_annotation(app_guid=app_guid, action=action, comment=comment, annotation_type=payload_type, annotations=annotations)
+    logdetail(f'Updated {annotation_type} mitigation information to {action} for (component, issue_id) {issues} in application {app_guid}')
+    return True
+
+def check_sca_annotation(app_guid, action, comment, issues, propose_only):
+    # returns the comment to submit, or None when the annotation is not copied
     # validate length of comment argument, gracefully handle overage
     if len(comment) > 2048:
         comment = comment[0:2048]
 
     if not action in ALLOWED_ACTIONS:
-        log.warning(f'Cannot copy {action} mitigation for component {component_id} and issue_id {issue_id} in {app_guid}')
+        log.warning(f'Cannot copy {action} mitigation for (component, issue_id) {issues} in {app_guid}')
         return
     elif action == 'APPROVE':
         if propose_only:
-            log.warning(f'propose_only set to True; skipping applying approval for component {component_id} and issue_id {issue_id} in {app_guid}')
+            log.warning(f'propose_only set to True; skipping applying approval for (component, issue_id) {issues} in {app_guid}')
             return
-    
-    return submit_sca_mitigation(app_guid, action, comment, component_id, annotation_type, issue_id)
+    return comment
 
+def update_sca_mitigation_info_rest(api, app_guid, action, comment, annotation_type, issues, propose_only):
+    comment = check_sca_annotation(app_guid, action, comment, issues, propose_only)
+    if comment is None:
+        return
+    return submit_sca_mitigation(api, app_guid, action, comment, annotation_type, issues)
 
-def update_mitigation_info_rest(to_app_guid,flaw_id,action,comment,sandbox_guid=None, propose_only=False):
+def check_flaw_annotation(to_app_guid, flaw_id_list, action, comment, propose_only=False):
+    # returns the (action, comment) to submit, or None when the annotation is not copied
     # validate length of comment argument, gracefully handle overage
     if len(comment) > 2048:
         comment = comment[0:2048]
     if not action in ALLOWED_ACTIONS:
-        log.warning('Cannot copy {} mitigation for Flaw ID {} in {}'.format(action,flaw_id,to_app_guid))
+        log.warning('Cannot copy {} mitigation for Flaw ID {} in {}'.format(action,flaw_id_list,to_app_guid))
         return
     elif action == 'APPROVED':
         if propose_only:
-            logprint('propose_only set to True; skipping applying approval for flaw_id {}'.format(flaw_id))
+            logdetail('propose_only set to True; skipping applying approval for flaw_id {}'.format(flaw_id_list))
             return
-        action = Constants.ANNOT_TYPE[action]
-    flaw_id_list = [flaw_id]
-    if sandbox_guid==None:
-        Findings().add_annotation(to_app_guid,flaw_id_list,comment,action)
-    else:
-        Findings().add_annotation(to_app_guid,flaw_id_list,comment,action,sandbox=sandbox_guid)
-    logprint(
+        action = veracode_constants().ANNOT_TYPE[action]
+    return action, comment
+
+def update_mitigation_info_rest(api, to_app_guid,flaw_id_list,action,comment,sandbox_guid=None, propose_only=False):
+    annotation = check_flaw_annotation(to_app_guid, flaw_id_list, action, comment, propose_only)
+    if annotation is None:
+        return
+    action, comment = annotation
+    api.add_annotation(to_app_guid,flaw_id_list,comment,action,sandbox_guid=sandbox_guid)
+    logdetail(
         'Updated mitigation information to {} for Flaw ID {} in {}'.format(action, str(flaw_id_list), to_app_guid))
 
-def set_in_memory_flaw_to_approved(findings_to,to_id):
-    # use this function to update the status of target findings in memory, so that, if it is found
-    # as a match for multiple flaws, we only copy the mitigations once.
-    for finding in findings_to:
-        if all (k in finding for k in ("id", "finding")):
-            if (finding["id"] == to_id):
-                finding['finding']['finding_status']['resolution_status'] = 'APPROVED'
+async def update_mitigation_info_async(api, to_app_guid, flaw_id_list, action, comment, sandbox_guid=None, propose_only=False):
+    # update_mitigation_info_rest with an AsyncVeracodeApiClient
+    annotation = check_flaw_annotation(to_app_guid, flaw_id_list, action, comment, propose_only)
+    if annotation is None:
+        return
+    action, comment = annotation
+    await api.add_annotation(to_app_guid, flaw_id_list, comment, action, sandbox_guid=sandbox_guid)
+    logdetail('Updated mitigation information to {} for Flaw ID {} in {}'.format(action, str(flaw_id_list), to_app_guid))
+
+def is_copied_action(action, propose_only):
+    # mirrors the checks update_mitigation_info_rest and update_sca_mitigation_info_rest make before submitting
+    return action in ALLOWED_ACTIONS and not (propose_only and action in ('APPROVED', 'APPROVE'))
+
+class PendingAnnotations():
+    # Annotations collected while matching and submitted afterwards in as few calls as possible.
+    # Each flaw (or SCA component/issue) keeps its own history in order; the histories are sent in
+    # rounds, so round N holds the Nth annotation of every history, and within a round annotations
+    # with the same target, action and comment go out together in one call.
+    propose_only = False
+    _progress = None
+
+    def __init__(self, propose_only=False):
+        self.propose_only = propose_only
+        self._flaws = {} # (app_guid, sandbox_guid, flaw_id) -> [(action, comment)], oldest first
+        self._sca = {} # (app_guid, annotation_type, component_id, issue_id) -> [(action, comment)], oldest first
+        self._sources = {} # key -> where the history was copied from, for the plan file
+
+    def __len__(self):
+        return len(self._flaws) + len(self._sca)
+
+    def annotation_count(self):
+        return sum(len(history) for history in self._flaws.values()) + sum(len(history) for history in self._sca.values())
+
+    def add_flaw_annotation(self, app_guid, sandbox_guid, flaw_id, action, comment, source=None):
+        key = (app_guid, sandbox_guid, flaw_id)
+        self._flaws.setdefault(key, []).append((action, comment))
+        self._sources.setdefault(key, source)
+
+    def add_sca_annotation(self, app_guid, annotation_type, component_id, issue_id, action, comment, source=None):
+        key = (app_guid, annotation_type, component_id, issue_id)
+        self._sca.setdefault(key, []).append((action, comment))
+        self._sources.setdefault(key, source)
+
+    def add_plan_entry(self, entry):
+        source = {k: entry[k] for k in ('scan_type', 'source_app_guid', 'source_sandbox_guid', 'source_id') if k in entry}
+        if 'flaw_id' in entry:
+            self.add_flaw_annotation(entry['app_guid'], entry.get('sandbox_guid'), entry['flaw_id'], entry['action'], entry['comment'], source)
+        else:
+            self.add_sca_annotation(entry['app_guid'], entry['annotation_type'], entry['component_id'], entry['issue_id'], entry['action'], entry['comment'], source)
+
+    def plan_entries(self):
+        # one dict per annotation that would be submitted, in submission order for each flaw or SCA issue
+        for key, history in self._flaws.items():
+            for action, comment in history:
+                if self._is_copied(action):
+                    yield self._plan_entry({'app_guid': key[0], 'sandbox_guid': key[1], 'flaw_id': key[2]}, key, action, comment)
+        for key, history in self._sca.items():
+            for action, comment in history:
+                if self._is_copied(action):
+                    yield self._plan_entry({'app_guid': key[0], 'annotation_type': key[1], 'component_id': key[2], 'issue_id': key[3]}, key, action, comment)
+
+    def _plan_entry(self, entry, key, action, comment):
+        entry.update(self._sources.get(key) or {})
+        entry.update({'action': action, 'comment': comment[0:2048]})
+        return {k: v for k, v in entry.items() if v is not None}
+
+    def _is_copied(self, action):
+        return is_copied_action(action, self.propose_only)
+
+    def submit(self, api, journal=None):
+        # returns the keys whose history could not be fully applied; a failed key gets no further annotations.
+        # With a journal, annotations it already holds are skipped and each successful call is recorded.
+        failed = set()
+        self._progress = ProgressLog('Writing annotations', self.annotation_count())
+        self._submit_rounds('flaw', self._flaws, failed, journal, lambda group, keys: self._submit_flaw_group(api, group, keys))
+        self._submit_rounds('sca', self._sca, failed, journal, lambda group, keys: self._submit_sca_group(api, group, keys))
+        self._flaws = {}
+        self._sca = {}
+        return failed
+
+    def _submit_rounds(self, kind, histories, failed, journal, submit_group):
+        for annotation_round, chunks in self._round_chunks(kind, histories, failed, journal):
+            for group, chunk in chunks:
+                self._record_chunk(kind, annotation_round, group, chunk, submit_group(group, chunk), failed, journal)
+
+    def _round_chunks(self, kind, histories, failed, journal):
+        # yields (round, [(group, keys)]) for each round, the calls to make for it; keys that failed in an
+        # earlier round are left out, so failed must be up to date before the next round is asked for
+        for annotation_round in range(max((len(history) for history in histories.values()), default=0)):
+            groups = {}
+            for key, history in histories.items():
+                if annotation_round < len(history) and key not in failed:
+                    action, comment = history[annotation_round]
+                    if journal is not None and journal.is_applied(kind, key, annotation_round, action, comment):
+                        continue
+                    groups.setdefault(key[:2] + (action, comment), []).append(key)
+            yield annotation_round, [(group, keys[start:start + ANNOTATION_BATCH_SIZE])
+                                     for group, keys in groups.items() for start in range(0, len(keys), ANNOTATION_BATCH_SIZE)]
+
+    def _record_chunk(self, kind, annotation_round, group, chunk, chunk_failed, failed, journal):
+        # chunk_failed holds the keys of chunk that were not applied
+        failed.update(chunk_failed)
+        if journal is not None and len(chunk_failed) < len(chunk):
+            journal.record_applied(kind, [key for key in chunk if key not in chunk_failed], annotation_round, group[2], group[3])
+        self._progress.update(len(chunk))
+        if audit.isEnabledFor(logging.INFO):
+            for key in chunk:
+                event = 'failed' if key in chunk_failed else 'applied' if self._is_copied(group[2]) else 'not_copied'
+                if kind == 'flaw':
+                    audit_event(event, to_app_guid=key[0], to_sandbox_guid=key[1], flaw_id=key[2], action=group[2], comment=group[3], round=annotation_round)
+                else:
+                    audit_event(event, to_app_guid=key[0], annotation_type=key[1], component_id=key[2], issue_id=key[3], action=group[2], comment=group[3], round=annotation_round)
+
+    async def submit_async(self, writer, journal=None):
+        # submit() for --asyncio: the calls of a round are all queued on the AsyncAnnotationWriter at once, and
+        # the next round starts when they have completed, so each history is still applied in order
+        failed = set()
+        self._progress = ProgressLog('Writing annotations', self.annotation_count())
+        for kind, histories, send_group in (('flaw', self._flaws, self._send_flaw_group), ('sca', self._sca, self._send_sca_group)):
+            for annotation_round, chunks in self._round_chunks(kind, histories, failed, journal):
+                chunks_failed = await asyncio.gather(*(writer.send(functools.partial(send_group, writer.api, group, chunk)) for group, chunk in chunks))
+                for (group, chunk), chunk_failed in zip(chunks, chunks_failed):
+                    self._record_chunk(kind, annotation_round, group, chunk, chunk_failed, failed, journal)
+        self._flaws = {}
+        self._sca = {}
+        return failed
+
+    # Each of these makes one call and returns the keys it could not apply. A write is not sent twice: the API
+    # client already repeats the ones the platform throttled or never received, and any other failure may have
+    # been applied. The exception is a batch the platform rejected (a 4xx), which was not applied at all, so one
+    # bad flaw or issue does not fail the rest of its batch: each is sent again on its own.
+    async def _send_flaw_group(self, api, group, keys):
+        app_guid, sandbox_guid, action, comment = group
+        try:
+            await update_mitigation_info_async(api, app_guid, [key[2] for key in keys], action, comment, sandbox_guid, self.propose_only)
+            return set()
+        except requests.exceptions.RequestException as e:
+            log.exception('Unable to submit {} mitigation information for Flaw ID {} in {}'.format(action, [key[2] for key in keys], app_guid))
+            if len(keys) > 1 and request_rejected(e):
+                return set().union(*[await self._send_flaw_group(api, group, [key]) for key in keys])
+        return set(keys)
+
+    async def _send_sca_group(self, api, group, keys):
+        app_guid, annotation_type, action, comment = group
+        issues = [key[2:] for key in keys]
+        comment_to_send = check_sca_annotation(app_guid, action, comment, issues, self.propose_only)
+        if comment_to_send is None:
+            return set() # a skipped action (not allowed, or approval with propose_only) is not a failure
+        try:
+            await submit_sca_mitigation_async(api, app_guid, action, comment_to_send, annotation_type, issues)
+            return set()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.exception(f'Unable to submit {annotation_type} mitigation information to {action} for (component, issue_id) {issues} in application {app_guid}')
+            if len(keys) > 1 and request_rejected(e):
+                return set().union(*[await self._send_sca_group(api, group, [key]) for key in keys])
+        return set(keys)
+
+    def _submit_flaw_group(self, api, group, keys):
+        app_guid, sandbox_guid, action, comment = group
+        try:
+            update_mitigation_info_rest(api, app_guid, [key[2] for key in keys], action, comment, sandbox_guid, self.propose_only)
+            return set()
+        except requests.exceptions.RequestException as e:
+            log.exception('Unable to submit {} mitigation information for Flaw ID {} in {}'.format(action, [key[2] for key in keys], app_guid))
+            if len(keys) > 1 and request_rejected(e):
+                return set().union(*[self._submit_flaw_group(api, group, [key]) for key in keys])
+        return set(keys)
+
+    def _submit_sca_group(self, api, group, keys):
+        app_guid, annotation_type, action, comment = group
+        issues = [key[2:] for key in keys]
+        try:
+            update_sca_mitigation_info_rest(api, app_guid, action, comment, annotation_type, issues, self.propose_only)
+            return set()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.exception(f'Unable to submit {annotation_type} mitigation information to {action} for (component, issue_id) {issues} in application {app_guid}')
+            if len(keys) > 1 and request_rejected(e):
+                return set().union(*[self._submit_sca_group(api, group, [key]) for key in keys])
+        return set(keys)
+
+async def in_copy_context(context, coroutine):
+    # awaits coroutine as part of the copy that context (a contextvars.Context taken in another task) was running.
+    # The writer tasks outlive any one copy, so these values are set for every call, never left from the last one.
+    copy_prefix.set(context.get(copy_prefix, ''))
+    current_copy.set(context.get(current_copy))
+    current_telemetry.set(context.get(current_telemetry))
+    return await coroutine
+
+class AsyncAnnotationWriter():
+    # --asyncio: annotation calls are queued on a bounded asyncio queue and made by a fixed number of writer
+    # tasks. submit() is called from the matching threads, and blocks them until their annotations are written.
+    api = None
+
+    def __init__(self, api, loop, writers=CONNECTION_POOL_SIZE, queue_size=ANNOTATION_QUEUE_SIZE):
+        self.api = api
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._writers = [loop.create_task(self._write()) for _ in range(writers)]
+
+    def submit(self, pending, journal=None):
+        # same result as pending.submit(api, journal). The task runs in a copy of the calling thread's context, so its
+        # audit and progress records still name the copy.
+        return asyncio.run_coroutine_threadsafe(pending.submit_async(self, journal), self._loop).result()
+
+    async def send(self, send_call):
+        # send_call is a coroutine function making one annotation call; returns its result once a writer has made it
+        done = self._loop.create_future()
+        await self._queue.put((send_call, contextvars.copy_context(), done))
+        return await done
+
+    async def _write(self):
+        while True:
+            send_call, context, done = await self._queue.get()
+            try:
+                done.set_result(await in_copy_context(context, send_call()))
+            except Exception as e:
+                done.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def close(self):
+        for writer in self._writers:
+            writer.cancel()
+        await asyncio.gather(*self._writers, return_exceptions=True)
+
+class MitigationPlanWriter():
+    # writes the annotations a run would submit to a JSON Lines plan file instead of applying them
+    count = 0
+
+    def __init__(self, plan_file):
+        self._file = open(plan_file, 'w', encoding='utf8')
+        self._lock = threading.Lock()
+
+    def write(self, pending):
+        lines = [json.dumps(entry, separators=(',', ':')) + '\n' for entry in pending.plan_entries()]
+        with self._lock:
+            self._file.writelines(lines)
+            self.count += len(lines)
+
+    def close(self):
+        self._file.close()
+
+class MitigationJournal():
+    # Append-only JSON Lines journal of the annotations submitted successfully and the copy tasks that
+    # finished cleanly. With --resume a rerun skips both, so it only spends time on the work that is left.
+    def __init__(self, journal_file, resume=False):
+        self._applied = set()
+        self._targets_done = set()
+        self._lock = threading.Lock()
+        if resume and os.path.exists(journal_file):
+            with open(journal_file, encoding='utf8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # a line cut short when the previous run died
+                    if entry.get('type') == 'annotation':
+                        self._applied.add((entry['key'], entry['step'], entry['action'], entry['comment_hash']))
+                    elif entry.get('type') == 'target_done':
+                        self._targets_done.add(entry['key'])
+            logprint('Resuming from journal {}: {} annotations and {} completed targets will be skipped'.format(journal_file, len(self._applied), len(self._targets_done)))
+        self._file = open(journal_file, 'a' if resume else 'w', encoding='utf8')
+
+    def _annotation_key(self, kind, key):
+        return json.dumps([kind] + list(key), separators=(',', ':'))
+
+    def _comment_hash(self, comment):
+        return hashlib.sha1(comment.encode('utf8')).hexdigest()
+
+    def _target_key(self, from_app_guid, to_app_guid, to_sandbox_guid, scan_type):
+        return json.dumps([from_app_guid, to_app_guid, to_sandbox_guid, scan_type], separators=(',', ':'))
+
+    def _write(self, entries):
+        lines = [json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries]
+        with self._lock:
+            self._file.writelines(lines)
+            self._file.flush()
+
+    def is_applied(self, kind, key, step, action, comment):
+        return (self._annotation_key(kind, key), step, action, self._comment_hash(comment)) in self._applied
+
+    def record_applied(self, kind, keys, step, action, comment):
+        comment_hash = self._comment_hash(comment)
+        self._write({'type': 'annotation', 'key': self._annotation_key(kind, key), 'step': step, 'action': action, 'comment_hash': comment_hash} for key in keys)
+
+    def is_target_done(self, from_app_guid, to_app_guid, to_sandbox_guid, scan_type):
+        return self._target_key(from_app_guid, to_app_guid, to_sandbox_guid, scan_type) in self._targets_done
+
+    def record_target_done(self, from_app_guid, to_app_guid, to_sandbox_guid, scan_type):
+        self._write([{'type': 'target_done', 'key': self._target_key(from_app_guid, to_app_guid, to_sandbox_guid, scan_type)}])
+
+    def close(self):
+        self._file.close()
+
+def read_plan(plan_file, shard=None):
+    # shard is (index, count), 1-based, and splits the plan by target application so each flaw's
+    # history stays on one runner
+    with open(plan_file, encoding='utf8') as f:
+        for line in f:
+            if line.strip() == '':
+                continue
+            entry = json.loads(line)
+            if shard is None or zlib.crc32(entry['app_guid'].encode('utf8')) % shard[1] == shard[0] - 1:
+                yield entry
+
+def parse_shard(value):
+    # --apply_shard K/N as (K, N), or None unless 1 <= K <= N
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', value)
+    if match is None:
+        return None
+    index, count = int(match.group(1)), int(match.group(2))
+    return (index, count) if 1 <= index <= count else None
+
+def apply_plan(api, plan_file, workers=1, propose_only=False, shard=None, journal=None):
+    # submit a plan written by --plan; no findings are fetched or matched
+    pending_by_app = {}
+    for entry in read_plan(plan_file, shard):
+        pending_by_app.setdefault(entry['app_guid'], PendingAnnotations(propose_only)).add_plan_entry(entry)
+
+    def submit_pending(pending):
+        count = len(pending)
+        failed = pending.submit(api, journal)
+        if failed:
+            logprint('[*] Unable to apply the plan to {} flaws or SCA issues. See log file for details.'.format(len(failed)), logging.WARNING)
+        return count - len(failed)
+
+    logprint('Applying plan {} to {} applications'.format(plan_file, len(pending_by_app)))
+    copy_tasks = [(app_guid, 'plan', functools.partial(submit_pending, pending)) for app_guid, pending in pending_by_app.items()]
+    return run_copy_tasks(copy_tasks, workers=workers)
+
+def finding_fingerprint(finding):
+    # identifies a target finding by its details, so --incremental looks at it again when a scan changes them;
+    # the resolution status is left out so flaws we annotated are not picked up again on the next run
+    return hashlib.sha1(json.dumps([finding['issue_id'], finding.get('finding_details')],
+                                   sort_keys=True).encode('utf8')).hexdigest()[0:16]
+
+class IncrementalState():
+    # --incremental watermarks: for each (from app, from sandbox, to app, to sandbox, scan type), the
+    # "from" signature and target scan date seen by the last successful run, and fingerprints of the
+    # target findings it evaluated. A stored entry only counts while the "from" signature is unchanged.
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(state_file):
+            with open(state_file, encoding='utf8') as f:
+                self._entries = json.load(f)
+
+    def _key(self, key):
+        return json.dumps(key, separators=(',', ':'))
+
+    def get(self, key, source_signature):
+        with self._lock:
+            entry = self._entries.get(self._key(key))
+        if entry is None or entry['source_signature'] != source_signature:
+            return None
+        return entry
+
+    def update(self, key, source_signature, to_last_scan_date, fingerprints):
+        with self._lock:
+            previous = self._entries.get(self._key(key))
+            if previous is not None and previous['source_signature'] == source_signature:
+                fingerprints = set(fingerprints) | set(previous['fingerprints'])
+            self._entries[self._key(key)] = {'source_signature': source_signature, 'to_last_scan_date': to_last_scan_date,
+                                             'fingerprints': sorted(fingerprints)}
+
+    def save(self):
+        with self._lock:
+            temp_path = self.state_file + '.tmp'
+            with open(temp_path, 'w', encoding='utf8') as f:
+                json.dump(self._entries, f, separators=(',', ':'))
+            os.replace(temp_path, self.state_file)
+
+class TargetStatusIndex():
+    # issue id -> resolution status of one target's flaws, as the API reported them or as updated by this run.
+    # The SAST and DAST passes of a target share one index, so once mitigations are queued for a flaw it is
+    # treated as approved and never considered again, even when the passes run at the same time.
+    def __init__(self):
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def observe(self, finding):
+        # returns the flaw's status, preferring what this run has already set over the API's
+        with self._lock:
+            return self._statuses.setdefault(finding['issue_id'], finding['finding_status']['resolution_status'])
+
+    def claim(self, issue_id, status='APPROVED'):
+        # marks the flaw with status; False if it already had it, meaning another match got there first
+        with self._lock:
+            if self._statuses.get(issue_id) == status:
+                return False
+            self._statuses[issue_id] = status
+            return True
+
+def sca_issue_id(sca_finding, annotation_type):
+    if annotation_type == "license":
+        return sca_finding['license']['license_id']
+    return sca_finding['vulnerability']['cve_name']
+
+class TargetScaIndex():
+    # one target's SCA annotations of one type, (component_id, cve_name or license_id) -> [(action, comment)] oldest
+    # first, as the API reported them and extended with what this run has queued. Copies to the same target share
+    # one, so the target is read once and a history is never queued twice, even when the copies run at the same time.
+    def __init__(self):
+        self._histories = None
+        self._lock = threading.Lock()
+
+    def load(self, fetch_annotations, annotation_type):
+        # fetches the target's annotations on first use; returns how many SCA issues have annotations
+        with self._lock:
+            if self._histories is None:
+                self._histories = {}
+                for sca_finding in fetch_annotations():
+                    history = [(entry['annotation_action'], entry['comment']) for entry in reversed(sca_finding['history'])] # most recent first
+                    self._histories[(sca_finding['component']['id'], sca_issue_id(sca_finding, annotation_type))] = history
+            return len(self._histories)
+
+    def claim(self, key, history):
+        # returns the end of history (oldest first) the target does not have yet, and records it as queued: what follows
+        # the longest start of history that the target's annotations already hold, in order
+        with self._lock:
+            existing = iter(self._histories.setdefault(key, []))
+            present = 0
+            for annotation in history:
+                if annotation not in existing: # consumes existing up to the match, so order is kept
+                    break
+                present += 1
+            missing = history[present:]
+            self._histories[key].extend(missing)
+            return missing
+
+def merge_sca_findings(source_findings, annotation_type):
+    # [(source number, SCA finding, source numbers of conflicting histories)], each component and issue once: from the
+    # first list that has it, with the later lists whose history for it differs. source_findings is in precedence order.
+    merged = {}
+    for number, findings in enumerate(source_findings):
+        for sca_finding in findings:
+            key = (sca_finding['component']['id'], sca_issue_id(sca_finding, annotation_type))
+            if key not in merged:
+                merged[key] = (number, sca_finding, [])
+            elif sca_history(sca_finding) != sca_history(merged[key][1]):
+                merged[key][2].append(number)
+    return list(merged.values())
+
+def sca_history(sca_finding):
+    return [(action['annotation_action'], action['comment']) for action in sca_finding['history']]
 
 def match_sca(findings_from_approved, from_app_guid, to_app_guid, dry_run, annotation_type, propose_only, from_credentials, to_credentials, 
-              include_original_user=False, include_profile_name=False):
-    results_from_app_name = from_credentials.run_with_credentials(lambda _: get_application_name(from_app_guid))
-    formatted_from = format_application_name(from_app_guid,results_from_app_name)
+              include_original_user=False, include_profile_name=False, plan=None, journal=None, incremental=None, writer=None,
+              fetch_to=None, target_sca=None):
+    # only the part of each history the target does not already have is copied. fetch_to returns the target's
+    # annotations in place of fetching them here (--asyncio), and target_sca is shared by copies to the same target.
+    # With several "from" applications, from_app_guid is a tuple in precedence order and findings_from_approved
+    # holds a list of findings for each of them.
+    if journal is not None and journal.is_target_done(from_app_guid, to_app_guid, None, 'SCA ' + annotation_type):
+        logprint('SCA {} mitigations were already copied to application {} by a previous run; skipped.'.format(annotation_type, to_app_guid))
+        return 0
+
+    from_app_guids = source_app_guids(from_app_guid)
+    source_findings = findings_from_approved if isinstance(from_app_guid, tuple) else [findings_from_approved]
+    source_names = [format_application_name(app_guid, get_application_name(from_credentials.api, app_guid)) for app_guid in from_app_guids]
+    formatted_from = ' + '.join(source_names)
     logprint('Getting SCA findings for {}'.format(formatted_from))    
 
-    count_from = len(findings_from_approved)
+    count_from = sum(len(findings) for findings in source_findings)
     if count_from == 0:
         logprint('No approved findings in "from" {}. Exiting.'.format(formatted_from))
         return 0
     
     logprint('Found {} approved mitigations on SCA findings in {}'.format(count_from,formatted_from))
+
+    if incremental is not None:
+        # a successful copy only covers the components the target had then: a new target scan can bring in components
+        # (or drop annotations) the copy never saw, so the target's last scan date is part of the signature
+        incremental_key = [from_app_guid, None, to_app_guid, None, 'SCA ' + annotation_type]
+        to_last_scan_date = get_last_scan_date(to_credentials.api, to_app_guid)
+        source_signature = '{}:{}:{}:{}:{}'.format(hashlib.sha1(json.dumps(findings_from_approved, sort_keys=True).encode('utf8')).hexdigest(),
+                                                   include_original_user, include_profile_name, propose_only, to_last_scan_date)
+        if incremental.get(incremental_key, source_signature) is not None:
+            logprint('No change in {} SCA mitigations in "from" {} and no new scan in the target since the last run; skipped.'.format(annotation_type, formatted_from))
+            return 0
     
-    results_to_app_name = to_credentials.run_with_credentials(lambda _: get_application_name(to_app_guid))
+    results_to_app_name = get_application_name(to_credentials.api, to_app_guid)
     formatted_to = format_application_name(to_app_guid,results_to_app_name)
 
-    counter = 0
+    if target_sca is None:
+        target_sca = TargetScaIndex()
+    logprint('Getting SCA {} annotations for {}'.format(annotation_type, formatted_to))
+    with run_telemetry().timer('fetch'):
+        count_to = target_sca.load(fetch_to or functools.partial(get_sca_target_annotations, to_credentials.api, to_app_guid, annotation_type), annotation_type)
+    logprint('Found {} SCA {} annotations in "to" {}'.format(count_to, annotation_type, formatted_to))
+
+    count_matched = 0
+    count_skipped = 0
+    count_updated = 0
+    count_conflicts = 0
+    pending = PendingAnnotations(propose_only)
     
-    for sca_finding in findings_from_approved:
+    for number, sca_finding, conflicts in merge_sca_findings(source_findings, annotation_type):
         component_file_name = sca_finding['component']['filename']
         component_id = sca_finding['component']['id']
-        if annotation_type == "license":
-            issue_id = sca_finding['license']['license_id']
-        else:
-            issue_id = sca_finding['vulnerability']['cve_name']
-
-        # might need to add some logic to skip already mitigated findings
-                    
-        mitigation_list = sca_finding['history']
-        logprint (f'Applying {len(mitigation_list)} {annotation_type} annotations to {component_file_name} with issue id {issue_id} in {formatted_to}...')
-
-        for mitigation_action in reversed(mitigation_list): # SCA mitigations API puts most recent action first
+        issue_id = sca_issue_id(sca_finding, annotation_type)
+        source_app_guid = from_app_guids[number]
+        count_matched += 1
+        if conflicts:
+            overridden = [from_app_guids[other] for other in conflicts]
+            logdetail('{} with issue id {} is mitigated differently in {}; copying the {} annotations from {}.'.format(
+                component_file_name, issue_id, ', '.join(source_names[other] for other in conflicts), annotation_type, source_names[number]))
+            audit_event('conflict', to_app_guid=to_app_guid, scan_type='SCA', annotation_type=annotation_type, component_id=component_id, issue_id=issue_id,
+                        from_app_guid=source_app_guid, overridden=overridden)
+            run_telemetry().add_conflict(component_id=component_id, issue_id=issue_id, scan_type='SCA', annotation_type=annotation_type,
+                                   from_app_guid=source_app_guid, overridden=overridden)
+            count_conflicts += 1
+
+        history = []
+        for mitigation_action in reversed(sca_finding['history']): # SCA mitigations API puts most recent action first
             proposal_action = mitigation_action['annotation_action']
-            proposal_comment = f'(COPIED FROM {formatted_from if include_profile_name else (f"APP {from_app_guid}")}{f" - originally submitted by {mitigation_action['user_name']}" if include_original_user else ""}) {mitigation_action['comment']}'
-            if not(dry_run):
-                if not to_credentials.run_with_credentials(lambda _: update_sca_mitigation_info_rest(to_app_guid, proposal_action, proposal_comment, annotation_type, component_id, issue_id, propose_only)):
-                    counter-=1
-                    break
+            original_user = ' - originally submitted by {}'.format(mitigation_action['user_name']) if include_original_user else ''
+            proposal_comment = '(COPIED FROM {}{}) {}'.format(source_names[number] if include_profile_name else (f"APP {source_app_guid}"), original_user, mitigation_action['comment'])
+            if is_copied_action(proposal_action, propose_only):
+                history.append((proposal_action, proposal_comment[0:2048])) # as the target will store it
+
+        mitigation_list = target_sca.claim((component_id, issue_id), history)
+        if not mitigation_list:
+            logdetail(f'{component_file_name} with issue id {issue_id} in {formatted_to} already has all {len(history)} {annotation_type} annotations; skipped.')
+            audit_event('skipped', to_app_guid=to_app_guid, scan_type='SCA', annotation_type=annotation_type, component_id=component_id, issue_id=issue_id)
+            count_skipped += 1
+            continue
+        logdetail(f'Applying {len(mitigation_list)} of {len(history)} {annotation_type} annotations to {component_file_name} with issue id {issue_id} in {formatted_to}...')
+        audit_event('matched', to_app_guid=to_app_guid, scan_type='SCA', annotation_type=annotation_type, component_id=component_id, issue_id=issue_id,
+                    from_app_guid=source_app_guid, annotations=len(mitigation_list))
 
-        counter += 1
+        for proposal_action, proposal_comment in mitigation_list:
+            if not(dry_run):
+                pending.add_sca_annotation(to_app_guid, annotation_type, component_id, issue_id, proposal_action, proposal_comment,
+                    source={'scan_type': 'SCA', 'source_app_guid': source_app_guid})
+        count_updated += 1
+
+    failed = set()
+    with run_telemetry().timer('write'):
+        if plan is not None:
+            plan.write(pending)
+        elif not dry_run:
+            failed = writer.submit(pending, journal) if writer is not None else pending.submit(to_credentials.api, journal)
+    count_applied = count_updated - len(failed) if plan is None and not dry_run else 0
+    if plan is None and not dry_run:
+        if journal is not None and not failed:
+            journal.record_target_done(from_app_guid, to_app_guid, None, 'SCA ' + annotation_type)
+        if incremental is not None and not failed:
+            incremental.update(incremental_key, source_signature, to_last_scan_date, [])
+
+    run_telemetry().add_counts(matched=count_matched, skipped=count_skipped, applied=count_applied, failed=len(failed))
+    logprint('[*] SCA {} issues in {}: {} matched, {} already mitigated, {} applied, {} failed{}. See log file for details.'.format(
+        annotation_type, formatted_to, count_matched, count_skipped, count_applied, len(failed),
+        ', {} mitigated differently in lower-precedence "from" applications'.format(count_conflicts) if count_conflicts else ''),
+        logging.WARNING if failed else logging.INFO)
+    # with --dry_run or --plan, the issues that would be updated
+    return count_applied if plan is None and not dry_run else count_updated
+
+def get_formatted_app_name(api, app_guid, sandbox_guid):
+    app_name = get_application_name(api, app_guid)
+    return format_application_name(app_guid,app_name,sandbox_guid)
 
-    logprint('[*] Updated {} flaws in {}. See log file for details.'.format(str(counter),formatted_to))
+def source_app_guids(from_app_guid):
+    # a "from" GUID is a single application (or sandbox), or a tuple of them merged in precedence order
+    return from_app_guid if isinstance(from_app_guid, tuple) else (from_app_guid,)
 
-def get_formatted_app_name(app_guid, sandbox_guid):
-    app_name = get_application_name(app_guid)
-    return format_application_name(app_guid,app_name,sandbox_guid)
+def source_label(from_app_guid, from_sandbox_guid, kind):
+    # names a "from" result set in the run telemetry, and in the manifest's copy labels
+    return '{} from {}'.format(MANIFEST_SCAN_LABELS[kind], ' + '.join(app_guid if sandbox_guid is None else '{}/{}'.format(app_guid, sandbox_guid)
+        for app_guid, sandbox_guid in zip(source_app_guids(from_app_guid), source_app_guids(from_sandbox_guid))))
 
-def get_findings_from(from_app_guid, scan_type, from_sandbox_guid=None):
-    formatted_app_name = get_formatted_app_name(from_app_guid, from_sandbox_guid)
+def get_findings_from(api, from_app_guid, scan_type, from_sandbox_guid=None, cache=None):
+    formatted_app_name = get_formatted_app_name(api, from_app_guid, from_sandbox_guid)
     logprint('Getting {} findings for {}'.format(scan_type.lower(),formatted_app_name))
-    findings_from = get_findings_by_type(from_app_guid,scan_type=scan_type, sandbox_guid=from_sandbox_guid)
+    source = source_label(from_app_guid, from_sandbox_guid, scan_type)
+    with run_telemetry().timer('fetch', source):
+        findings_from = get_findings_by_type(api, from_app_guid,scan_type=scan_type, sandbox_guid=from_sandbox_guid, cache=cache)
     count_from = len(findings_from)
+    run_telemetry().set_source_findings(source, count_from)
     logprint('Found {} {} findings in "from" {}'.format(count_from,scan_type.lower(),formatted_app_name))
     return findings_from
 
+def get_match_index_from(api, from_app_guid, scan_type, from_sandbox_guid=None, approved_matches_only=True, fuzzy_window=LINE_NUMBER_SLOP):
+    # --stream: build the match index from the "from" findings page by page, without keeping the findings
+    formatted_app_name = get_formatted_app_name(api, from_app_guid, from_sandbox_guid)
+    logprint('Getting {} findings for {}'.format(scan_type.lower(),formatted_app_name))
+    source = source_label(from_app_guid, from_sandbox_guid, scan_type)
+    started = time.monotonic()
+    waited = []
+    pages = run_telemetry().timed_pages(iter_findings_by_type(api, from_app_guid, scan_type=scan_type, sandbox_guid=from_sandbox_guid), source, waited)
+    match_index = FindingsMatchIndex(itertools.chain.from_iterable(pages), scan_type, approved_matches_only=approved_matches_only, fuzzy_window=fuzzy_window)
+    # the pages are fetched while the index is built, so index time is whatever was not spent waiting for them
+    run_telemetry().add_time('index', time.monotonic() - started - sum(waited), source)
+    run_telemetry().set_source_findings(source, len(match_index.source_statuses))
+    logprint('Found {} {} findings in "from" {}'.format(len(match_index.source_statuses),scan_type.lower(),formatted_app_name))
+    return match_index
+
 def match_for_scan_type(findings_from, from_app_guid, to_app_guid, dry_run, from_credentials, to_credentials, scan_type='STATIC',from_sandbox_guid=None,
-        to_sandbox_guid=None, propose_only=False, id_list=[], skip_id_list=[], fuzzy_match=False, include_original_user=False, include_profile_name=False, include_proposed=False):
-    if len(findings_from) == 0:
+        to_sandbox_guid=None, propose_only=False, id_list=[], skip_id_list=[], fuzzy_match=False, include_original_user=False, include_profile_name=False, include_proposed=False,
+        match_index=None, fuzzy_window=LINE_NUMBER_SLOP, plan=None, journal=None, incremental=None, stream=False, target_status=None,
+        fetch_to=None, writer=None):
+    # fetch_to returns the "to" findings in place of fetching them here, and writer (an AsyncAnnotationWriter) sends
+    # the annotations in place of to_credentials.api; --asyncio sets both. With several "from" applications,
+    # from_app_guid and from_sandbox_guid are tuples in precedence order, findings_from holds all of their
+    # findings and match_index is their MergedMatchIndex.
+    if findings_from is None:
+        # streamed "from" findings are only kept as the match index, which still knows every finding's status
+        if not isinstance(match_index, MergedMatchIndex):
+            match_index = MergedMatchIndex([(from_app_guid, from_sandbox_guid, match_index)])
+        count_from = sum(len(index.source_statuses) for _, _, index in match_index.sources)
+    else:
+        count_from = len(findings_from)
+
+    if count_from == 0:
         return 0 # no source findings to copy!
 
-    from_app_name = from_credentials.run_with_credentials(lambda _: get_application_name(from_app_guid))
-    formatted_from = format_application_name(from_app_guid,from_app_name,from_sandbox_guid)
+    if journal is not None and journal.is_target_done(from_app_guid, to_app_guid, to_sandbox_guid, scan_type):
+        logprint('{} mitigations were already copied to application {} by a previous run; skipped.'.format(scan_type.lower(), to_app_guid))
+        return 0
+
+    source_names = [get_formatted_app_name(from_credentials.api, app_guid, sandbox_guid)
+                    for app_guid, sandbox_guid in zip(source_app_guids(from_app_guid), source_app_guids(from_sandbox_guid))]
+    formatted_from = ' + '.join(source_names)
 
-    findings_from_approved = filter_approved(findings_from,id_list,skip_id_list)
-    findings_from_proposed = []
-    if include_proposed:
-        findings_from_proposed = filter_proposed(findings_from,id_list,skip_id_list)
+    if findings_from is None:
+        count_approved, count_proposed = count_source_statuses(match_index.source_statuses(), id_list, skip_id_list)
+    else:
+        count_approved = len(filter_approved(findings_from,id_list,skip_id_list))
+        count_proposed = len(filter_proposed(findings_from,id_list,skip_id_list)) if include_proposed else 0
+    if not include_proposed:
+        count_proposed = 0
 
-    if len(findings_from_approved) == 0:
+    if count_approved == 0:
         logprint('No approved {} findings in "from" {}. Exiting.'.format(scan_type.lower(), formatted_from))
-        if len(findings_from_proposed) == 0:
+        if count_proposed == 0:
             logprint('No proposed {} findings in "from" {}. Exiting.'.format(scan_type.lower(), formatted_from))
             return 0
 
-    results_to_app_name = to_credentials.run_with_credentials(lambda _: get_application_name(to_app_guid))
+    results_to_app_name = get_application_name(to_credentials.api, to_app_guid)
     formatted_to = format_application_name(to_app_guid,results_to_app_name,to_sandbox_guid)
 
-    logprint('Getting {} findings for {}'.format(scan_type.lower(),formatted_to))
-    findings_to = to_credentials.run_with_credentials(lambda _: get_findings_by_type(to_app_guid,scan_type=scan_type, sandbox_guid=to_sandbox_guid))
-    count_to = len(findings_to)
-    logprint('Found {} {} findings in "to" {}'.format(count_to,scan_type.lower(),formatted_to))
-    if count_to == 0:
-        return 0 # no destination findings to mitigate!
+    # index the source findings once rather than scanning them for every target finding
+    if match_index is None:
+        with run_telemetry().timer('index'):
+            match_index = FindingsMatchIndex(findings_from, scan_type, approved_matches_only=(not include_proposed), fuzzy_window=fuzzy_window)
+    if not isinstance(match_index, MergedMatchIndex):
+        match_index = MergedMatchIndex([(from_app_guid, from_sandbox_guid, match_index)])
+
+    if incremental is not None:
+        incremental_key = [from_app_guid, from_sandbox_guid, to_app_guid, to_sandbox_guid, scan_type]
+        # as for SCA, everything that changes what is copied or how its comments read is part of the signature
+        source_signature = '{}:{}:{}:{}:{}:{}:{}:{}'.format(match_index.signature(), fuzzy_match, fuzzy_window, propose_only,
+            include_original_user, include_profile_name, None if id_list is None else sorted(id_list), None if skip_id_list is None else sorted(skip_id_list))
+        to_last_scan_date = get_last_scan_date(to_credentials.api, to_app_guid)
+        previous = incremental.get(incremental_key, source_signature)
+        # sandbox scans are not reflected in the application's last scan date, so sandboxes are always fetched
+        if previous is not None and to_sandbox_guid is None and previous['to_last_scan_date'] == to_last_scan_date:
+            logprint('No new {} scan in {} and no change in "from" {} since the last run; skipped.'.format(scan_type.lower(), formatted_to, formatted_from))
+            return 0
+        evaluated = set(previous['fingerprints']) if previous is not None else set()
+        fingerprints = {}
 
-    # CREATE LIST OF UNIQUE VALUES FOR BUILD COPYING TO
-    copy_array_to = create_match_format_policy( app_guid=to_app_guid, sandbox_guid=to_sandbox_guid, policy_findings=findings_to,finding_type=scan_type)
+    logprint('Getting {} findings for {}'.format(scan_type.lower(),formatted_to))
+    if stream:
+        # match and write each page as it arrives instead of holding every target finding at once
+        pages_to = run_telemetry().timed_pages(iter_findings_by_type(to_credentials.api, to_app_guid, scan_type=scan_type, sandbox_guid=to_sandbox_guid))
+    else:
+        with run_telemetry().timer('fetch'):
+            if fetch_to is not None:
+                findings_to = fetch_to()
+            else:
+                findings_to = get_findings_by_type(to_credentials.api, to_app_guid,scan_type=scan_type, sandbox_guid=to_sandbox_guid)
+        logprint('Found {} {} findings in "to" {}'.format(len(findings_to),scan_type.lower(),formatted_to))
+        if len(findings_to) == 0:
+            return 0 # no destination findings to mitigate!
+        pages_to = [findings_to]
+        findings_to = None
+
+    def send_pending(pending):
+        with run_telemetry().timer('write'):
+            if plan is not None:
+                plan.write(pending)
+            elif not dry_run:
+                # send the collected annotations, grouping flaws that get identical annotations into one call
+                if writer is not None:
+                    return writer.submit(pending, journal)
+                return pending.submit(to_credentials.api, journal)
+        return set()
+
+    if target_status is None:
+        target_status = TargetStatusIndex()
 
     # We'll return how many mitigations we applied
     counter = 0
+    count_to = 0
+    count_evaluated = 0
+    count_skipped = 0
+    count_unmatched = 0
+    count_conflicts = 0
+    failed = set()
+    pending = PendingAnnotations(propose_only)
+    progress = ProgressLog('Matching {} findings in {}'.format(scan_type.lower(), formatted_to), 0)
+
+    for findings_to in pages_to:
+        match_started = time.monotonic()
+        count_to += len(findings_to)
+        if incremental is not None:
+            page_fingerprints = {finding['issue_id']: finding_fingerprint(finding) for finding in findings_to}
+            fingerprints.update(page_fingerprints)
+            findings_to = [finding for finding in findings_to if page_fingerprints[finding['issue_id']] not in evaluated]
+        count_evaluated += len(findings_to)
+        progress.total = count_evaluated if stream else len(findings_to) # streamed pages only tell us what has arrived so far
+
+        # look for a match for each finding in the TO list and apply mitigations of the matching flaw, if found
+        for this_to_finding in findings_to:
+            to_id = this_to_finding['issue_id']
+
+            progress.update()
+            to_status = target_status.observe(this_to_finding)
+            if to_status == 'APPROVED':
+                logdetail('Flaw ID {} in {} already has an accepted mitigation; skipped.'.format(to_id,formatted_to))
+                audit_event('skipped', to_app_guid=to_app_guid, to_sandbox_guid=to_sandbox_guid, scan_type=scan_type, flaw_id=to_id, status=to_status)
+                count_skipped += 1
+                continue
+            elif include_proposed and to_status == 'PROPOSED':
+                logdetail('Flaw ID {} in {} already has a proposed mitigation; skipped.'.format(to_id, formatted_to))
+                audit_event('skipped', to_app_guid=to_app_guid, to_sandbox_guid=to_sandbox_guid, scan_type=scan_type, flaw_id=to_id, status=to_status)
+                count_skipped += 1
+                continue
+
+            # If include_proposed is True, set approved_matches_only to False, to copy both proposed and approved mitigations
+            matched = match_index.match(this_to_finding,allow_fuzzy_match=fuzzy_match)
+
+            if matched == None:
+                logdetail('No approved match found for finding {} in {}'.format(to_id,formatted_from))
+                audit_event('unmatched', to_app_guid=to_app_guid, to_sandbox_guid=to_sandbox_guid, scan_type=scan_type, flaw_id=to_id)
+                count_unmatched += 1
+                continue
+
+            # the annotations come from the highest-precedence "from" application with a match
+            number, match, conflicts = matched
+            source_app_guid, source_sandbox_guid, _ = match_index.sources[number]
+            from_id = match.id
+
+            if not target_status.claim(to_id): # so we don't attempt to mitigate approved finding twice
+                logdetail('Flaw ID {} in {} already has an accepted mitigation; skipped.'.format(to_id,formatted_to))
+                audit_event('skipped', to_app_guid=to_app_guid, to_sandbox_guid=to_sandbox_guid, scan_type=scan_type, flaw_id=to_id, status='APPROVED')
+                count_skipped += 1
+                continue
+
+            logdetail('Source flaw {} in {} has a possible target match in flaw {} in {}.'.format(from_id,source_names[number],to_id,formatted_to))
+            if conflicts:
+                overridden = [{'from_app_guid': match_index.sources[other][0], 'from_sandbox_guid': match_index.sources[other][1], 'from_flaw_id': other_match.id}
+                              for other, other_match in conflicts]
+                logdetail('Flaw ID {} in {} is mitigated differently in {}; copying the mitigations from {}.'.format(
+                    to_id, formatted_to, ', '.join(source_names[other] for other, _ in conflicts), source_names[number]))
+                audit_event('conflict', to_app_guid=to_app_guid, to_sandbox_guid=to_sandbox_guid, scan_type=scan_type, flaw_id=to_id,
+                            from_app_guid=source_app_guid, from_flaw_id=from_id, overridden=overridden)
+                run_telemetry().add_conflict(flaw_id=to_id, scan_type=scan_type, from_app_guid=source_app_guid, from_sandbox_guid=source_sandbox_guid,
+                                       from_flaw_id=from_id, overridden=overridden)
+                count_conflicts += 1
+
+            # Since we are pulling all findings, filter and ignore any findings that have 0 annotations
+            mitigation_list = ()
+            if match.annotations != None:
+                mitigation_list = match.annotations
+                logdetail('Applying {} annotations for flaw ID {} in {}...'.format(len(mitigation_list),to_id,formatted_to))
+            audit_event('matched', to_app_guid=to_app_guid, to_sandbox_guid=to_sandbox_guid, scan_type=scan_type, flaw_id=to_id,
+                        from_app_guid=source_app_guid, from_sandbox_guid=source_sandbox_guid, from_flaw_id=from_id, annotations=len(mitigation_list))
+
+            for proposal_action, original_comment, original_user in reversed(mitigation_list): #findings API puts most recent action first
+                if include_original_user:
+                    proposal_comment = '(COPIED FROM {} - originally submitted by {}) {}'.format(source_names[number] if include_profile_name else (f"APP {source_app_guid}"), original_user,original_comment)
+                else:
+                    proposal_comment = '(COPIED FROM {}) {}'.format(source_names[number] if include_profile_name else (f"APP {source_app_guid}"), original_comment)
+                # Log this action for traceability
+                logdetail(proposal_comment)
+                if not(dry_run):
+                    pending.add_flaw_annotation(to_app_guid, to_sandbox_guid, to_id, proposal_action, proposal_comment,
+                        source={'scan_type': scan_type, 'source_app_guid': source_app_guid, 'source_sandbox_guid': source_sandbox_guid, 'source_id': from_id})
+
+            counter += 1
+
+        run_telemetry().add_time('match', time.monotonic() - match_started)
+        if stream:
+            failed |= send_pending(pending)
+            pending = PendingAnnotations(propose_only)
+
+    if stream:
+        logprint('Found {} {} findings in "to" {}'.format(count_to,scan_type.lower(),formatted_to))
+        if count_to == 0:
+            return 0 # no destination findings to mitigate!
+    if incremental is not None and previous is not None:
+        logprint('{} of {} {} findings in "to" {} are new or changed since the last run'.format(count_evaluated,count_to,scan_type.lower(),formatted_to))
+
+    failed |= send_pending(pending)
+    if plan is None and not dry_run:
+        if failed:
+            logprint('[*] Unable to copy all mitigations to {} flaws in {}. See log file for details.'.format(len(failed),formatted_to), logging.WARNING)
+        elif journal is not None:
+            journal.record_target_done(from_app_guid, to_app_guid, to_sandbox_guid, scan_type)
+        if incremental is not None:
+            # flaws whose copy failed are evaluated again next time
+            failed_ids = {key[2] for key in failed}
+            incremental.update(incremental_key, source_signature, to_last_scan_date,
+                [fingerprint for issue_id, fingerprint in fingerprints.items() if issue_id not in failed_ids])
+    run_telemetry().add_counts(target_findings=count_to, evaluated=count_evaluated, matched=counter, unmatched=count_unmatched, skipped=count_skipped,
+                         applied=counter - len(failed) if plan is None and not dry_run else 0, failed=len(failed))
+    if count_conflicts:
+        logprint('[*] Matched {} flaws in {}, {} of them mitigated differently in lower-precedence "from" applications. See log file for details.'.format(
+            counter, formatted_to, count_conflicts))
+    else:
+        logprint('[*] Matched {} flaws in {}. See log file for details.'.format(str(counter),formatted_to))
+    return counter
+
+def run_copy_task(to_app_guid, label, to_run, log_prefix=False):
+    # runs one copy, returning its count or None if it failed
+    if log_prefix:
+        copy_prefix.set('[{} -> {}] '.format(label, to_app_guid))
+    run_telemetry().start_copy(to_app_guid, label)
+    started = time.monotonic()
+    result = None
+    try:
+        result = to_run()
+        return result
+    except Exception:
+        log.exception('Copying {} mitigations to {} failed'.format(label, to_app_guid))
+        logprint('Copying {} mitigations to {} failed. See log file for details.'.format(label, to_app_guid), logging.WARNING)
+        return None
+    finally:
+        run_telemetry().finish_copy(result, time.monotonic() - started)
+        copy_prefix.set('')
 
-    formatted_from = from_credentials.run_with_credentials(lambda _: get_formatted_app_name(from_app_guid, from_sandbox_guid))
-    # look for a match for each finding in the TO list and apply mitigations of the matching flaw, if found
-    for this_to_finding in findings_to:
-        to_id = this_to_finding['issue_id']
+def submit_in_context(executor, fn, *args):
+    # submits fn to run in a copy of this thread's context, so it records to the same run's telemetry as the caller
+    return executor.submit(contextvars.copy_context().run, fn, *args)
 
-        if this_to_finding['finding_status']['resolution_status'] == 'APPROVED':
-            logprint ('Flaw ID {} in {} already has an accepted mitigation; skipped.'.format(to_id,formatted_to))
-            continue
-        elif include_proposed and this_to_finding['finding_status']['resolution_status'] == 'PROPOSED':
-            logprint('Flaw ID {} in {} already has a proposed mitigation; skipped.'.format(to_id, formatted_to))
-            continue
+def copy_label(label, to_sandbox_guid=None):
+    # results are keyed by target application and label, so a copy into a sandbox names the sandbox in its label
+    return label if to_sandbox_guid is None else '{} into sandbox {}'.format(label, to_sandbox_guid)
 
-        # If include_proposed is True, set approved_matches_only to False, to copy both proposed and approved mitigations
-        match = Findings().match(this_to_finding,findings_from,approved_matches_only=(not include_proposed),allow_fuzzy_match=fuzzy_match)
+def run_copy_tasks(copy_tasks, workers=1):
+    # copy_tasks is a list of (to_app_guid, label, callable) tuples, one per target and scan type.
+    # Returns {to_app_guid: {label: count}}, with a count of None where the task failed.
+    results = {}
 
-        if match == None:
-            logprint('No approved match found for finding {} in {}'.format(to_id,formatted_from))
-            continue
+    for to_app_guid, label, _ in copy_tasks:
+        results.setdefault(to_app_guid, {})[label] = None
 
-        from_id = match.get('id')
+    if workers <= 1:
+        for to_app_guid, label, to_run in copy_tasks:
+            results[to_app_guid][label] = run_copy_task(to_app_guid, label, to_run)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='copier') as executor:
+            futures = {submit_in_context(executor, run_copy_task, *copy_task, True): copy_task for copy_task in copy_tasks}
+            for future in as_completed(futures):
+                to_app_guid, label, _ = futures[future]
+                results[to_app_guid][label] = future.result()
+
+    return results
+
+def fetch_all(fetches, workers=1):
+    # fetches is {key: callable}; returns {key: result}, running the calls concurrently when workers > 1
+    if workers <= 1 or len(fetches) <= 1:
+        return {key: to_run() for key, to_run in fetches.items()}
+    with ThreadPoolExecutor(max_workers=min(workers, len(fetches)), thread_name_prefix='fetch') as executor:
+        futures = {key: submit_in_context(executor, to_run) for key, to_run in fetches.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+def log_copy_summary(results):
+    for to_app_guid, counts in results.items():
+        summary = ', '.join('{} {}'.format(label, 'FAILED' if count is None else count) for label, count in counts.items())
+        logprint('[*] Summary for application {}: {}'.format(to_app_guid, summary))
+
+def log_copy_totals(results, mapping_count):
+    counts = [count for target_counts in results.values() for count in target_counts.values()]
+    logprint('[*] Totals: {} mappings, {} targets, {} copies, {} matched, {} failed'.format(mapping_count, len(results), len(counts),
+        sum(count for count in counts if count is not None), sum(1 for count in counts if count is None)))
+
+def run_source_tasks(source_jobs, copy_tasks, workers=1):
+    # source_jobs is {source key: callable}, copy_tasks a list of (source key, to_app_guid, label, callable taking
+    # the source, target key). Every source is fetched once however many copies use it, and with workers > 1 each copy is queued
+    # as soon as its own source is ready rather than after all of them. Returns the same results as run_copy_tasks;
+    # copies whose source could not be fetched count as failed.
+    results = {}
+    dependents = {}
+    for source_key, to_app_guid, label, to_copy, _ in copy_tasks:
+        results.setdefault(to_app_guid, {})[label] = None
+        dependents.setdefault(source_key, []).append((to_app_guid, label, to_copy))
+
+    def fetch_source(source_key, to_run):
+        try:
+            return to_run()
+        except Exception:
+            log.exception('Getting "from" findings for {} failed'.format(source_key))
+            logprint('Getting "from" findings for {} failed. See log file for details.'.format(source_key), logging.WARNING)
+            return None
+
+    if workers <= 1:
+        for source_key, to_run in source_jobs.items():
+            source = fetch_source(source_key, to_run)
+            for to_app_guid, label, to_copy in dependents.get(source_key, []):
+                if source is not None:
+                    results[to_app_guid][label] = run_copy_task(to_app_guid, label, functools.partial(to_copy, source))
+        return results
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='copier') as executor:
+        source_futures = {submit_in_context(executor, fetch_source, source_key, to_run): source_key for source_key, to_run in source_jobs.items()}
+        copy_futures = {}
+        for future in as_completed(source_futures):
+            source = future.result()
+            if source is None:
+                continue
+            for to_app_guid, label, to_copy in dependents.get(source_futures[future], []):
+                copy_futures[submit_in_context(executor, run_copy_task, to_app_guid, label, functools.partial(to_copy, source), True)] = (to_app_guid, label)
+        for future in as_completed(copy_futures):
+            to_app_guid, label = copy_futures[future]
+            results[to_app_guid][label] = future.result()
+    return results
+
+def read_manifest(manifest_file):
+    # returns the manifest's mappings as a list of dicts keyed like the command line's long options.
+    # JSON holds a list of mappings (or {"mappings": [...]}), YAML the same, and CSV one mapping per row.
+    extension = os.path.splitext(manifest_file)[1].lower()
+    with open(manifest_file, encoding='utf8', newline='') as f:
+        if extension in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ValueError('Reading a YAML manifest requires PyYAML (pip install pyyaml)')
+            manifest = yaml.safe_load(f)
+        elif extension == '.csv':
+            manifest = [{key: value for key, value in row.items() if value not in (None, '')} for row in csv.DictReader(f)]
+        else:
+            manifest = json.load(f)
+    if isinstance(manifest, dict):
+        manifest = manifest.get('mappings')
+    if not isinstance(manifest, list):
+        raise ValueError('{} does not contain a list of mappings'.format(manifest_file))
+    return manifest
+
+def manifest_list(value):
+    # manifest lists can be real lists or comma-delimited strings, as on the command line
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value]
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+def manifest_ids(value, key):
+    # a manifest id_list or skip_id_list as issue ids; ValueError names the entry that is not one
+    ids = []
+    for item in manifest_list(value):
+        try:
+            ids.append(int(item))
+        except ValueError:
+            raise ValueError('{} entry "{}" is not an issue id'.format(key, item)) from None
+    return ids or None
+
+def manifest_flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+def get_scan_kinds(scan_types, sca_import_type):
+    # the scan types and SCA annotation types to copy, in the order main() runs them
+    if not scan_types:
+        return ['STATIC', 'DYNAMIC']
+    scan_types = scan_types.lower()
+    kinds = []
+    if 'sast' in scan_types:
+        kinds.append('STATIC')
+    if 'dast' in scan_types:
+        kinds.append('DYNAMIC')
+    if 'sca' in scan_types:
+        sca_import_type = sca_import_type.lower() if sca_import_type else 'vulnerabilities, licenses'
+        if 'vulnerabilit' in sca_import_type:
+            kinds.append('vulnerability')
+        if 'license' in sca_import_type:
+            kinds.append('license')
+    return kinds
+
+def resolve_manifest_mapping(mapping, from_api, to_api):
+    # returns (from_app_guid, from_sandbox_guid, [(to_app_guid, to_sandbox_guid)]); sandbox GUIDs or names
+    # line up with the targets in order, GUIDs from toapp first and then those named in toappnames. Several
+    # "from" applications (fromapp, or fromappname in its place) are merged into every target, the first
+    # listed taking precedence; from_app_guid and from_sandbox_guid are then tuples, lined up the same way.
+    from_app_guids = manifest_list(mapping.get('fromapp'))
+    if mapping.get('fromappname'):
+        from_app_guids = []
+        for name in manifest_list(mapping['fromappname']):
+            from_app_guid = get_application_by_name(from_api, name)
+            if from_app_guid is None:
+                raise ValueError('unable to find application {}'.format(name))
+            from_app_guids.append(from_app_guid)
+    from_app_guids = list(dict.fromkeys(from_app_guids))
+    if len(from_app_guids) == 0:
+        raise ValueError('no application to copy from')
+    from_sandbox_guids = manifest_list(mapping.get('fromsandbox'))
+    for name in manifest_list(mapping.get('fromsandboxname')):
+        if len(from_sandbox_guids) >= len(from_app_guids):
+            raise ValueError('more sandboxes than applications to copy from')
+        from_sandbox_guid = get_sandbox_by_name(from_api, from_app_guids[len(from_sandbox_guids)], name)
+        if from_sandbox_guid is None:
+            raise ValueError('unable to find sandbox {}'.format(name))
+        from_sandbox_guids.append(from_sandbox_guid)
+    from_sandbox_guids += [None] * (len(from_app_guids) - len(from_sandbox_guids))
+    if len(from_app_guids) == 1:
+        from_app_guid, from_sandbox_guid = from_app_guids[0], from_sandbox_guids[0]
+    else:
+        from_app_guid, from_sandbox_guid = tuple(from_app_guids), tuple(from_sandbox_guids)
+
+    to_app_guids = manifest_list(mapping.get('toapp'))
+    for name in manifest_list(mapping.get('toappnames')):
+        to_app_guid = get_application_by_name(to_api, name)
+        if to_app_guid is None:
+            raise ValueError('unable to find application {}'.format(name))
+        to_app_guids.append(to_app_guid)
+    if len(to_app_guids) == 0:
+        raise ValueError('no application to copy to')
+
+    to_sandbox_guids = manifest_list(mapping.get('tosandbox'))
+    for name in manifest_list(mapping.get('tosandboxnames')):
+        if len(to_sandbox_guids) >= len(to_app_guids):
+            raise ValueError('more sandboxes than applications to copy to')
+        to_sandbox_guid = get_sandbox_by_name(to_api, to_app_guids[len(to_sandbox_guids)], name)
+        if to_sandbox_guid is None:
+            raise ValueError('unable to find sandbox {}'.format(name))
+        to_sandbox_guids.append(to_sandbox_guid)
+    to_sandbox_guids += [None] * (len(to_app_guids) - len(to_sandbox_guids))
+    return from_app_guid, from_sandbox_guid, list(zip(to_app_guids, to_sandbox_guids))
+
+def get_manifest_source(api, from_app_guid, from_sandbox_guid, kind, variants, cache=None, stream=False):
+    # fetches one "from" result set and builds a match index for each (approved_matches_only, fuzzy_window)
+    # variant the mappings using it need; returns (findings, {variant: index})
+    if isinstance(from_app_guid, tuple):
+        return merge_manifest_sources(kind, variants, [get_manifest_source(api, app_guid, sandbox_guid, kind, variants, cache=cache, stream=stream)
+                                                       for app_guid, sandbox_guid in zip(from_app_guid, from_sandbox_guid)], from_app_guid, from_sandbox_guid)
+    if kind in ('vulnerability', 'license'):
+        return get_sca_findings_for(api, from_app_guid, kind, cache=cache), {}
+    if stream:
+        # streamed sources are keyed per variant, so there is exactly one
+        (approved_matches_only, fuzzy_window), = variants
+        match_index = get_match_index_from(api, from_app_guid, kind, from_sandbox_guid, approved_matches_only=approved_matches_only, fuzzy_window=fuzzy_window)
+        return None, {(approved_matches_only, fuzzy_window): match_index}
+    findings = get_findings_from(api, from_app_guid, kind, from_sandbox_guid, cache=cache)
+    with run_telemetry().timer('index', source_label(from_app_guid, from_sandbox_guid, kind)):
+        return findings, {variant: FindingsMatchIndex(findings, kind, approved_matches_only=variant[0], fuzzy_window=variant[1]) for variant in variants}
+
+def merge_manifest_sources(kind, variants, sources, from_app_guids, from_sandbox_guids):
+    # one source from the sources of several "from" applications, in precedence order: a list of findings for each
+    # application for SCA, otherwise all of the findings (None if streamed) and a MergedMatchIndex for each variant
+    if kind in ('vulnerability', 'license'):
+        return [findings for findings, _ in sources], {}
+    findings = None if any(findings is None for findings, _ in sources) else [finding for findings, _ in sources for finding in findings]
+    return findings, {variant: MergedMatchIndex([(app_guid, sandbox_guid, indexes[variant]) for app_guid, sandbox_guid, (_, indexes)
+                                                 in zip(from_app_guids, from_sandbox_guids, sources)]) for variant in variants}
+
+def copy_from_manifest_source(source, kind, variant, **copy_args):
+    findings, indexes = source
+    if kind in ('vulnerability', 'license'):
+        return match_sca(findings, annotation_type=kind, **copy_args)
+    return match_for_scan_type(findings, scan_type=kind, match_index=indexes[variant], fuzzy_window=variant[1], **copy_args)
+
+async def get_findings_by_type_async(api, app_guid, scan_type='STATIC', sandbox_guid=None, cache=None):
+    # get_findings_by_type with an AsyncVeracodeApiClient
+    if sandbox_guid is not None:
+        cache = None # as in get_findings_by_type
+    if cache is not None:
+        cache_key = (app_guid, sandbox_guid, scan_type, 'TRUE')
+        last_scan_date = (await api.get_application(app_guid)).get('last_completed_scan_date')
+        findings = await asyncio.to_thread(cache.get, cache_key, last_scan_date)
+        if findings is not None:
+            return findings
 
-        logprint('Source flaw {} in {} has a possible target match in flaw {} in {}.'.format(from_id,formatted_from,to_id,formatted_to))
+    findings = []
+    if scan_type == 'STATIC':
+        findings = await api.get_findings(app_guid,scan_type=scan_type,annot='TRUE',sandbox_guid=sandbox_guid)
+    elif scan_type == 'DYNAMIC':
+        findings = await api.get_findings(app_guid,scan_type=scan_type,annot='TRUE')
 
-        # Since we are pulling all findings, filter and ignore any findings that have 0 annotations
-        mitigation_list = ''
-        if match['finding'].get('annotations') != None:
-            mitigation_list = match['finding']['annotations']
-            logprint ('Applying {} annotations for flaw ID {} in {}...'.format(len(mitigation_list),to_id,formatted_to))
+    if cache is not None:
+        await asyncio.to_thread(cache.put, cache_key, last_scan_date, findings)
+    return findings
 
-        for mitigation_action in reversed(mitigation_list): #findings API puts most recent action first
-            proposal_action = mitigation_action['action']
-            if include_original_user:
-                proposal_comment = '(COPIED FROM {} - originally submitted by {}) {}'.format(formatted_from if include_profile_name else (f"APP {from_app_guid}"), mitigation_action['user_name'],mitigation_action['comment'])
-                # Log this action for traceability
-                logprint('(COPIED FROM {} - originally submitted by {}) {}'.format(formatted_from if include_profile_name else (f"APP {from_app_guid}"), mitigation_action['user_name'],mitigation_action['comment']))
+async def get_sca_findings_async(api, from_app_guid, annotation_type, cache=None):
+    # get_sca_findings_for with an AsyncVeracodeApiClient
+    if cache is not None:
+        cache_key = (from_app_guid, None, 'SCA', annotation_type.upper())
+        last_scan_date = (await api.get_application(from_app_guid)).get('last_completed_scan_date')
+        cached = await asyncio.to_thread(cache.get, cache_key, last_scan_date)
+        if cached is not None:
+            return cached
+
+    findings_from_approved = await api.get_sca_annotations(app_guid=from_app_guid, annotation_type=annotation_type.upper())
+    approved_annotations = findings_from_approved['approved_annotations'] if findings_from_approved else []
+
+    if cache is not None:
+        await asyncio.to_thread(cache.put, cache_key, last_scan_date, approved_annotations)
+    return approved_annotations
+
+async def get_sca_target_annotations_async(api, to_app_guid, annotation_type):
+    # get_sca_target_annotations with an AsyncVeracodeApiClient
+    responses = await asyncio.gather(*(api.get_sca_annotations(app_guid=to_app_guid, annotation_type=annotation_type.upper(), annotation_status=status)
+                                       for status in SCA_TARGET_ANNOTATION_STATUSES))
+    return merge_sca_annotation_responses(responses, annotation_type)
+
+async def get_manifest_source_async(api, from_credentials, from_app_guid, from_sandbox_guid, kind, variants, cache=None):
+    # get_manifest_source with an AsyncVeracodeApiClient; the match indexes are built in a worker thread
+    if isinstance(from_app_guid, tuple):
+        sources = await asyncio.gather(*(get_manifest_source_async(api, from_credentials, app_guid, sandbox_guid, kind, variants, cache=cache)
+                                         for app_guid, sandbox_guid in zip(from_app_guid, from_sandbox_guid)))
+        return merge_manifest_sources(kind, variants, sources, from_app_guid, from_sandbox_guid)
+    source = source_label(from_app_guid, from_sandbox_guid, kind)
+    if kind in ('vulnerability', 'license'):
+        with run_telemetry().timer('fetch', source):
+            findings = await get_sca_findings_async(api, from_app_guid, kind, cache=cache)
+        run_telemetry().set_source_findings(source, len(findings))
+        return findings, {}
+    formatted_app_name = await asyncio.to_thread(get_formatted_app_name, from_credentials.api, from_app_guid, from_sandbox_guid)
+    logprint('Getting {} findings for {}'.format(kind.lower(),formatted_app_name))
+    with run_telemetry().timer('fetch', source):
+        findings = await get_findings_by_type_async(api, from_app_guid, scan_type=kind, sandbox_guid=from_sandbox_guid, cache=cache)
+    run_telemetry().set_source_findings(source, len(findings))
+    logprint('Found {} {} findings in "from" {}'.format(len(findings),kind.lower(),formatted_app_name))
+
+    def build_indexes():
+        with run_telemetry().timer('index', source):
+            return {variant: FindingsMatchIndex(findings, kind, approved_matches_only=variant[0], fuzzy_window=variant[1]) for variant in variants}
+    return findings, await asyncio.to_thread(build_indexes)
+
+async def run_source_tasks_async(source_specs, copy_tasks, from_credentials, to_credentials, workers=1, cache=None, prefetch_targets=True):
+    # run_source_tasks for --asyncio. Every "from" result set, and with prefetch_targets every "to" result set the
+    # copies read, is requested at once; each copy is matched in one of workers threads as soon as its findings
+    # are ready, and the annotations go out through an AsyncAnnotationWriter. Returns the same results.
+    loop = asyncio.get_running_loop()
+    results = {}
+    for _, to_app_guid, label, _, _ in copy_tasks:
+        results.setdefault(to_app_guid, {})[label] = None
+
+    from_api = AsyncVeracodeApiClient(from_credentials)
+    to_api = from_api if to_credentials is from_credentials else AsyncVeracodeApiClient(to_credentials)
+    writer = AsyncAnnotationWriter(to_api, loop, writers=to_api.throttle.max_concurrency)
+    matching = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='copier')
+    target_fetches = {}
+
+    async def fetch_source(source_key, spec):
+        try:
+            return await get_manifest_source_async(from_api, from_credentials, *spec, cache=cache)
+        except Exception:
+            log.exception('Getting "from" findings for {} failed'.format(source_key))
+            logprint('Getting "from" findings for {} failed. See log file for details.'.format(source_key), logging.WARNING)
+            return None
+
+    def start_target(target_key):
+        # each "to" result set is requested once, however many copies read it
+        if target_key not in target_fetches:
+            to_app_guid, to_sandbox_guid, kind = target_key
+            if kind in ('vulnerability', 'license'):
+                target_fetches[target_key] = asyncio.ensure_future(get_sca_target_annotations_async(to_api, to_app_guid, kind))
             else:
-                proposal_comment = '(COPIED FROM {}) {}'.format(formatted_from if include_profile_name else (f"APP {from_app_guid}"), mitigation_action['comment'])
-                # Log this action for traceability
-                logprint('(COPIED FROM {}) {}'.format(formatted_from if include_profile_name else (f"APP {from_app_guid}"), mitigation_action['comment']))
-            if not(dry_run):
-                to_credentials.run_with_credentials(lambda _: update_mitigation_info_rest(to_app_guid, to_id, proposal_action, proposal_comment, to_sandbox_guid, propose_only))
+                target_fetches[target_key] = asyncio.ensure_future(get_findings_by_type_async(to_api, to_app_guid, scan_type=kind, sandbox_guid=to_sandbox_guid))
+        return target_fetches[target_key]
+
+    async def fetch_target(target_key):
+        return await start_target(target_key)
 
-        set_in_memory_flaw_to_approved(copy_array_to,to_id) # so we don't attempt to mitigate approved finding twice
-        counter += 1
-    #TODO Add a counter for # of flaws matched vs # of flaws actually updated with mitigations copied
-    logprint('[*] Matched {} flaws in {}. See log file for details.'.format(str(counter),formatted_to))
+    async def run_copy(source_key, to_app_guid, label, to_copy, target_key):
+        source = await source_fetches[source_key]
+        if source is None:
+            return
+        copy_args = {'writer': writer}
+        if target_key is not None:
+            copy_args['fetch_to'] = lambda: asyncio.run_coroutine_threadsafe(fetch_target(target_key), loop).result()
+        results[to_app_guid][label] = await loop.run_in_executor(matching, contextvars.copy_context().run, run_copy_task, to_app_guid, label,
+                                                                 functools.partial(to_copy, source, **copy_args), workers > 1)
+
+    source_fetches = {source_key: asyncio.ensure_future(fetch_source(source_key, spec)) for source_key, spec in source_specs.items()}
+    if prefetch_targets:
+        for target_key in {copy_task[4] for copy_task in copy_tasks if copy_task[4] is not None}:
+            start_target(target_key)
+    try:
+        await asyncio.gather(*(run_copy(*copy_task) for copy_task in copy_tasks))
+    finally:
+        # fetches no copy waited for, e.g. because its source failed, are collected so their errors are not reported
+        await asyncio.gather(*target_fetches.values(), return_exceptions=True)
+        await writer.close()
+        matching.shutdown()
+        for api in {from_api, to_api}:
+            await api.close()
+    return results
+
+def build_manifest_copies(mappings, options, from_credentials, to_credentials, dry_run=False, plan=None, journal=None,
+                          incremental=None, stream=False):
+    # resolves the mappings of a --manifest into the "from" result sets to fetch and the copies to make from them.
+    # options holds the command line's values for anything a mapping does not set. Returns (source_specs, copy_tasks,
+    # results), results holding a None count for every copy and for each mapping that could not be resolved.
+    source_specs = {} # source key -> (from_app_guid, from_sandbox_guid, kind, variants)
+    copy_tasks = []
+    target_statuses = {} # one per target, shared by every mapping and scan type that copies to it
+    target_sca_indexes = {} # one per target and SCA annotation type, shared by every mapping that copies to it
+    results = {}
+
+    to_credentials.api.directory.prefetch(name for mapping in mappings for name in manifest_list(mapping.get('toappnames')))
+
+    for number, mapping in enumerate(mappings, start=1):
+        settings = dict(options)
+        settings.update({key: value for key, value in mapping.items() if value is not None})
+        try:
+            id_list = manifest_ids(settings.get('id_list'), 'id_list')
+            skip_id_list = manifest_ids(settings.get('skip_id_list'), 'skip_id_list')
+            fuzzy_window = settings.get('fuzzy_window', LINE_NUMBER_SLOP)
+            try:
+                fuzzy_window = LINE_NUMBER_SLOP if fuzzy_window is None else int(fuzzy_window) # 0 is a window of its own, exact lines only
+            except ValueError:
+                raise ValueError('fuzzy_window "{}" is not a number of lines'.format(fuzzy_window)) from None
+            from_app_guid, from_sandbox_guid, targets = resolve_manifest_mapping(settings, from_credentials.api, to_credentials.api)
+        except ValueError as e:
+            logprint('Manifest entry {}: {}; skipped.'.format(number, e))
+            results['manifest entry {}'.format(number)] = {'setup': None}
+            continue
+
+        include_proposed = manifest_flag(settings.get('include_proposed'))
+        copy_args = {'from_app_guid': from_app_guid, 'dry_run': dry_run, 'propose_only': manifest_flag(settings.get('propose_only')),
+                     'from_credentials': from_credentials, 'to_credentials': to_credentials,
+                     'include_original_user': manifest_flag(settings.get('include_original_user')),
+                     'include_profile_name': manifest_flag(settings.get('include_profile_name')),
+                     'plan': plan, 'journal': journal, 'incremental': incremental}
+        findings_args = {'from_sandbox_guid': from_sandbox_guid, 'fuzzy_match': manifest_flag(settings.get('fuzzy_match')),
+                         'include_proposed': include_proposed, 'stream': stream,
+                         'id_list': id_list, 'skip_id_list': skip_id_list}
+
+        sca_copies = set() # (source key, to_app_guid) of this mapping's SCA copies
+        for kind in get_scan_kinds(settings.get('scan_types'), settings.get('sca_import_type')):
+            variant = (not include_proposed, fuzzy_window if kind == 'STATIC' else LINE_NUMBER_SLOP)
+            # DAST findings belong to the application rather than a sandbox, so as in main() the "from" sandbox is left
+            # out of their source, comments and --incremental keys
+            kind_sandbox_guid = from_sandbox_guid if kind != 'DYNAMIC' else tuple(None for _ in from_sandbox_guid) if isinstance(from_sandbox_guid, tuple) else None
+            source_key = (from_app_guid, kind_sandbox_guid, kind)
+            if stream and kind in ('STATIC', 'DYNAMIC'):
+                source_key += variant
+            source_specs.setdefault(source_key, (from_app_guid, kind_sandbox_guid, kind, set()))[3].add(variant)
+
+            for to_app_guid, to_sandbox_guid in targets:
+                if kind in ('vulnerability', 'license'):
+                    if (source_key, to_app_guid) in sca_copies:
+                        continue # SCA annotations belong to the application, whichever of its sandboxes is named
+                    sca_copies.add((source_key, to_app_guid))
+                    to_sandbox_guid = None
+                label = copy_label(source_label(from_app_guid, kind_sandbox_guid, kind), to_sandbox_guid)
+                if label in results.get(to_app_guid, {}):
+                    label += ' (entry {})'.format(number) # same source and target in another mapping
+                results.setdefault(to_app_guid, {})[label] = None
+                if kind in ('vulnerability', 'license'):
+                    target_sca = target_sca_indexes.setdefault((to_app_guid, kind), TargetScaIndex())
+                    target_key = (to_app_guid, None, kind)
+                    to_copy = functools.partial(copy_from_manifest_source, kind=kind, variant=variant, to_app_guid=to_app_guid, target_sca=target_sca, **copy_args)
+                else:
+                    target_status = target_statuses.setdefault((to_app_guid, to_sandbox_guid), TargetStatusIndex())
+                    target_key = (to_app_guid, to_sandbox_guid if kind == 'STATIC' else None, kind)
+                    to_copy = functools.partial(copy_from_manifest_source, kind=kind, variant=variant, to_app_guid=to_app_guid,
+                        to_sandbox_guid=target_key[1], target_status=target_status, **copy_args, **dict(findings_args, from_sandbox_guid=kind_sandbox_guid))
+                copy_tasks.append((source_key, to_app_guid, label, to_copy, target_key))
+    return source_specs, copy_tasks, results
+
+def run_manifest(mappings, options, from_credentials, to_credentials, dry_run=False, workers=1, plan=None, journal=None,
+                 incremental=None, cache=None, stream=False, use_asyncio=False):
+    # runs every mapping of a --manifest in this process. Returns {to_app_guid: {label: count}}, labels naming the
+    # source of each copy.
+    source_specs, copy_tasks, results = build_manifest_copies(mappings, options, from_credentials, to_credentials, dry_run=dry_run,
+                                                              plan=plan, journal=journal, incremental=incremental, stream=stream)
+    logprint('Manifest: {} mappings, {} "from" result sets, {} copies'.format(len(mappings), len(source_specs), len(copy_tasks)))
+    if use_asyncio:
+        # the "to" findings are fetched up front unless --incremental may find a target can be skipped without them
+        copy_results = asyncio.run(run_source_tasks_async(source_specs, copy_tasks, from_credentials, to_credentials, workers=workers,
+                                                          cache=cache, prefetch_targets=incremental is None))
+    else:
+        source_jobs = {source_key: functools.partial(get_manifest_source, from_credentials.api, *spec, cache=cache, stream=stream)
+                       for source_key, spec in source_specs.items()}
+        copy_results = run_source_tasks(source_jobs, copy_tasks, workers=workers)
+    for target, counts in copy_results.items():
+        results.setdefault(target, {}).update(counts)
+    return results
+
+def get_last_scan_dates(api, app_guids, workers=1):
+    # {app_guid: last completed scan date}, read for each application on workers threads. The whole application
+    # list is never loaded for this: a tenant can have far more applications than are being watched.
+    app_guids = list(app_guids)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(app_guids)))) as executor:
+        futures = [submit_in_context(executor, get_last_scan_date, api, app_guid) for app_guid in app_guids]
+        return {app_guid: future.result() for app_guid, future in zip(app_guids, futures)}
+
+class ScanWebhookServer():
+    # --webhook_port: a local HTTP endpoint for scan-complete notifications. A POST whose JSON body (or query string)
+    # names an application GUID as app_guid or application_guid hands it to notify and is answered 202.
+    def __init__(self, port, notify):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                fields = dict(parse.parse_qsl(parse.urlsplit(self.path).query))
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                    fields.update(body if isinstance(body, dict) else {})
+                except ValueError:
+                    pass
+                app_guid = fields.get('app_guid') or fields.get('application_guid')
+                self.send_response(202 if app_guid else 400)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                if app_guid:
+                    notify(str(app_guid))
+
+            def log_message(self, format, *args):
+                log.debug('Webhook: ' + format % args)
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='webhook', daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class MitigationWatcher():
+    # --watch: copies every mapping once, then stays running and copies again only into the targets that have a new
+    # scan, and from the "from" applications that have one. Scans are found by polling last completed scan dates every
+    # poll_interval seconds or announced on a local webhook; events that arrive within coalesce seconds of the first
+    # are handled in one pass. The "from" result sets and their match indexes stay in memory until their application
+    # has a new scan. Each pass builds its copies afresh, so it sees the targets as they are then.
+    def __init__(self, mappings, options, from_credentials, to_credentials, poll_interval=WATCH_POLL_SECONDS, coalesce=WATCH_COALESCE_SECONDS,
+                 webhook_port=None, workers=1, cache=None, **copy_options):
+        self.mappings = mappings
+        self.options = options
+        self.from_credentials = from_credentials
+        self.to_credentials = to_credentials
+        self.poll_interval = poll_interval
+        self.coalesce = coalesce
+        self.workers = workers
+        self.cache = cache
+        self.copy_options = copy_options # dry_run, incremental and stream, as for build_manifest_copies
+        self.passes = 0
+        self._source_specs = {}
+        self._copy_tasks = []
+        self._sources = {} # source key -> fetched source, kept until its application has a new scan
+        self._scan_dates = {} # (api, app_guid) -> last completed scan date at the previous poll
+        self._events = queue.Queue()
+        self._webhook = ScanWebhookServer(webhook_port, self.notify) if webhook_port is not None else None
+
+    def notify(self, app_guid):
+        # a new scan in app_guid; safe to call from any thread
+        self._events.put(app_guid)
+
+    def _source_guids(self):
+        return {app_guid for spec in self._source_specs.values() for app_guid in source_app_guids(spec[0])}
+
+    def _target_guids(self):
+        return {copy_task[1] for copy_task in self._copy_tasks}
+
+    def _build_copies(self):
+        self._source_specs, self._copy_tasks, results = build_manifest_copies(self.mappings, self.options, self.from_credentials,
+                                                                              self.to_credentials, **self.copy_options)
+        return results
+
+    def poll(self):
+        # notifies each watched application whose last completed scan date changed since the previous poll
+        app_guids = {}
+        app_guids.setdefault(self.from_credentials.api, set()).update(self._source_guids())
+        app_guids.setdefault(self.to_credentials.api, set()).update(self._target_guids())
+        scan_dates = {}
+        for api, guids in app_guids.items():
+            scan_dates.update({(api, app_guid): scan_date for app_guid, scan_date in get_last_scan_dates(api, guids, self.workers).items()})
+        for (api, app_guid), scan_date in scan_dates.items():
+            if (api, app_guid) in self._scan_dates and self._scan_dates[(api, app_guid)] != scan_date:
+                self.notify(app_guid)
+        self._scan_dates = scan_dates
+
+    def _get_source(self, source_key, spec):
+        if source_key not in self._sources:
+            self._sources[source_key] = get_manifest_source(self.from_credentials.api, *spec, cache=self.cache, stream=self.copy_options.get('stream', False))
+        return self._sources[source_key]
+
+    def copy_pass(self, changed=None, results=None):
+        # copies into the targets that have a new scan, and from the "from" applications that have one; every copy when
+        # changed is None. results is what _build_copies() returned, if it has just been called.
+        run_telemetry().reset()
+        if results is None:
+            results = self._build_copies()
+        copy_tasks = self._copy_tasks
+        if changed is not None:
+            self._sources = {source_key: source for source_key, source in self._sources.items() if changed.isdisjoint(source_app_guids(source_key[0]))}
+            copy_tasks = [copy_task for copy_task in copy_tasks if copy_task[1] in changed or not changed.isdisjoint(source_app_guids(copy_task[0][0]))]
+            results = {key: counts for key, counts in results.items() if key.startswith('manifest entry')} # mappings that could not be resolved
+        source_jobs = {copy_task[0]: functools.partial(self._get_source, copy_task[0], self._source_specs[copy_task[0]]) for copy_task in copy_tasks}
+        logprint('Watch pass {}: {} "from" result sets, {} copies'.format(self.passes + 1, len(source_jobs), len(copy_tasks)))
+        for target, counts in run_source_tasks(source_jobs, copy_tasks, workers=self.workers).items():
+            results.setdefault(target, {}).update(counts)
+        self.passes += 1
+        return results
+
+    def _next_events(self, timeout):
+        # waits up to timeout seconds (None: no limit) for an event, then gathers those that follow within self.coalesce
+        # seconds; returns the changed applications this watcher copies to or from, or None if the wait ran out
+        try:
+            changed = {self._events.get(timeout=timeout)}
+        except queue.Empty:
+            return None
+        deadline = time.monotonic() + self.coalesce
+        while True:
+            try:
+                changed.add(self._events.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        watched = self._source_guids() | self._target_guids()
+        if changed - watched:
+            logprint('Watch: ignoring scans in applications that are not copied to or from: {}'.format(', '.join(sorted(changed - watched))))
+        return changed & watched
+
+    def run(self, max_passes=None, after_pass=log_copy_summary):
+        # after_pass is called with the results of each pass; runs until max_passes passes are done or it is interrupted
+        try:
+            results = self._build_copies()
+            if self.poll_interval:
+                self.poll() # the scan dates later polls compare with
+            after_pass(self.copy_pass(results=results))
+            logprint('Watching {} "from" and {} "to" applications{}{}'.format(len(self._source_guids()), len(self._target_guids()),
+                ', polling every {}s'.format(self.poll_interval) if self.poll_interval else '',
+                ', webhook on 127.0.0.1:{}'.format(self._webhook.port) if self._webhook is not None else ''))
+            next_poll = time.monotonic() + self.poll_interval if self.poll_interval else None
+            while max_passes is None or self.passes < max_passes:
+                changed = self._next_events(max(0, next_poll - time.monotonic()) if next_poll is not None else None)
+                if changed is None:
+                    self.poll()
+                    next_poll = time.monotonic() + self.poll_interval
+                elif changed:
+                    logprint('Watch: new scans in {}'.format(', '.join(sorted(changed))))
+                    after_pass(self.copy_pass(changed))
+        except KeyboardInterrupt:
+            logprint('Watch stopped after {} passes'.format(self.passes))
+        finally:
+            if self._webhook is not None:
+                self._webhook.close()
 
 def get_exact_sandbox_name_match(sandbox_name, sandbox_candidates):
     for sandbox_candidate in sandbox_candidates:
         if sandbox_candidate["name"] == sandbox_name:
             return sandbox_candidate["guid"]
-    print("Unable to find sandbox named " + sandbox_name)
+    logprint("Unable to find sandbox named " + sandbox_name, logging.WARNING)
     return None
 
-def get_sandbox_by_name(application_id, sandbox_name):
-    sandbox_candidates = Sandboxes().get_all(application_id)
+def get_sandbox_by_name(api, application_id, sandbox_name):
+    sandbox_candidates = api.directory.get_sandboxes(application_id)
     if len(sandbox_candidates) == 0:
-        print("No sandboxes found for application " + application_id)
+        logprint("No sandboxes found for application " + application_id, logging.WARNING)
         return None
     else:
         return get_exact_sandbox_name_match(sandbox_name, sandbox_candidates)
 
-def get_sandbox_guids_by_name(results_to_app_ids, results_to_sandbox_names):
+def get_sandbox_guids_by_name(api, results_to_app_ids, results_to_sandbox_names):
     sandbox_ids = []
     names_as_list = [sandbox.strip() for sandbox in results_to_sandbox_names.split(", ")]
 
     for index, sandbox_name in enumerate(names_as_list):
-        sandbox_id = get_sandbox_by_name(results_to_app_ids[index], sandbox_name)
+        sandbox_id = get_sandbox_by_name(api, results_to_app_ids[index], sandbox_name)
         if sandbox_id is not None:
             sandbox_ids.append(sandbox_id)
 
@@ -391,48 +2824,199 @@ def get_exact_application_name_match(application_name, app_candidates):
     for application_candidate in app_candidates:
         if application_candidate["profile"]["name"] == application_name:
             return application_candidate["guid"]
-    print("Unable to find application named " + application_name)
+    logprint("Unable to find application named " + application_name, logging.WARNING)
     return None
 
-def get_application_by_name(application_name):
-    app_candidates = Applications().get_by_name(application_name)
+def get_application_by_name(api, application_name):
+    app_candidates = api.directory.find_applications(application_name)
     if len(app_candidates) == 0:
-        print("Unable to find application named " + application_name)
+        logprint("Unable to find application named " + application_name, logging.WARNING)
         return None
     elif len(app_candidates) > 1:
         return get_exact_application_name_match(application_name, app_candidates)
     else:
         return app_candidates[0].get('guid')
 
-def get_application_guids_by_name(application_names):
+def get_application_guids_by_name(api, application_names):
     application_ids = []
     names_as_list = [application.strip() for application in application_names.split(", ")]
+    api.directory.prefetch(names_as_list)
 
     for application_name in names_as_list:
-        application_id = get_application_by_name(application_name)
+        application_id = get_application_by_name(api, application_name)
         if application_id is not None:
             application_ids.append(application_id)
 
     return application_ids
 
-def get_sca_findings_for(from_app_guid, annotation_type):
-    findings_from_approved = SCAApplications().get_annotations(app_guid=from_app_guid, annotation_type=annotation_type.upper())
-    if findings_from_approved:
-        return findings_from_approved['approved_annotations']
-    return []
+def get_sca_findings_for(api, from_app_guid, annotation_type, cache=None):
+    source = source_label(from_app_guid, None, annotation_type)
+    with run_telemetry().timer('fetch', source):
+        approved_annotations = get_sca_annotations_from(api, from_app_guid, annotation_type, cache)
+    run_telemetry().set_source_findings(source, len(approved_annotations))
+    return approved_annotations
+
+def get_sca_annotations_from(api, from_app_guid, annotation_type, cache=None):
+    if cache is not None:
+        cache_key = (from_app_guid, None, 'SCA', annotation_type.upper())
+        last_scan_date = get_last_scan_date(api, from_app_guid)
+        cached = cache.get(cache_key, last_scan_date)
+        if cached is not None:
+            return cached
+
+    findings_from_approved = api.get_sca_annotations(app_guid=from_app_guid, annotation_type=annotation_type.upper())
+    approved_annotations = findings_from_approved['approved_annotations'] if findings_from_approved else []
+
+    if cache is not None:
+        cache.put(cache_key, last_scan_date, approved_annotations)
+    return approved_annotations
+
+def get_sca_target_annotations(api, to_app_guid, annotation_type):
+    # everything the target holds for comparison with the "from" histories: proposed annotations are not among the
+    # approved ones, and copying them again would queue a second proposal for the same issue
+    responses = [api.get_sca_annotations(app_guid=to_app_guid, annotation_type=annotation_type.upper(), annotation_status=status)
+                 for status in SCA_TARGET_ANNOTATION_STATUSES]
+    return merge_sca_annotation_responses(responses, annotation_type)
+
+def merge_sca_annotation_responses(responses, annotation_type):
+    # every SCA issue in any of the *_annotations lists of the responses, once, with the longest history reported for it
+    merged = {}
+    for response in responses:
+        for name, sca_findings in (response or {}).items():
+            if not (name.endswith('_annotations') and isinstance(sca_findings, list)):
+                continue
+            for sca_finding in sca_findings:
+                key = (sca_finding['component']['id'], sca_issue_id(sca_finding, annotation_type))
+                if key not in merged or len(sca_finding['history']) > len(merged[key]['history']):
+                    merged[key] = sca_finding
+    return list(merged.values())
+
+def log_api_stats(apis):
+    for api in apis:
+        throttle = api.throttle
+        logprint('[*] API calls for {}: {} requests, {} throttled, {} retried'.format(api.base_rest_url, throttle.requests, throttle.throttled, throttle.retried))
+
+def write_run_telemetry(args):
+    telemetry.log_phases()
+    if args.summary_json:
+        telemetry.write_summary(args.summary_json)
+        logprint('[*] Wrote the run summary to {}'.format(args.summary_json))
+    if args.metrics_file:
+        telemetry.write_metrics(args.metrics_file)
+
+def watch_mappings(mappings, options, from_credentials, to_credentials, args, cache=None, incremental=None):
+    watcher = MitigationWatcher(mappings, options, from_credentials, to_credentials, poll_interval=args.poll_interval, coalesce=args.coalesce,
+                                webhook_port=args.webhook_port, workers=max(1, args.workers), cache=cache, dry_run=args.dry_run,
+                                incremental=incremental, stream=args.stream)
+
+    def after_pass(results):
+        # the summary, metrics and --incremental state are brought up to date after every pass
+        log_copy_summary(results)
+        write_run_telemetry(args)
+        if incremental is not None:
+            incremental.save()
+
+    watcher.run(max_passes=args.watch_passes, after_pass=after_pass)
+
+def finish_run_state(args, apis, plan, journal, incremental):
+    log_api_stats(apis)
+    write_run_telemetry(args)
+    if args.record_dir:
+        logprint('[*] Recorded {} API responses in {}'.format(apis[0].recorder.recorded, args.record_dir))
+    if args.directory_snapshot:
+        for api in apis:
+            api.directory.save_snapshot(args.directory_snapshot)
+    if journal is not None:
+        journal.close()
+    if incremental is not None:
+        incremental.save()
+    if plan is not None:
+        plan.close()
+        logprint('[*] Wrote {} planned annotations to {}'.format(plan.count, args.plan))
+
+    logprint('======== ending MitigationCopier.py run ========')
+
+class MitigationCopier():
+    # library entry point, for pipelines that run many copies from one long-lived process. An instance keeps its
+    # API sessions, throttles and application name lookups for every copy it makes, and skips the start-up work
+    # of main(): no argument parsing, no credentials expiry check and no logging setup, so messages go to this
+    # module's logger for the caller to handle. Mappings and options use the --manifest keys, and options are
+    # the defaults for every mapping. Each instance keeps its own run telemetry and incremental state, so copies
+    # through one instance run one at a time while separate instances can copy concurrently.
+    OPTIONS = ('scan_types', 'sca_import_type', 'propose_only', 'id_list', 'skip_id_list', 'fuzzy_match', 'fuzzy_window',
+               'include_original_user', 'include_profile_name', 'include_proposed')
+
+    def __init__(self, from_credentials=None, to_credentials=None, dry_run=False, workers=1, stream=False, use_asyncio=False,
+                 cache_dir=None, cache_ttl=CACHE_TTL_HOURS, cache_max_mb=CACHE_MAX_SIZE_MB, incremental=None, **options):
+        # from_credentials and to_credentials are VeracodeApiCredentials, by default those of the environment or
+        # ~/.veracode/credentials; incremental names an --incremental state file
+        unknown = set(options) - set(self.OPTIONS)
+        if unknown:
+            raise TypeError('unknown options: {}'.format(', '.join(sorted(unknown))))
+        if use_asyncio and aiohttp is None:
+            raise ValueError('use_asyncio requires aiohttp (pip install aiohttp)')
+        if use_asyncio and stream:
+            raise ValueError('use_asyncio cannot be combined with stream')
+        if from_credentials is None:
+            from_credentials = VeracodeApiCredentials(*get_credentials())
+        self.from_credentials = from_credentials
+        self.to_credentials = to_credentials or from_credentials
+        self.dry_run = dry_run
+        self.workers = max(1, workers)
+        self.stream = stream
+        self.use_asyncio = use_asyncio
+        self.cache = FindingsCache(cache_dir, ttl_hours=cache_ttl, max_size_mb=cache_max_mb) if cache_dir and not stream else None
+        self.incremental = IncrementalState(incremental) if incremental and not dry_run else None
+        self.options = dict.fromkeys(self.OPTIONS, None)
+        self.options['fuzzy_window'] = LINE_NUMBER_SLOP
+        self.options.update(options)
+        self.telemetry = RunTelemetry()
+        self._run_lock = threading.Lock()
+
+    def copy(self, plan_file=None, **mapping):
+        # one mapping, e.g. copy(fromapp=guid, toappnames='App A, App B', scan_types='SAST')
+        return self.copy_many([mapping], plan_file=plan_file)
+
+    def copy_many(self, mappings, plan_file=None):
+        # runs the mappings as run_manifest() does, or writes what they would copy to plan_file for --apply.
+        # Returns {'results': {to_app_guid: {label: count}}, 'summary': the --summary_json figures}, plus 'planned'
+        # annotations with a plan_file; a count is None for a copy that failed or a mapping that could not be resolved.
+        with self._run_lock:
+            self.telemetry.reset()
+            token = current_telemetry.set(self.telemetry)
+            plan = MitigationPlanWriter(plan_file) if plan_file else None
+            try:
+                results = run_manifest(mappings, self.options, self.from_credentials, self.to_credentials, dry_run=self.dry_run,
+                                       workers=self.workers, plan=plan, incremental=None if plan else self.incremental,
+                                       cache=self.cache, stream=self.stream, use_asyncio=self.use_asyncio)
+            finally:
+                current_telemetry.reset(token)
+                if plan is not None:
+                    plan.close()
+            copied = {'results': results, 'summary': self.telemetry.summary()}
+            if plan is not None:
+                copied['planned'] = plan.count
+            elif self.incremental is not None:
+                self.incremental.save()
+            return copied
+
+    def credentials_expiration(self):
+        # when the "from" credentials expire, for callers that want main()'s warning; one API call
+        creds = self.from_credentials.api.get_creds()
+        return datetime.datetime.strptime(creds['expiration_ts'], "%Y-%m-%dT%H:%M:%S.%f%z")
 
 def main():
     parser = argparse.ArgumentParser(
         description='This script looks at the results set of the FROM APP. For any flaws that have an '
                     'accepted mitigation, it checks the TO APP to see if that flaw exists. If it exists, '
                     'it copies all mitigation information.')
-    parser.add_argument('-f', '--fromapp', help='App GUID to copy from')
-    parser.add_argument('-fs', '--fromsandbox', help='Sandbox GUID to copy from (optional)')
+    parser.add_argument('-f', '--fromapp', help='App GUID to copy from, or a comma-delimited list of App GUIDs to merge, the first taking precedence')
+    parser.add_argument('-fs', '--fromsandbox', help='Sandbox GUID to copy from (optional) - with several --fromapp, a comma-delimited list in the same order')
     parser.add_argument('-t', '--toapp', help='App GUID to copy to')
     parser.add_argument('-ts', '--tosandbox', help="Sandbox GUID to copy to (optional)")
 
-    parser.add_argument('-fn', '--fromappname', help='Application Name to copy from')
-    parser.add_argument('-fsn', '--fromsandboxname', help='Sandbox Name to copy from')
+    parser.add_argument('-fn', '--fromappname', help='Application Name to copy from, or a comma-delimited list of Application Names to merge, the first taking precedence')
+    parser.add_argument('-fsn', '--fromsandboxname', help='Sandbox Name to copy from - with several --fromappname, a comma-delimited list in the same order')
 
     parser.add_argument('-tn', '--toappnames', help='Comma-delimited list of Application Names to copy to')
     parser.add_argument('-tsn', '--tosandboxnames', help='Comma-delimited list of Sandbox Names to copy to - should be in the same order as --toappnames')
@@ -447,6 +3031,7 @@ def main():
     parser.add_argument('-i','--id_list',nargs='*', help='Only copy mitigations for the flaws in the id_list')
     parser.add_argument('-si','--skip_id_list',nargs='*', help='Skip mitigations for the flaws in the skip_id_list (replaces --id_list)')
     parser.add_argument('-fm','--fuzzy_match',action='store_true', help='Look within a range of line numbers for a matching flaw')
+    parser.add_argument('-fw','--fuzzy_window',type=int, default=LINE_NUMBER_SLOP, help='Number of lines either side of the flaw to search when --fuzzy_match is set (default: {})'.format(LINE_NUMBER_SLOP))
 
     parser.add_argument('-vid','--veracode_api_key_id', help='VERACODE_API_KEY_ID to use (if combined with --to_veracode_api_key_id and --to_veracode_api_key_secret, allows for moving mitigations between different instances of the platform)')
     parser.add_argument('-vkey','--veracode_api_key_secret', help='VERACODE_API_KEY_SECRET to use (if combined with --to_veracode_api_key_id and --to_veracode_api_key_secret, allows for moving mitigations between different instances of the platform)')
@@ -459,20 +3044,76 @@ def main():
 
     parser.add_argument('-ip','--include_proposed',action='store_true', help='Include proposed mitigations in the list of copied mitigation comments')
 
+    parser.add_argument('-w','--workers',type=int, default=1, help='Number of targets and scan types to process concurrently (default: 1)')
+
+    parser.add_argument('-pl','--plan', help='Write the mitigations that would be copied to this JSON Lines plan file instead of applying them')
+    parser.add_argument('-ap','--apply', help='Apply a plan file written by --plan, without fetching or matching findings')
+    parser.add_argument('-j','--journal', help='Record each annotation that is applied, and each target that is completed, in this journal file')
+    parser.add_argument('-r','--resume', action='store_true', help='With --journal, skip the annotations and targets recorded in the journal by a previous run')
+    parser.add_argument('-cd','--cache_dir', help='Cache "from" findings in this directory so later runs copying from the same application can reuse them')
+    parser.add_argument('-ct','--cache_ttl', type=float, default=CACHE_TTL_HOURS, help='Hours a cached result set stays usable (default: {})'.format(CACHE_TTL_HOURS))
+    parser.add_argument('-cm','--cache_max_mb', type=int, default=CACHE_MAX_SIZE_MB, help='Size cap for --cache_dir in MB; least recently used entries are removed first (default: {})'.format(CACHE_MAX_SIZE_MB))
+    parser.add_argument('-nc','--no_cache', action='store_true', help='Ignore --cache_dir and always fetch findings from the API')
+    parser.add_argument('-inc','--incremental', help='Keep per-target watermarks in this state file and only process target findings that are new or changed since the last successful run')
+    parser.add_argument('-sm','--stream', action='store_true', help='Process findings page by page, keeping only the "from" match index and the current "to" page in memory (does not use --cache_dir)')
+    parser.add_argument('-ds','--directory_snapshot', help='Reuse application and sandbox names and GUIDs saved in this file by an earlier run, while younger than --cache_ttl, and save them for the next one')
+    parser.add_argument('-m','--manifest', help='Run every from -> to mapping listed in this YAML, JSON or CSV file in one process; command line options are the defaults for each mapping')
+    parser.add_argument('-rl','--rate_limit', type=float, default=0, help='Most API requests per second for each set of credentials (default: no limit; the number in flight still shrinks when the platform throttles)')
+    parser.add_argument('-mr','--max_retries', type=int, default=API_MAX_RETRIES, help='Retries for throttled API calls and failed reads, with exponential backoff (default: {})'.format(API_MAX_RETRIES))
+    parser.add_argument('-ai','--asyncio', action='store_true', help='Fetch every result set at once and write annotations from a bounded queue, using asyncio and aiohttp (cannot be combined with --stream)')
+    parser.add_argument('-sj','--summary_json', help='Write timings, API call statistics and per-target counts for the run to this JSON file')
+    parser.add_argument('-mf','--metrics_file', help='Write the same figures as Prometheus metrics to this file, for the node exporter\'s textfile collector')
+    parser.add_argument('-rd','--record_dir', help='Save every API response, sanitized, as a fixture in this directory for --replay_dir')
+    parser.add_argument('-rp','--replay_dir', help='Answer API requests from the fixtures in this directory, recorded by --record_dir or written by benchmark.py, instead of the platform')
+    parser.add_argument('-as','--apply_shard', help='With --apply, only apply this share of the plan\'s target applications, given as K/N (e.g. 2/4)')
+    parser.add_argument('-vb','--verbosity', choices=list(VERBOSITY_LEVELS), default='progress', help='Console output: quiet (warnings only), progress (status, sampled progress and summaries), detail (every flaw, as in the log file) or debug (default: progress)')
+    parser.add_argument('-al','--audit_log', help='Append one JSON line for every flaw or SCA issue that is skipped, matched, applied or failed to this file')
+    parser.add_argument('-wa','--watch', action='store_true', help='After copying, keep running and copy again into targets with a new scan, and from "from" applications with one')
+    parser.add_argument('-pi','--poll_interval', type=float, default=WATCH_POLL_SECONDS, help='With --watch, seconds between checks of the last scan dates; 0 to rely on --webhook_port only (default: {})'.format(WATCH_POLL_SECONDS))
+    parser.add_argument('-wh','--webhook_port', type=int, help='With --watch, accept scan-complete notifications as POST requests naming an app_guid on this port on 127.0.0.1')
+    parser.add_argument('-co','--coalesce', type=float, default=WATCH_COALESCE_SECONDS, help='With --watch, seconds to wait after a new scan for others before copying (default: {})'.format(WATCH_COALESCE_SECONDS))
+    parser.add_argument('-wn','--watch_passes', type=int, help='With --watch, stop after this many copy passes, including the first (default: run until interrupted)')
+
     args = parser.parse_args()
+    telemetry.reset()
 
-    setup_logger()
+    if args.asyncio and aiohttp is None:
+        print('--asyncio requires aiohttp (pip install aiohttp).')
+        return
+    if args.asyncio and args.stream:
+        print('--asyncio cannot be combined with --stream.')
+        return
+    if args.watch and (args.asyncio or args.journal or args.plan or args.apply):
+        print('--watch cannot be combined with --asyncio, --journal, --plan or --apply.')
+        return
+    if args.watch and not args.poll_interval and args.webhook_port is None:
+        print('--watch needs a --poll_interval or a --webhook_port.')
+        return
+    if args.plan and args.apply:
+        print('--plan cannot be combined with --apply.')
+        return
+    if args.resume and not args.journal:
+        print('--resume needs --journal.')
+        return
+    if args.apply_shard is not None and (not args.apply or parse_shard(args.apply_shard) is None):
+        print('--apply_shard needs --apply and a value K/N with 1 <= K <= N, e.g. 2/4.')
+        return
 
-    logprint('======== beginning MitigationCopier.py run ========')
+    listener = setup_logger(args.verbosity, args.audit_log)
+    try:
+        copy_mitigations(args)
+    finally:
+        listener.stop()
+        log.handlers = []
 
-    # CHECK FOR CREDENTIALS EXPIRATION
-    creds_expire_days_warning()
+def copy_mitigations(args):
+    logprint('======== beginning MitigationCopier.py run ========')
 
     # SET VARIABLES FOR FROM AND TO APPS
     results_from_app_id = args.fromapp
     results_to_app_ids = [args.toapp]
     results_from_sandbox_id = args.fromsandbox
-    results_to_sandbox_ids = args.tosandbox
+    results_to_sandbox_ids = [args.tosandbox] if args.tosandbox else None
 
     results_from_app_name = args.fromappname
     results_from_sandbox_name = args.fromsandboxname
@@ -488,6 +3129,7 @@ def main():
     id_list = [int(id) for id in args.id_list] if args.id_list else None
     skip_id_list = [int(id) for id in args.skip_id_list] if args.skip_id_list else None
     fuzzy_match = args.fuzzy_match
+    fuzzy_window = args.fuzzy_window
     
     from_credentials = None
     to_credentials = None
@@ -496,34 +3138,108 @@ def main():
     include_profile_name = args.include_profile_name
 
     include_proposed = args.include_proposed
+    workers = max(1, args.workers)
+    plan = MitigationPlanWriter(args.plan) if args.plan and not args.apply else None
+    stream = args.stream
+    cache = FindingsCache(args.cache_dir, ttl_hours=args.cache_ttl, max_size_mb=args.cache_max_mb) if args.cache_dir and not args.no_cache and not stream else None
+    journal = None
+    incremental = IncrementalState(args.incremental) if args.incremental and not dry_run and not args.plan else None
 
     if args.veracode_api_key_id and args.veracode_api_key_secret:
-        from_credentials = VeracodeApiCredentials(args.veracode_api_key_id, args.veracode_api_key_secret)
+        from_credentials = VeracodeApiCredentials(args.veracode_api_key_id, args.veracode_api_key_secret, rate_limit=args.rate_limit, max_retries=args.max_retries)
     else:
         api_key_id, api_key_secret = get_credentials()
-        from_credentials = VeracodeApiCredentials(api_key_id, api_key_secret)
+        from_credentials = VeracodeApiCredentials(api_key_id, api_key_secret, rate_limit=args.rate_limit, max_retries=args.max_retries)
     
     if args.to_veracode_api_key_id and args.to_veracode_api_key_secret:
-        to_credentials = VeracodeApiCredentials(args.to_veracode_api_key_id, args.to_veracode_api_key_secret)
+        to_credentials = VeracodeApiCredentials(args.to_veracode_api_key_id, args.to_veracode_api_key_secret, rate_limit=args.rate_limit, max_retries=args.max_retries)
     elif from_credentials:
         to_credentials = from_credentials
 
+    apis = [from_credentials.api] if to_credentials is from_credentials else [from_credentials.api, to_credentials.api]
+    if args.replay_dir:
+        replay_server = FixtureReplayServer(ApiFixtures(args.replay_dir))
+        logprint('Replaying API responses from {}'.format(args.replay_dir))
+        for api in apis:
+            api.base_rest_url = replay_server.url
+    if args.record_dir:
+        # one key for both sets of credentials, so a value gets the same pseudonym in the "from" and "to" responses
+        recorder = ApiFixtures(args.record_dir, sanitize_key=from_credentials.api_key_secret)
+        for api in apis:
+            api.recorder = recorder
+
+    # CHECK FOR CREDENTIALS EXPIRATION
+    creds_expire_days_warning(from_credentials.api)
+
+    if args.directory_snapshot:
+        for api in apis:
+            api.directory.load_snapshot(args.directory_snapshot, ttl_hours=args.cache_ttl)
+
+    if args.journal and not dry_run and plan is None:
+        journal = MitigationJournal(args.journal, resume=args.resume)
+
+    if args.apply:
+        apply_shard = parse_shard(args.apply_shard) if args.apply_shard else None
+        log_copy_summary(apply_plan(to_credentials.api, args.apply, workers=workers, propose_only=propose_only, shard=apply_shard, journal=journal))
+        log_api_stats(apis)
+        write_run_telemetry(args)
+        if journal is not None:
+            journal.close()
+        logprint('======== ending MitigationCopier.py run ========')
+        return
+
+    finish_run = functools.partial(finish_run_state, args, apis, plan, journal, incremental)
+    manifest_options = {'scan_types': scan_types, 'sca_import_type': sca_import_type, 'propose_only': propose_only,
+                        'id_list': id_list, 'skip_id_list': skip_id_list, 'fuzzy_match': fuzzy_match, 'fuzzy_window': fuzzy_window,
+                        'include_original_user': include_original_user, 'include_profile_name': include_profile_name,
+                        'include_proposed': include_proposed}
+
+    if args.manifest and args.watch:
+        watch_mappings(read_manifest(args.manifest), manifest_options, from_credentials, to_credentials, args, cache=cache, incremental=incremental)
+        finish_run()
+        return
+
+    if args.manifest:
+        manifest = read_manifest(args.manifest)
+        copy_results = run_manifest(manifest, manifest_options, from_credentials, to_credentials, dry_run=dry_run, workers=workers,
+                                    plan=plan, journal=journal, incremental=incremental, cache=cache, stream=stream, use_asyncio=args.asyncio)
+        log_copy_summary(copy_results)
+        log_copy_totals(copy_results, len(manifest))
+        finish_run()
+        return
+
+    if not prompt and (len(manifest_list(results_from_app_id)) > 1 or len(manifest_list(results_from_app_name)) > 1):
+        # several "from" applications are merged into each target by the manifest engine, as a single mapping
+        mapping = {'fromapp': results_from_app_id, 'fromsandbox': results_from_sandbox_id, 'fromappname': results_from_app_name,
+                   'fromsandboxname': results_from_sandbox_name, 'toapp': args.toapp, 'tosandbox': args.tosandbox,
+                   'toappnames': results_to_app_names, 'tosandboxnames': results_to_sandbox_names}
+        if legacy_ids:
+            mapping['fromapp'] = [get_app_guid_from_legacy_id(from_credentials.api, app_id) for app_id in manifest_list(results_from_app_id)]
+            mapping['toapp'] = [get_app_guid_from_legacy_id(to_credentials.api, app_id) for app_id in manifest_list(args.toapp)]
+        if args.watch:
+            watch_mappings([mapping], manifest_options, from_credentials, to_credentials, args, cache=cache, incremental=incremental)
+        else:
+            copy_results = run_manifest([mapping], manifest_options, from_credentials, to_credentials, dry_run=dry_run, workers=workers,
+                                        plan=plan, journal=journal, incremental=incremental, cache=cache, stream=stream, use_asyncio=args.asyncio)
+            log_copy_summary(copy_results)
+        finish_run()
+        return
 
     if prompt:
-        results_from_app_id = from_credentials.run_with_credentials(lambda _:  prompt_for_app("Enter the application name to copy mitigations from: "))
-        results_to_app_ids = to_credentials.run_with_credentials(lambda _: [prompt_for_app("Enter the application name to copy mitigations to: ")])
+        results_from_app_id = prompt_for_app(from_credentials.api, "Enter the application name to copy mitigations from: ")
+        results_to_app_ids = [prompt_for_app(to_credentials.api, "Enter the application name to copy mitigations to: ")]
         # ignore Sandbox arguments in the Prompt case
         results_from_sandbox_id = None
         results_to_sandbox_ids = None
     else:
         if results_from_app_name:
-            results_from_app_id = from_credentials.run_with_credentials(lambda _: get_application_guids_by_name(results_from_app_name)[0])
+            results_from_app_id = get_application_guids_by_name(from_credentials.api, results_from_app_name)[0]
         if results_from_sandbox_name:
-            results_from_sandbox_id = from_credentials.run_with_credentials(lambda _: get_sandbox_guids_by_name([results_from_app_id], results_from_sandbox_name)[0])
+            results_from_sandbox_id = get_sandbox_guids_by_name(from_credentials.api, [results_from_app_id], results_from_sandbox_name)[0]
         if results_to_app_names:
-            results_to_app_ids = to_credentials.run_with_credentials(lambda _: get_application_guids_by_name(results_to_app_names))
+            results_to_app_ids = get_application_guids_by_name(to_credentials.api, results_to_app_names)
         if results_to_sandbox_names:
-            results_to_sandbox_ids = to_credentials.run_with_credentials(lambda _: get_sandbox_guids_by_name(results_to_app_ids, results_to_sandbox_names))
+            results_to_sandbox_ids = get_sandbox_guids_by_name(to_credentials.api, results_to_app_ids, results_to_sandbox_names)
 
     is_sast = False
     is_dast = False
@@ -543,50 +3259,103 @@ def main():
             else:
                 is_sca_vulnerabilities = True
                 is_sca_licences = True
-        if not is_dast and not is_sast and not is_sca_licences and not is_sca_licences:
-            print('No valid scan types were provided.')
-            print('Valid scan_types are: DAST, SAST, SCA.')
-            print('Valid sca_import_type are: licenses, vulnerabilities.')
+        if not is_dast and not is_sast and not is_sca_vulnerabilities and not is_sca_licences:
+            logprint('No valid scan types were provided.', logging.ERROR)
+            logprint('Valid scan_types are: DAST, SAST, SCA.', logging.ERROR)
+            logprint('Valid sca_import_type are: licenses, vulnerabilities.', logging.ERROR)
             return        
     else:
         is_sast = True
         is_dast = True
 
     if results_from_app_id in ( None, '' ) or results_to_app_ids in ( None, '' ):
-        print('You must provide an application to copy mitigations to and from.')
+        logprint('You must provide an application to copy mitigations to and from.', logging.ERROR)
         return
 
     if legacy_ids:
-        results_from = from_credentials.run_with_credentials(lambda _: get_app_guid_from_legacy_id(results_from_app_id))
-        results_to = to_credentials.run_with_credentials(lambda _: get_app_guid_from_legacy_id(results_to_app_ids))
+        results_from = get_app_guid_from_legacy_id(from_credentials.api, results_from_app_id)
+        results_to = get_app_guid_from_legacy_id(to_credentials.api, results_to_app_ids)
         results_from_app_id = results_from
         results_to_app_ids = results_to
 
-    # get static findings and apply mitigations
-    if is_sast:
-        all_static_findings = from_credentials.run_with_credentials(lambda _: get_findings_from(from_app_guid=results_from_app_id, scan_type='STATIC',
-            from_sandbox_guid=results_from_sandbox_id))
-    if is_dast:
-        all_dynamic_findings = from_credentials.run_with_credentials(lambda _: get_findings_from(from_app_guid=results_from_app_id, scan_type='DYNAMIC',
-            from_sandbox_guid=results_from_sandbox_id))
+    if args.watch:
+        mapping = {'fromapp': results_from_app_id, 'fromsandbox': results_from_sandbox_id, 'toapp': results_to_app_ids, 'tosandbox': results_to_sandbox_ids}
+        watch_mappings([mapping], manifest_options, from_credentials, to_credentials, args, cache=cache, incremental=incremental)
+        finish_run()
+        return
+
+    if args.asyncio:
+        # the asyncio engine runs this copy as a manifest with a single mapping
+        mapping = {'fromapp': results_from_app_id, 'fromsandbox': results_from_sandbox_id, 'toapp': results_to_app_ids, 'tosandbox': results_to_sandbox_ids}
+        copy_results = run_manifest([mapping], manifest_options, from_credentials, to_credentials, dry_run=dry_run, workers=workers,
+                                    plan=plan, journal=journal, incremental=incremental, cache=cache, use_asyncio=True)
+        log_copy_summary(copy_results)
+        finish_run()
+        return
+
+    # get the "from" findings; with --workers the scan types are fetched at the same time
+    source_fetches = {}
+    if stream:
+        # with --stream the "from" findings go straight into their match index, page by page
+        if is_sast:
+            source_fetches['STATIC'] = functools.partial(get_match_index_from, from_credentials.api, from_app_guid=results_from_app_id, scan_type='STATIC',
+                from_sandbox_guid=results_from_sandbox_id, approved_matches_only=(not include_proposed), fuzzy_window=fuzzy_window)
+        if is_dast:
+            source_fetches['DYNAMIC'] = functools.partial(get_match_index_from, from_credentials.api, from_app_guid=results_from_app_id, scan_type='DYNAMIC',
+                approved_matches_only=(not include_proposed))
+    else:
+        if is_sast:
+            source_fetches['STATIC'] = functools.partial(get_findings_from, from_credentials.api, from_app_guid=results_from_app_id, scan_type='STATIC',
+                from_sandbox_guid=results_from_sandbox_id, cache=cache)
+        if is_dast:
+            source_fetches['DYNAMIC'] = functools.partial(get_findings_from, from_credentials.api, from_app_guid=results_from_app_id, scan_type='DYNAMIC',
+                cache=cache)
+    if is_sca_vulnerabilities:
+        source_fetches['vulnerability'] = functools.partial(get_sca_findings_for, from_credentials.api, from_app_guid=results_from_app_id, annotation_type="vulnerability", cache=cache)
+    if is_sca_licences:
+        source_fetches['license'] = functools.partial(get_sca_findings_for, from_credentials.api, from_app_guid=results_from_app_id, annotation_type="license", cache=cache)
+    source_findings = fetch_all(source_fetches, workers=workers)
+
+    # build the match indexes once, they are reused for every target
+    if stream:
+        all_static_findings = all_dynamic_findings = None
+        static_match_index = source_findings.get('STATIC')
+        dynamic_match_index = source_findings.get('DYNAMIC')
+    else:
+        if is_sast:
+            all_static_findings = source_findings['STATIC']
+            with telemetry.timer('index', source_label(results_from_app_id, results_from_sandbox_id, 'STATIC')):
+                static_match_index = FindingsMatchIndex(all_static_findings, 'STATIC', approved_matches_only=(not include_proposed), fuzzy_window=fuzzy_window)
+        if is_dast:
+            all_dynamic_findings = source_findings['DYNAMIC']
+            with telemetry.timer('index', source_label(results_from_app_id, None, 'DYNAMIC')):
+                dynamic_match_index = FindingsMatchIndex(all_dynamic_findings, 'DYNAMIC', approved_matches_only=(not include_proposed))
     if is_sca_vulnerabilities:
-        all_sca_vulnerabilities = from_credentials.run_with_credentials(lambda _: get_sca_findings_for(from_app_guid=results_from_app_id, annotation_type="vulnerability"))
+        all_sca_vulnerabilities = source_findings['vulnerability']
     if is_sca_licences:
-        all_sca_licenses = from_credentials.run_with_credentials(lambda _: get_sca_findings_for(from_app_guid=results_from_app_id, annotation_type="license"))
+        all_sca_licenses = source_findings['license']
 
+    copy_tasks = []
+    target_sca_indexes = {} # SCA annotations belong to the application, so each target application is copied to once per type
     for index, to_app_id in enumerate(results_to_app_ids):
+        to_sandbox_id = results_to_sandbox_ids[index] if results_to_sandbox_ids else None
+        target_status = TargetStatusIndex() # shared by the SAST and DAST passes of this target
         if is_sast:
-            match_for_scan_type(all_static_findings, from_app_guid=results_from_app_id, to_app_guid=to_app_id, dry_run=dry_run, scan_type='STATIC',
-                from_sandbox_guid=results_from_sandbox_id,to_sandbox_guid=results_to_sandbox_ids[index] if results_to_sandbox_ids else None,propose_only=propose_only,id_list=id_list,skip_id_list=skip_id_list,fuzzy_match=fuzzy_match, from_credentials=from_credentials, to_credentials=to_credentials, include_original_user=include_original_user, include_profile_name=include_profile_name, include_proposed=include_proposed)
+            copy_tasks.append((to_app_id, copy_label('SAST', to_sandbox_id), functools.partial(match_for_scan_type, all_static_findings, from_app_guid=results_from_app_id, to_app_guid=to_app_id, dry_run=dry_run, scan_type='STATIC',
+                from_sandbox_guid=results_from_sandbox_id,to_sandbox_guid=to_sandbox_id,propose_only=propose_only,id_list=id_list,skip_id_list=skip_id_list,fuzzy_match=fuzzy_match, from_credentials=from_credentials, to_credentials=to_credentials, include_original_user=include_original_user, include_profile_name=include_profile_name, include_proposed=include_proposed, match_index=static_match_index, fuzzy_window=fuzzy_window, plan=plan, journal=journal, incremental=incremental, stream=stream, target_status=target_status)))
         if is_dast:
-            match_for_scan_type(all_dynamic_findings, from_app_guid=results_from_app_id, to_app_guid=to_app_id, dry_run=dry_run,
-                scan_type='DYNAMIC',propose_only=propose_only,id_list=id_list,skip_id_list=skip_id_list, from_credentials=from_credentials, to_credentials=to_credentials, include_original_user=include_original_user, include_profile_name=include_profile_name, include_proposed=include_proposed)
-        if is_sca_vulnerabilities:
-            match_sca(all_sca_vulnerabilities, from_app_guid=results_from_app_id, to_app_guid=to_app_id, dry_run=dry_run,annotation_type="vulnerability",propose_only=propose_only, from_credentials=from_credentials, to_credentials=to_credentials, include_original_user=include_original_user, include_profile_name=include_profile_name)
-        if is_sca_licences:
-            match_sca(all_sca_licenses, from_app_guid=results_from_app_id, to_app_guid=to_app_id, dry_run=dry_run,annotation_type="license",propose_only=propose_only, from_credentials=from_credentials, to_credentials=to_credentials, include_original_user=include_original_user, include_profile_name=include_profile_name)
-
-    logprint('======== ending MitigationCopier.py run ========')
+            copy_tasks.append((to_app_id, copy_label('DAST', to_sandbox_id), functools.partial(match_for_scan_type, all_dynamic_findings, from_app_guid=results_from_app_id, to_app_guid=to_app_id, dry_run=dry_run,
+                scan_type='DYNAMIC',propose_only=propose_only,id_list=id_list,skip_id_list=skip_id_list, from_credentials=from_credentials, to_credentials=to_credentials, include_original_user=include_original_user, include_profile_name=include_profile_name, include_proposed=include_proposed, match_index=dynamic_match_index, plan=plan, journal=journal, incremental=incremental, stream=stream, target_status=target_status)))
+        if is_sca_vulnerabilities and (to_app_id, 'vulnerability') not in target_sca_indexes:
+            target_sca = target_sca_indexes.setdefault((to_app_id, 'vulnerability'), TargetScaIndex())
+            copy_tasks.append((to_app_id, 'SCA vulnerabilities', functools.partial(match_sca, all_sca_vulnerabilities, from_app_guid=results_from_app_id, to_app_guid=to_app_id, dry_run=dry_run,annotation_type="vulnerability",propose_only=propose_only, from_credentials=from_credentials, to_credentials=to_credentials, include_original_user=include_original_user, include_profile_name=include_profile_name, plan=plan, journal=journal, incremental=incremental, target_sca=target_sca)))
+        if is_sca_licences and (to_app_id, 'license') not in target_sca_indexes:
+            target_sca = target_sca_indexes.setdefault((to_app_id, 'license'), TargetScaIndex())
+            copy_tasks.append((to_app_id, 'SCA licenses', functools.partial(match_sca, all_sca_licenses, from_app_guid=results_from_app_id, to_app_guid=to_app_id, dry_run=dry_run,annotation_type="license",propose_only=propose_only, from_credentials=from_credentials, to_credentials=to_credentials, include_original_user=include_original_user, include_profile_name=include_profile_name, plan=plan, journal=journal, incremental=incremental, target_sca=target_sca)))
+
+    copy_results = run_copy_tasks(copy_tasks, workers=workers)
+    log_copy_summary(copy_results)
+    finish_run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,497 @@
+import sys
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+import uuid
+import functools
+import datetime
+import gc
+import tracemalloc
+from urllib import parse
+
+import MitigationCopier as copier
+
+# Synthetic API data, fixtures and an end-to-end benchmark suite for MitigationCopier.py.
+#
+#   python benchmark.py generate --findings 10000 --targets 50 --fixture_dir fixtures/10k-50
+#   python benchmark.py run --output results.json
+#   python benchmark.py run --baseline results.json --max_regression 20
+#   python benchmark.py check
+#
+# Each benchmark run replays a synthetic tenant through --replay_dir in a separate process, so the
+# figures cover the whole tool (replay server included) and the process's peak memory is its own.
+# The checks measure how the tool scales and exit with status 1 if it does not scale as it should.
+
+BENCHMARK_KEY_ID = '0' * 32 # the replay server does not check signatures, but the clients still sign every request
+BENCHMARK_KEY_SECRET = '0' * 128
+DEFAULT_SCALES = '1000x1,10000x1,100000x1,1000x50,1000x500' # findings x targets
+DEFAULT_SCENARIOS = 'findings,sca'
+GENERATOR_VERSION = 2 # bump when the synthetic data changes, so cached fixtures are generated again
+SCAN_TYPES = {'findings': 'SAST, DAST', 'sca': 'SCA'}
+DEFAULT_CHECKS = 'fuzzy,memory,status,records'
+FUZZY_SCALES = '10000,50000,100000' # "from" findings
+FUZZY_SAMPLE = 50 # target findings also looked up with Findings().match, which walks the whole "from" list for each
+FUZZY_MIN_SPEEDUP = 10.0
+MEMORY_SCALE = '100000x1'
+STATUS_SCALES = '25000,50000' # target findings, with as many "from" findings
+STATUS_MAX_GROWTH = 3.0 # matching time may grow by this much when the target doubles: 2 is linear, 4 quadratic
+RECORDS_SCALE = 100000 # "from" findings
+RECORDS_MAX_MEMORY = 0.6 # MatchRecords may hold at most this share of the memory the match dicts did
+RECORDS_MAX_SLOWDOWN = 1.5 # and take at most this many times as long to build
+
+STATIC_CWES = [79, 80, 89, 117, 201, 259, 311, 327, 352, 601, 611, 73]
+DYNAMIC_CWES = [79, 89, 200, 352, 601, 693, 614, 16]
+MITIGATION_ACTIONS = ['APPDESIGN', 'NETENV', 'OSENV', 'FP', 'LIBRARY']
+SCA_MITIGATION_ACTIONS = ['BYDESIGN', 'BYENV', 'FP', 'ACCEPTRISK']
+COMMENTS = ['Input is validated by the framework before it reaches this call.',
+            'Only reachable from the admin console, which sits behind the VPN.',
+            'Value comes from configuration, not from the user.',
+            'Encoded by the templating engine on output.',
+            'Covered by the WAF rule set for this application.',
+            'Library call is never made with untrusted data.',
+            'Accepted by the security team for this release.',
+            'False positive, the tainted path cannot be reached.']
+
+def guid(name):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, 'mitigation-copier-benchmark/' + name))
+
+class SyntheticTenant():
+    # a deterministic tenant with one "from" application and any number of targets. The targets share part of
+    # the source's flaw locations (some a line or two away, for fuzzy matching), so matches, already mitigated
+    # flaws and new flaws all occur. Answers requests through response(), like ApiFixtures, so it can be served
+    # by FixtureReplayServer or written out as fixtures.
+    def __init__(self, findings=1000, targets=1, target_findings=None, sca_annotations=None, overlap=0.6, seed=0):
+        self.findings = findings
+        self.target_findings = target_findings if target_findings is not None else findings
+        self.sca_annotations = sca_annotations if sca_annotations is not None else findings
+        self.overlap = overlap
+        self.seed = seed
+        self.source_guid = guid('source')
+        self.target_guids = [guid('target-{}'.format(number)) for number in range(1, targets + 1)]
+        self.names = {self.source_guid: 'Benchmark Source'}
+        self.names.update({target_guid: 'Benchmark Target {}'.format(number) for number, target_guid in enumerate(self.target_guids, start=1)})
+
+    def _static_details(self, site, drift=0):
+        return {'cwe': {'id': STATIC_CWES[site % len(STATIC_CWES)]}, 'file_path': 'src/main/java/com/bench/m{}/File{}.java'.format(site % 200, site % 997),
+                'file_line_number': (site * 7) % 400 + 1 + drift, 'procedure': 'com.bench.File{}.method{}'.format(site % 997, site % 13),
+                'relative_location': site % 100}
+
+    def _dynamic_details(self, site, drift=0):
+        return {'cwe': {'id': DYNAMIC_CWES[site % len(DYNAMIC_CWES)]}, 'path': '/app/page{}/action{}'.format(site % 500, site % 37),
+                'vulnerable_parameter': 'p{}'.format(site % 11)}
+
+    def _history(self, rnd, status):
+        # oldest first; the API lists the most recent annotation first
+        history = [rnd.choice(MITIGATION_ACTIONS)]
+        if rnd.random() < 0.3:
+            history.append('COMMENT')
+        if status == 'APPROVED':
+            history.append('APPROVED')
+        return [{'action': action, 'comment': rnd.choice(COMMENTS), 'user_name': 'user{}'.format(rnd.randrange(20)),
+                 'created': '2026-01-01T00:00:00.000Z'} for action in reversed(history)]
+
+    def _finding(self, issue_id, scan_type, details, status, rnd):
+        annotations = self._history(rnd, status) if status in ('APPROVED', 'PROPOSED') else []
+        return {'issue_id': issue_id, 'scan_type': scan_type, 'description': 'Synthetic finding',
+                'finding_status': {'resolution_status': status, 'status': 'OPEN', 'resolution': 'MITIGATED' if annotations else 'UNRESOLVED'},
+                'finding_details': details, 'annotations': annotations}
+
+    @functools.lru_cache(maxsize=8)
+    def app_findings(self, app_guid, scan_type):
+        count = self.findings if app_guid == self.source_guid else self.target_findings
+        if scan_type == 'DYNAMIC':
+            count //= 10
+        elif scan_type != 'STATIC':
+            return []
+        details = self._static_details if scan_type == 'STATIC' else self._dynamic_details
+        id_offset = 0 if scan_type == 'STATIC' else 10000000 # issue IDs are unique across scan types
+        rnd = random.Random('{}:{}:{}'.format(self.seed, app_guid, scan_type))
+        if app_guid == self.source_guid:
+            statuses = rnd.choices(['APPROVED', 'PROPOSED', 'UNRESOLVED'], weights=[35, 10, 55], k=count)
+            return [self._finding(id_offset + site + 1, scan_type, details(site), statuses[site], rnd) for site in range(count)]
+        target_number = self.target_guids.index(app_guid)
+        findings = []
+        for index in range(count):
+            if rnd.random() < self.overlap:
+                site = rnd.randrange(self.findings // (10 if scan_type == 'DYNAMIC' else 1) or 1)
+                drift = 0 if rnd.random() < 0.8 else rnd.choice([-2, -1, 1, 2])
+            else:
+                site = self.findings + target_number * count + index # not in the source
+                drift = 0
+            status = 'APPROVED' if rnd.random() < 0.1 else 'UNRESOLVED'
+            findings.append(self._finding(id_offset + index + 1, scan_type, details(site, drift), status, rnd))
+        return findings
+
+    @functools.lru_cache(maxsize=4)
+    def sca_findings(self, app_guid, annotation_type):
+        if app_guid != self.source_guid:
+            return []
+        count = self.sca_annotations if annotation_type == 'VULNERABILITY' else max(1, self.sca_annotations // 10)
+        rnd = random.Random('{}:{}:{}'.format(self.seed, app_guid, annotation_type))
+        annotations = []
+        for index in range(count):
+            component = index % (count // 3 + 1)
+            history = [rnd.choice(SCA_MITIGATION_ACTIONS), 'APPROVE']
+            annotation = {'component': {'id': 'component-{}'.format(component), 'filename': 'library{}-1.{}.jar'.format(component, component % 10)},
+                          'history': [{'annotation_action': action, 'comment': rnd.choice(COMMENTS), 'user_name': 'user{}'.format(rnd.randrange(20))}
+                                      for action in reversed(history)]}
+            if annotation_type == 'VULNERABILITY':
+                annotation['vulnerability'] = {'cve_name': 'CVE-2024-{}'.format(10000 + index)}
+            else:
+                annotation['license'] = {'license_id': 'LICENSE-{}'.format(index % 40)}
+            annotations.append(annotation)
+        return annotations
+
+    def _application(self, app_guid):
+        return {'guid': app_guid, 'profile': {'name': self.names[app_guid]}, 'last_completed_scan_date': '2026-01-01T00:00:00.000Z'}
+
+    def _page(self, items, query, element):
+        size = int(query.get('size', 50))
+        page = int(query.get('page', 0))
+        total_pages = (len(items) + size - 1) // size
+        body = {'page': {'size': size, 'number': page, 'total_pages': total_pages, 'total_elements': len(items)}}
+        if items:
+            body['_embedded'] = {element: items[page * size:(page + 1) * size]}
+        return 200, body
+
+    def response(self, method, path_url):
+        if method != 'GET':
+            return 200, None # annotation writes are accepted
+        parsed = parse.urlsplit(path_url)
+        query = dict(parse.parse_qsl(parsed.query, keep_blank_values=True))
+        parts = parsed.path.strip('/').split('/')
+        if parts == ['api', 'authn', 'v2', 'api_credentials']:
+            return 200, {'api_id': 'benchmark', 'expiration_ts': '2099-01-01T00:00:00.000+0000'}
+        if parts[0:3] == ['appsec', 'v1', 'applications']:
+            if len(parts) == 3:
+                name = parse.unquote(query.get('name', '')).lower()
+                return self._page([self._application(app_guid) for app_guid, app_name in self.names.items() if name in app_name.lower()], query, 'applications')
+            if parts[3] in self.names:
+                if len(parts) == 4:
+                    return 200, self._application(parts[3])
+                if parts[4:] == ['sandboxes']:
+                    return self._page([], query, 'sandboxes')
+        if parts[0:3] == ['appsec', 'v2', 'applications'] and parts[3] in self.names and parts[4:] == ['findings']:
+            return self._page(self.app_findings(parts[3], query.get('scan_type', 'STATIC')), query, 'findings')
+        if parts[0:3] == ['srcclr', 'v3', 'applications'] and parts[3] in self.names and parts[4:] == ['sca_annotations']:
+            if query.get('annotation_status') == 'PROPOSED':
+                return 200, {'approved_annotations': []} # nothing is waiting for approval
+            return 200, {'approved_annotations': self.sca_findings(parts[3], query.get('annotation_type'))}
+        return 404, {'message': 'not found'}
+
+    def requests(self):
+        # every read the tool makes of this tenant, as (path, params) pairs
+        paged = {'size': copier.PAGE_SIZE, 'page': 0}
+        yield 'api/authn/v2/api_credentials', {}
+        for page in range((len(self.names) + copier.PAGE_SIZE - 1) // copier.PAGE_SIZE):
+            yield 'appsec/v1/applications', dict(paged, page=page)
+        for app_guid, app_name in self.names.items():
+            yield 'appsec/v1/applications', dict(paged, name=parse.quote(app_name))
+            yield 'appsec/v1/applications/{}'.format(app_guid), {}
+            yield 'appsec/v1/applications/{}/sandboxes'.format(app_guid), paged
+            for scan_type in ('STATIC', 'DYNAMIC'):
+                for page in range(max(1, (len(self.app_findings(app_guid, scan_type)) + copier.PAGE_SIZE - 1) // copier.PAGE_SIZE)):
+                    yield 'appsec/v2/applications/{}/findings'.format(app_guid), {'scan_type': scan_type, 'include_annot': 'TRUE', 'size': copier.PAGE_SIZE, 'page': page}
+            for annotation_type in ('VULNERABILITY', 'LICENSE'):
+                yield 'srcclr/v3/applications/{}/sca_annotations'.format(app_guid), {'annotation_type': annotation_type}
+                yield 'srcclr/v3/applications/{}/sca_annotations'.format(app_guid), {'annotation_type': annotation_type, 'annotation_status': 'PROPOSED'}
+
+    def manifest(self, scan_types):
+        return [{'fromapp': self.source_guid, 'toapp': self.target_guids, 'scan_types': scan_types}]
+
+def write_fixtures(tenant, fixture_dir):
+    fixtures = copier.ApiFixtures(fixture_dir)
+    count = 0
+    for path, params in tenant.requests():
+        status, body = tenant.response('GET', '/{}?{}'.format(path, parse.urlencode(params)))
+        fixtures.put('GET', path, list(params.items()), status, body)
+        count += 1
+    for scenario, scan_types in SCAN_TYPES.items():
+        with open(os.path.join(fixture_dir, 'manifest-{}.json'.format(scenario)), 'w', encoding='utf8') as f:
+            json.dump(tenant.manifest(scan_types), f, indent=2)
+    return count
+
+def parse_scales(scales):
+    return [tuple(int(part) for part in scale.strip().lower().split('x')) for scale in scales.split(',') if scale.strip()]
+
+def get_fixture_dir(work_dir, findings, targets):
+    # generated once per scale and reused by later runs. A process starts with the peak memory of the one that
+    # started it, so the tenant is generated in a process of its own rather than counting towards every run.
+    fixture_dir = os.path.join(work_dir, 'v{}-{}x{}'.format(GENERATOR_VERSION, findings, targets))
+    if not os.path.exists(os.path.join(fixture_dir, 'manifest-findings.json')):
+        print('Generating fixtures for {} findings x {} targets in {}'.format(findings, targets, fixture_dir))
+        subprocess.run([sys.executable, os.path.abspath(__file__), 'generate', '--findings', str(findings), '--targets', str(targets),
+                        '--fixture_dir', fixture_dir], stdout=subprocess.DEVNULL, check=True)
+    return fixture_dir
+
+def run_scenario(fixture_dir, scenario, engine, workers, work_dir, stream=False):
+    # runs MitigationCopier.py against the fixtures in its own process; returns runtime, peak memory and request counts
+    summary_file = os.path.join(work_dir, 'summary.json')
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'MitigationCopier.py'),
+               '-vid', BENCHMARK_KEY_ID, '-vkey', BENCHMARK_KEY_SECRET, '--replay_dir', fixture_dir,
+               '--manifest', os.path.join(fixture_dir, 'manifest-{}.json'.format(scenario)), '--workers', str(workers), '--summary_json', summary_file]
+    if engine == 'asyncio':
+        command.append('--asyncio')
+    if stream:
+        command.append('--stream')
+    started = time.monotonic()
+    process = subprocess.Popen(command, cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = process.stderr.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.monotonic() - started
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError('{} failed: {}'.format(' '.join(command), stderr.decode('utf8', 'replace')))
+    with open(summary_file, encoding='utf8') as f:
+        summary = json.load(f)
+    totals = summary['totals']
+    calls = {}
+    for stats in summary['http']:
+        calls[stats['method']] = calls.get(stats['method'], 0) + stats['calls']
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_memory_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return {'seconds': round(seconds, 3), 'peak_memory_mb': round(peak_memory_mb, 1), 'requests': totals['api_calls'],
+            'reads': calls.get('GET', 0), 'writes': sum(count for method, count in calls.items() if method != 'GET'),
+            'bytes_received': totals['bytes_received'], 'matched': totals.get('matched', 0), 'applied': totals.get('applied', 0),
+            'failed_copies': totals['failed_copies'], 'phase_seconds': {phase: round(value, 3) for phase, value in totals['seconds'].items()}}
+
+def result_key(result):
+    return '{scenario} {findings}x{targets} {engine} w{workers}'.format(**result)
+
+def compare_results(results, baseline_file, max_regression=None):
+    # prints the change against an earlier --output file; returns the scenarios slower than max_regression percent
+    with open(baseline_file, encoding='utf8') as f:
+        baseline = {result_key(result): result for result in json.load(f)['results']}
+    regressions = []
+    print('\nChange against {}:'.format(baseline_file))
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if previous is None:
+            continue
+        change = {field: (result[field] - previous[field]) * 100.0 / previous[field] if previous[field] else 0.0
+                  for field in ('seconds', 'peak_memory_mb', 'requests')}
+        print('  {:<32} time {:+6.1f}%  memory {:+6.1f}%  requests {:+6.1f}%'.format(result_key(result), change['seconds'], change['peak_memory_mb'], change['requests']))
+        if max_regression is not None and change['seconds'] > max_regression:
+            regressions.append(result_key(result))
+    return regressions
+
+def run_benchmarks(args):
+    os.makedirs(args.work_dir, exist_ok=True)
+    work_dir = os.path.abspath(args.work_dir)
+    results = []
+    print('{:<32} {:>9} {:>10} {:>9} {:>7} {:>9}'.format('scenario', 'seconds', 'memory MB', 'requests', 'writes', 'matched'))
+    for findings, targets in parse_scales(args.scales):
+        fixture_dir = get_fixture_dir(work_dir, findings, targets)
+        for scenario in args.scenarios.split(','):
+            for engine in args.engines.split(','):
+                result = {'scenario': scenario.strip(), 'findings': findings, 'targets': targets, 'engine': engine.strip(), 'workers': args.workers}
+                runs = [run_scenario(fixture_dir, result['scenario'], result['engine'], args.workers, work_dir) for _ in range(args.repeat)]
+                result.update(min(runs, key=lambda run: run['seconds'])) # the fastest run is the least disturbed
+                results.append(result)
+                print('{:<32} {:>9.2f} {:>10.1f} {:>9} {:>7} {:>9}'.format(result_key(result), result['seconds'], result['peak_memory_mb'],
+                                                                           result['requests'], result['writes'], result['matched']))
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump({'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(), 'python': platform.python_version(),
+                       'platform': platform.platform(), 'results': results}, f, indent=2)
+        print('Wrote {}'.format(args.output))
+    if args.baseline:
+        regressions = compare_results(results, args.baseline, args.max_regression)
+        if regressions:
+            print('Slower than the baseline by more than {}%: {}'.format(args.max_regression, ', '.join(regressions)))
+            return 1
+    return 0
+
+def fuzzy_match_agrees(target, match, expected):
+    # the index's fuzzy match may differ from Findings().match, which takes the first line in the window in source
+    # order; it must then be a finding of the same CWE at least as close to the target line
+    if match is None or expected is None:
+        return match is None and expected is None
+    if match.id == expected['id']:
+        return True
+    line = target['finding_details']['file_line_number']
+    return match.cwe == int(expected['cwe']) and isinstance(expected['line'], int) and abs(match.line - line) <= abs(expected['line'] - line)
+
+def check_fuzzy(scales, sample=FUZZY_SAMPLE, min_speedup=FUZZY_MIN_SPEEDUP):
+    # --fuzzy_match lookups of a target's STATIC findings, with FindingsMatchIndex and with Findings().match on a
+    # sample of them. Returns the failures: lookups that do not agree, and scales where the index (built and queried
+    # for every target finding) is not min_speedup times faster per lookup.
+    from veracode_api_py.findings import Findings
+    failures = []
+    print('{:>9} {:>17} {:>17} {:>9} {:>11}'.format('findings', 'index us/lookup', 'match() us/lookup', 'speedup', 'disagree'))
+    for findings in scales:
+        tenant = SyntheticTenant(findings=findings)
+        source = tenant.app_findings(tenant.source_guid, 'STATIC')
+        targets = tenant.app_findings(tenant.target_guids[0], 'STATIC')
+        started = time.perf_counter()
+        index = copier.FindingsMatchIndex(source, 'STATIC')
+        matches = [index.match(target, allow_fuzzy_match=True) for target in targets]
+        index_seconds = (time.perf_counter() - started) / len(targets)
+
+        sampled = random.Random(findings).sample(range(len(targets)), min(sample, len(targets)))
+        started = time.perf_counter()
+        expected = [Findings().match(targets[i], source, allow_fuzzy_match=True) for i in sampled]
+        match_seconds = (time.perf_counter() - started) / len(sampled)
+
+        disagree = [targets[i]['issue_id'] for i, match in zip(sampled, expected) if not fuzzy_match_agrees(targets[i], matches[i], match)]
+        speedup = match_seconds / index_seconds
+        print('{:>9} {:>17.1f} {:>17.1f} {:>8.0f}x {:>11}'.format(findings, index_seconds * 1e6, match_seconds * 1e6, speedup, len(disagree)))
+        if disagree:
+            failures.append('fuzzy {}: matches differ from Findings().match for target flaws {}'.format(findings, disagree))
+        if min_speedup is not None and speedup < min_speedup:
+            failures.append('fuzzy {}: {:.1f}x faster than Findings().match, expected at least {}x'.format(findings, speedup, min_speedup))
+    return failures
+
+def check_memory(work_dir, findings, targets):
+    # the findings scenario with and without --stream; returns the failures: --stream must copy the same flaws with a
+    # lower peak memory
+    fixture_dir = get_fixture_dir(work_dir, findings, targets)
+    runs = {stream: run_scenario(fixture_dir, 'findings', 'sync', 1, work_dir, stream=stream) for stream in (False, True)}
+    print('{:<10} {:>9} {:>10} {:>9}'.format('', 'seconds', 'memory MB', 'matched'))
+    for stream, run in runs.items():
+        print('{:<10} {:>9.2f} {:>10.1f} {:>9}'.format('--stream' if stream else 'default', run['seconds'], run['peak_memory_mb'], run['matched']))
+    failures = []
+    if runs[True]['matched'] != runs[False]['matched']:
+        failures.append('memory {}x{}: --stream matched {} flaws, not {}'.format(findings, targets, runs[True]['matched'], runs[False]['matched']))
+    if runs[True]['peak_memory_mb'] >= runs[False]['peak_memory_mb']:
+        failures.append('memory {}x{}: --stream peaked at {} MB, no lower than {} MB'.format(findings, targets, runs[True]['peak_memory_mb'], runs[False]['peak_memory_mb']))
+    return failures
+
+def check_status(work_dir, scales, max_growth=STATUS_MAX_GROWTH):
+    # the findings scenario at each number of target findings; returns the failures: the time spent matching (and so
+    # checking and updating the target's flaw statuses) must grow no faster than max_growth per doubling
+    print('{:>9} {:>14} {:>17}'.format('findings', 'match seconds', 'us per finding'))
+    runs = []
+    for findings in scales:
+        result = run_scenario(get_fixture_dir(work_dir, findings, 1), 'findings', 'sync', 1, work_dir)
+        runs.append((findings, result['phase_seconds']['match']))
+        print('{:>9} {:>14.2f} {:>17.1f}'.format(findings, runs[-1][1], runs[-1][1] * 1e6 / findings))
+    failures = []
+    for (smaller, smaller_seconds), (larger, larger_seconds) in zip(runs, runs[1:]):
+        growth = (larger_seconds / smaller_seconds) ** (1 / math.log2(larger / smaller)) if smaller_seconds else 0.0
+        if growth > max_growth:
+            failures.append('status {} to {}: matching took {:.1f}x as long per doubling of the target, expected at most {}x'.format(
+                smaller, larger, growth, max_growth))
+    return failures
+
+def dict_record(finding):
+    # the match candidate FindingsMatchIndex kept before MatchRecord: the dict of Findings().match, with the
+    # finding reduced to its id, status and annotations
+    from veracode_api_py.findings import Findings
+    record = Findings()._create_match_format_policy([finding], 'STATIC')[0]
+    record['finding'] = {'issue_id': finding['issue_id'], 'finding_status': {'resolution_status': finding['finding_status']['resolution_status']},
+                         'annotations': finding.get('annotations')}
+    return record
+
+def measure_records(tenant, make_record):
+    # (seconds to build a candidate for every STATIC "from" finding, bytes they hold once the findings are dropped).
+    # The findings are generated afresh each time, bypassing app_findings' cache, so the payload is freed.
+    findings = SyntheticTenant.app_findings.__wrapped__(tenant, tenant.source_guid, 'STATIC')
+    started = time.perf_counter()
+    records = [make_record(finding) for finding in findings]
+    seconds = time.perf_counter() - started
+    del findings, records
+    gc.collect()
+    tracemalloc.start()
+    try:
+        findings = SyntheticTenant.app_findings.__wrapped__(tenant, tenant.source_guid, 'STATIC')
+        records = [make_record(finding) for finding in findings]
+        del findings
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return seconds, retained
+
+def check_records(findings, max_memory=RECORDS_MAX_MEMORY, max_slowdown=RECORDS_MAX_SLOWDOWN):
+    # match candidates for every STATIC "from" finding as MatchRecords and as the dicts they replaced; returns the
+    # failures: the records must hold at most max_memory of the dicts' memory and build no more than max_slowdown
+    # times slower
+    tenant = SyntheticTenant(findings=findings)
+    runs = {name: measure_records(tenant, make_record) for name, make_record in
+            (('dict', dict_record), ('MatchRecord', functools.partial(copier.MatchRecord, finding_type='STATIC')))}
+    print('{:<12} {:>9} {:>10}'.format('', 'seconds', 'memory MB'))
+    for name, (seconds, retained) in runs.items():
+        print('{:<12} {:>9.2f} {:>10.1f}'.format(name, seconds, retained / 2**20))
+    failures = []
+    (dict_seconds, dict_retained), (record_seconds, record_retained) = runs['dict'], runs['MatchRecord']
+    if record_retained > dict_retained * max_memory:
+        failures.append('records {}: MatchRecords hold {:.1f} MB, more than {:.0%} of the {:.1f} MB of dicts'.format(
+            findings, record_retained / 2**20, max_memory, dict_retained / 2**20))
+    if record_seconds > dict_seconds * max_slowdown:
+        failures.append('records {}: MatchRecords took {:.2f}s to build, more than {}x the {:.2f}s of dicts'.format(
+            findings, record_seconds, max_slowdown, dict_seconds))
+    return failures
+
+def run_checks(args):
+    failures = []
+    for check in [check.strip() for check in args.checks.split(',') if check.strip()]:
+        print('\nCheck: {}'.format(check))
+        if check == 'fuzzy':
+            failures += check_fuzzy([int(scale) for scale in args.fuzzy_scales.split(',')], min_speedup=args.min_speedup)
+        elif check == 'memory':
+            os.makedirs(args.work_dir, exist_ok=True)
+            failures += check_memory(os.path.abspath(args.work_dir), *parse_scales(args.memory_scale)[0])
+        elif check == 'status':
+            os.makedirs(args.work_dir, exist_ok=True)
+            failures += check_status(os.path.abspath(args.work_dir), [int(scale) for scale in args.status_scales.split(',')])
+        elif check == 'records':
+            failures += check_records(args.records_scale)
+        else:
+            failures.append('unknown check {}'.format(check))
+    for failure in failures:
+        print('FAILED: ' + failure)
+    return 1 if failures else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic Veracode API fixtures and benchmark MitigationCopier.py against them.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help='Write synthetic fixtures for MitigationCopier.py --replay_dir')
+    generate.add_argument('-fd', '--fixture_dir', required=True, help='Directory to write the fixtures to')
+    generate.add_argument('-n', '--findings', type=int, default=1000, help='Static findings in the "from" application and each target; dynamic findings are a tenth of this (default: 1000)')
+    generate.add_argument('-t', '--targets', type=int, default=1, help='Number of target applications (default: 1)')
+    generate.add_argument('-tf', '--target_findings', type=int, help='Static findings in each target (default: --findings)')
+    generate.add_argument('-sa', '--sca_annotations', type=int, help='Approved SCA vulnerability annotations in the "from" application; licenses are a tenth of this (default: --findings)')
+    generate.add_argument('-s', '--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    run = subparsers.add_parser('run', help='Run the benchmark suite')
+    run.add_argument('-sc', '--scales', default=DEFAULT_SCALES, help='Comma-delimited list of FINDINGSxTARGETS scales (default: {})'.format(DEFAULT_SCALES))
+    run.add_argument('-sn', '--scenarios', default=DEFAULT_SCENARIOS, help='findings (match_for_scan_type, SAST and DAST), sca (match_sca) or both (default: both)')
+    run.add_argument('-e', '--engines', default='sync', help='Comma-delimited list of engines to run: sync, asyncio (default: sync)')
+    run.add_argument('-w', '--workers', type=int, default=1, help='--workers for each run (default: 1)')
+    run.add_argument('-r', '--repeat', type=int, default=1, help='Run each scenario this many times and keep the fastest (default: 1)')
+    run.add_argument('-wd', '--work_dir', default='benchmark_work', help='Directory for generated fixtures, reused between runs (default: benchmark_work)')
+    run.add_argument('-o', '--output', help='Write the results to this JSON file')
+    run.add_argument('-b', '--baseline', help='Compare the results with an earlier --output file')
+    run.add_argument('-mx', '--max_regression', type=float, help='With --baseline, exit with status 1 if any scenario is slower by more than this percentage')
+
+    check = subparsers.add_parser('check', help='Run the scaling checks, exiting with status 1 if any fails')
+    check.add_argument('-ck', '--checks', default=DEFAULT_CHECKS, help='Comma-delimited list of checks: fuzzy (--fuzzy_match lookups against Findings().match), memory (peak memory with and without --stream), status (matching time as the target grows), records (MatchRecord against the match dicts it replaced) (default: {})'.format(DEFAULT_CHECKS))
+    check.add_argument('-fs', '--fuzzy_scales', default=FUZZY_SCALES, help='Comma-delimited list of "from" findings counts for the fuzzy check (default: {})'.format(FUZZY_SCALES))
+    check.add_argument('-mm', '--memory_scale', default=MEMORY_SCALE, help='FINDINGSxTARGETS scale for the memory check (default: {})'.format(MEMORY_SCALE))
+    check.add_argument('-ss', '--status_scales', default=STATUS_SCALES, help='Comma-delimited list of target findings counts for the status check (default: {})'.format(STATUS_SCALES))
+    check.add_argument('-rs', '--records_scale', type=int, default=RECORDS_SCALE, help='"from" findings for the records check (default: {})'.format(RECORDS_SCALE))
+    check.add_argument('-wd', '--work_dir', default='benchmark_work', help='Directory for generated fixtures, reused between runs (default: benchmark_work)')
+    check.add_argument('-ms', '--min_speedup', type=float, default=FUZZY_MIN_SPEEDUP, help='How many times faster than Findings().match fuzzy lookups must be (default: {})'.format(FUZZY_MIN_SPEEDUP))
+
+    args = parser.parse_args()
+    if args.command == 'check':
+        return run_checks(args)
+    if args.command == 'generate':
+        tenant = SyntheticTenant(findings=args.findings, targets=args.targets, target_findings=args.target_findings,
+                                 sca_annotations=args.sca_annotations, seed=args.seed)
+        count = write_fixtures(tenant, args.fixture_dir)
+        print('Wrote {} fixtures to {}'.format(count, args.fixture_dir))
+        print('Copy from application {} to {} targets with: python MitigationCopier.py --replay_dir {} --manifest {}'.format(
+            tenant.source_guid, len(tenant.target_guids), args.fixture_dir, os.path.join(args.fixture_dir, 'manifest-findings.json')))
+        return 0
+    return run_benchmarks(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
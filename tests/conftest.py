@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import MitigationCopier as copier
+from fake_platform import FakePlatform, KEY_ID, KEY_SECRET
+
+@pytest.fixture
+def platform(monkeypatch, tmp_path):
+    # a FakePlatform that every API client created during the test talks to; the test runs in tmp_path, where
+    # main() writes its log file
+    fake = FakePlatform()
+    create_client = copier.VeracodeApiClient.__init__
+    def create_fake_client(self, *args, **kwargs):
+        create_client(self, *args, **kwargs)
+        self.base_rest_url = fake.url
+    monkeypatch.setattr(copier.VeracodeApiClient, '__init__', create_fake_client)
+    monkeypatch.setattr(copier, 'get_credentials', lambda *args: (KEY_ID, KEY_SECRET))
+    monkeypatch.chdir(tmp_path)
+    yield fake
+    fake.close()
+
+@pytest.fixture
+def run_copier(monkeypatch, platform, capsys):
+    # runs main() with the given command line; returns its console output
+    def run(*argv):
+        capsys.readouterr()
+        monkeypatch.setattr(sys, 'argv', ['MitigationCopier.py'] + list(argv))
+        copier.main()
+        return capsys.readouterr().out
+    return run
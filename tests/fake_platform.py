@@ -0,0 +1,237 @@
+import json
+import random
+import re
+import threading
+import http.server
+from urllib import parse
+
+from veracode_api_signing.formatters import format_signing_data
+from veracode_api_signing.veracode_hmac_auth import create_signature
+
+# A local stand-in for the parts of the Veracode REST API that MitigationCopier.py uses: applications,
+# sandboxes, findings, flaw annotations and SCA annotations. Requests must be signed with KEY_ID/KEY_SECRET.
+# Annotation writes are recorded in posts; throttling, errors and rejected annotations can be injected.
+
+KEY_ID = '1' * 32
+KEY_SECRET = '2' * 128
+SCAN_DATE = '2026-01-01T00:00:00.000Z'
+
+def finding(issue_id, rnd, scan_type='STATIC', status=None, files=20, cwes=4, lines=60):
+    # a finding in the findings API format, with an annotation history (most recent first) if mitigated
+    status = status or rnd.choice(['APPROVED', 'APPROVED', 'PROPOSED', 'UNRESOLVED', 'REJECTED'])
+    details = {'cwe': {'id': rnd.randint(1, cwes)}}
+    if scan_type == 'STATIC':
+        file_number = rnd.randrange(files)
+        details.update({'file_path': rnd.choice(['', 'src/main/F{}.java'.format(file_number), 'main/F{}.java'.format(file_number),
+                                                 'x/teamcity/buildagent/work/0123456789abcdef/src/main/F{}.java'.format(file_number)]),
+                        'procedure': 'com.x.C{}.m{}'.format(file_number, rnd.randrange(4)), 'relative_location': rnd.randrange(50),
+                        'file_line_number': rnd.randint(1, lines)})
+    else:
+        details.update({'path': '/p/{}'.format(rnd.randrange(files)), 'vulnerable_parameter': rnd.choice(['', 'a', 'b'])})
+    history = ['COMMENT', 'APPDESIGN', 'APPROVED'][0:rnd.randint(1, 3)] if status in ('APPROVED', 'PROPOSED') else []
+    return {'issue_id': issue_id, 'scan_type': scan_type, 'finding_status': {'resolution_status': status, 'resolution': 'UNRESOLVED'},
+            'finding_details': details,
+            'annotations': [{'action': action, 'comment': 'note {} {}'.format(issue_id, action), 'user_name': 'user{}'.format(issue_id % 5)}
+                            for action in reversed(history)]}
+
+def static_finding(issue_id, line, file_path='src/main/Query.java', cwe=89, status='APPROVED'):
+    # one hand-placed static finding, for tests that need to know exactly where each flaw is
+    annotations = [{'action': 'APPDESIGN', 'comment': 'validated upstream', 'user_name': 'reviewer'}] if status == 'APPROVED' else []
+    return {'issue_id': issue_id, 'scan_type': 'STATIC', 'finding_status': {'resolution_status': status, 'resolution': 'UNRESOLVED'},
+            'finding_details': {'cwe': {'id': cwe}, 'file_path': file_path, 'file_line_number': line, 'procedure': 'Query.run{}'.format(issue_id),
+                                'relative_location': issue_id},
+            'annotations': annotations}
+
+def findings(count, seed=0, scan_type='STATIC', first_id=1, **kwargs):
+    rnd = random.Random('{}:{}'.format(seed, scan_type))
+    return [finding(issue_id, rnd, scan_type, **kwargs) for issue_id in range(first_id, first_id + count)]
+
+def unmitigated(source):
+    # the same findings as source with no mitigations yet, as a target for copying from it
+    return [dict(source_finding, finding_status=dict(source_finding['finding_status'], resolution_status='UNRESOLVED'), annotations=[])
+            for source_finding in source]
+
+def sca_annotations(count, annotation_type='VULNERABILITY', seed=0):
+    # SCA annotations in the sca_annotations API format, history most recent first
+    rnd = random.Random(seed)
+    annotations = []
+    for index in range(count):
+        history = ['BYDESIGN', 'APPROVE'] if rnd.random() < 0.5 else ['FP', 'COMMENT', 'APPROVE']
+        annotation = {'component': {'id': 'component-{}'.format(index), 'filename': 'library{}.jar'.format(index)},
+                      'history': [{'annotation_action': action, 'comment': 'sca note {} {}'.format(index, action), 'user_name': 'user'}
+                                  for action in reversed(history)]}
+        if annotation_type == 'VULNERABILITY':
+            annotation['vulnerability'] = {'cve_name': 'CVE-2026-{}'.format(1000 + index)}
+        else:
+            annotation['license'] = {'license_id': 'LICENSE-{}'.format(index % 7)}
+        annotations.append(annotation)
+    return annotations
+
+class FakePlatform():
+    def __init__(self):
+        self.apps = {} # guid -> {'name', 'last_completed_scan_date', 'sandboxes', 'findings', 'sca', 'proposed_sca'}
+        self.posts = [] # ('flaw', app guid, sandbox guid, body) or ('sca', app guid, None, body), in arrival order
+        self.requests = [] # (method, path, query) of every request
+        self.throttle_next = 0 # answer this many of the next requests with 429
+        self.retry_after = '0'
+        self.fail_reads_next = 0 # answer this many of the next reads with 503
+        self.rejected_ids = set() # flaw IDs or SCA component IDs whose annotation calls are answered 400
+        self.fail_writes_after = None # answer every annotation call with 500 once this many more have been answered
+        self.persist_sca = False # apply SCA annotation writes to the target's annotations
+        self.bad_signatures = 0
+        self.lock = threading.Lock()
+
+        platform = self
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True # or each small response waits for the client's delayed ACK
+
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, payload, headers = platform.respond(self.command, self.path, self.headers, body)
+                data = json.dumps(payload).encode('utf8') if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}/'.format(self._server.server_address[1])
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_app(self, guid, name, static=(), dynamic=(), sca_vulnerabilities=(), sca_licenses=(), sandboxes=None):
+        # sandboxes: {sandbox guid: (sandbox name, static findings)}
+        self.apps[guid] = {'name': name, 'last_completed_scan_date': SCAN_DATE, 'sandboxes': dict(sandboxes or {}),
+                           'findings': {'STATIC': list(static), 'DYNAMIC': list(dynamic)},
+                           'sca': {'VULNERABILITY': list(sca_vulnerabilities), 'LICENSE': list(sca_licenses)},
+                           'proposed_sca': {'VULNERABILITY': [], 'LICENSE': []}}
+
+    def flaw_posts(self):
+        # {(app guid, sandbox guid, flaw id): [(action, comment)]} in the order they were written
+        written = {}
+        for kind, app_guid, sandbox_guid, body in self.posts:
+            if kind == 'flaw':
+                for flaw_id in body['issue_list'].split(','):
+                    written.setdefault((app_guid, sandbox_guid, int(flaw_id)), []).append((body['action'], body['comment']))
+        return written
+
+    def sca_posts(self):
+        # {(app guid, component id, cve name or license id): [(action, comment)]} in the order they were written
+        written = {}
+        for kind, app_guid, _, body in self.posts:
+            if kind == 'sca':
+                for annotation in body['annotations']:
+                    issue_id = annotation.get('cve_name') or annotation.get('license_id')
+                    written.setdefault((app_guid, annotation['component_id'], issue_id), []).append((body['action'], body['comment']))
+        return written
+
+    def reset(self):
+        with self.lock:
+            self.posts = []
+            self.requests = []
+
+    def _signed(self, headers, path, method):
+        try:
+            scheme, fields = headers['Authorization'].split(' ', 1)
+            parts = dict(field.split('=', 1) for field in fields.split(','))
+            host = headers['Host'].split(':')[0]
+            expected = create_signature(scheme, KEY_SECRET, format_signing_data(parts['id'], host, path, method), parts['ts'], parts['nonce'])
+        except (KeyError, ValueError, AttributeError):
+            return False
+        return parts['id'] == KEY_ID and parts['sig'] == expected
+
+    def respond(self, method, path_url, headers, body):
+        parsed = parse.urlsplit(path_url)
+        query = dict(parse.parse_qsl(parsed.query, keep_blank_values=True))
+        with self.lock:
+            self.requests.append((method, parsed.path, query))
+            if self.throttle_next > 0:
+                self.throttle_next -= 1
+                return 429, {'message': 'Too Many Requests'}, {'Retry-After': self.retry_after}
+            if method == 'GET' and self.fail_reads_next > 0:
+                self.fail_reads_next -= 1
+                return 503, {'message': 'Service Unavailable'}, {}
+            if method == 'POST' and self.fail_writes_after is not None:
+                if self.fail_writes_after == 0:
+                    return 500, {'message': 'Internal Server Error'}, {}
+                self.fail_writes_after -= 1
+        if not self._signed(headers, path_url, method):
+            self.bad_signatures += 1
+            return 401, {'message': 'bad signature'}, {}
+        status, payload = self.route(method, parsed.path, query, body)
+        return status, payload, {}
+
+    def _page(self, items, query, element):
+        size = int(query.get('size', 50))
+        page = int(query.get('page', 0))
+        return 200, {'_embedded': {element: items[page * size:(page + 1) * size]},
+                     'page': {'size': size, 'number': page, 'total_pages': (len(items) + size - 1) // size, 'total_elements': len(items)}}
+
+    def _application(self, guid):
+        app = self.apps[guid]
+        return {'guid': guid, 'profile': {'name': app['name']}, 'last_completed_scan_date': app['last_completed_scan_date']}
+
+    def route(self, method, path, query, body):
+        if path == '/api/authn/v2/api_credentials':
+            return 200, {'expiration_ts': '2099-01-01T00:00:00.000+0000'}
+        if path == '/appsec/v1/applications':
+            name = parse.unquote(query['name']) if 'name' in query else None # the client quotes the name itself
+            return self._page([self._application(guid) for guid, app in self.apps.items() if name is None or name in app['name']], query, 'applications')
+        match = re.match(r'^/(appsec/v1|appsec/v2|srcclr/v3)/applications/([^/]+)(/[a-z_]+)?$', path)
+        if match is None or match.group(2) not in self.apps:
+            return 404, {'message': 'not found'}
+        app_guid, resource = match.group(2), match.group(3)
+        app = self.apps[app_guid]
+        if resource is None:
+            return 200, self._application(app_guid)
+        if resource == '/sandboxes':
+            return self._page([{'guid': guid, 'name': name} for guid, (name, _) in app['sandboxes'].items()], query, 'sandboxes')
+        if resource == '/findings':
+            if 'context' in query:
+                items = app['sandboxes'][query['context']][1] if query.get('scan_type') == 'STATIC' else []
+            else:
+                items = app['findings'][query.get('scan_type', 'STATIC')]
+            return self._page(items, query, 'findings')
+        if resource == '/annotations' and method == 'POST':
+            if set(body['issue_list'].split(',')) & {str(flaw_id) for flaw_id in self.rejected_ids}:
+                return 400, {'message': 'invalid flaw'}
+            with self.lock:
+                self.posts.append(('flaw', app_guid, query.get('context'), body))
+            return 200, {}
+        if resource == '/sca_annotations' and method == 'GET':
+            source = app['proposed_sca'] if query.get('annotation_status') == 'PROPOSED' else app['sca']
+            return 200, {'approved_annotations': source[query['annotation_type']]}
+        if resource == '/sca_annotations' and method == 'POST':
+            if {annotation['component_id'] for annotation in body['annotations']} & self.rejected_ids:
+                return 400, {'message': 'invalid component'}
+            with self.lock:
+                self.posts.append(('sca', app_guid, None, body))
+                if self.persist_sca:
+                    self._apply_sca(app, body)
+            return 200, {}
+        return 404, {'message': 'not found'}
+
+    def _apply_sca(self, app, body):
+        field, id_field = ('vulnerability', 'cve_name') if body['annotation_type'] == 'VULNERABILITY' else ('license', 'license_id')
+        annotations = app['sca'][body['annotation_type']]
+        for written in body['annotations']:
+            existing = next((annotation for annotation in annotations if annotation['component']['id'] == written['component_id']
+                             and annotation[field][id_field] == written[id_field]), None)
+            if existing is None:
+                existing = {'component': {'id': written['component_id'], 'filename': 'library.jar'}, field: {id_field: written[id_field]}, 'history': []}
+                annotations.append(existing)
+            existing['history'].insert(0, {'annotation_action': body['action'], 'comment': body['comment'], 'user_name': 'copier'})
@@ -0,0 +1,54 @@
+import MitigationCopier as copier
+from fake_platform import KEY_ID, KEY_SECRET
+
+# PendingAnnotations sends each flaw's history in order, one round per step of the histories, in calls of at most
+# ANNOTATION_BATCH_SIZE flaws; a call the platform rejects is sent again flaw by flaw
+
+ACTIONS = ['COMMENT', 'APPDESIGN', 'NETENV']
+FLAWS = 250
+
+def history(flaw_id):
+    return [(action, 'copied {}'.format(action)) for action in ACTIONS[0:1 + flaw_id % 3]]
+
+def pending_flaws():
+    pending = copier.PendingAnnotations()
+    for flaw_id in range(1, FLAWS + 1):
+        for action, comment in history(flaw_id):
+            pending.add_flaw_annotation('app-guid', None, flaw_id, action, comment)
+    return pending
+
+def annotation_calls(platform):
+    return [query for method, path, query in platform.requests if method == 'POST' and path.endswith('/annotations')]
+
+def test_rounds_hold_each_step_of_the_histories_in_bounded_chunks():
+    pending = pending_flaws()
+    failed = set()
+    rounds = []
+    for annotation_round, chunks in pending._round_chunks('flaw', pending._flaws, failed, None):
+        rounds.append(annotation_round)
+        assert all(0 < len(chunk) <= copier.ANNOTATION_BATCH_SIZE for _, chunk in chunks)
+        assert {group[2:] for group, _ in chunks} == {history(2)[annotation_round]}
+        keys = [key for _, chunk in chunks for key in chunk]
+        assert sorted(keys) == [('app-guid', None, flaw_id) for flaw_id in range(1, FLAWS + 1)
+                                if annotation_round < len(history(flaw_id)) and ('app-guid', None, flaw_id) not in failed]
+        if annotation_round == 0:
+            failed.add(('app-guid', None, 2)) # a failed flaw gets no further annotations
+    assert rounds == [0, 1, 2]
+
+def test_submit_applies_each_history_in_order(platform):
+    platform.add_app('app-guid', 'App')
+    api = copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET).api
+    assert pending_flaws().submit(api) == set()
+    assert platform.flaw_posts() == {('app-guid', None, flaw_id): history(flaw_id) for flaw_id in range(1, FLAWS + 1)}
+    # 250, 167 and 83 flaws in the three rounds
+    assert len(annotation_calls(platform)) == 3 + 2 + 1
+
+def test_a_rejected_call_is_sent_again_flaw_by_flaw(platform):
+    platform.add_app('app-guid', 'App')
+    platform.rejected_ids = {7}
+    api = copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET).api
+    assert pending_flaws().submit(api) == {('app-guid', None, 7)}
+    expected = {('app-guid', None, flaw_id): history(flaw_id) for flaw_id in range(1, FLAWS + 1) if flaw_id != 7}
+    assert platform.flaw_posts() == expected
+    # only the first call of the first round held flaw 7: it went out again as one call per flaw
+    assert len(annotation_calls(platform)) == 6 + copier.ANNOTATION_BATCH_SIZE
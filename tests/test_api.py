@@ -0,0 +1,136 @@
+import asyncio
+import http.server
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+import MitigationCopier as copier
+from fake_platform import KEY_ID, KEY_SECRET
+
+# the API clients' rate limiting, throttling and retries: throttled calls and failed reads are retried with backoff,
+# writes only when the platform is known not to have applied them
+
+ENGINES = ['sync', pytest.param('asyncio', marks=pytest.mark.skipif(copier.aiohttp is None, reason='aiohttp is not installed'))]
+
+@pytest.fixture(autouse=True)
+def quick_backoff(monkeypatch):
+    monkeypatch.setattr(copier, 'API_BACKOFF_SECONDS', 0.01)
+
+@pytest.fixture
+def credentials(platform):
+    platform.add_app('app-guid', 'App')
+    return copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET, max_retries=2)
+
+def call(engine, credentials, name, *args):
+    # calls the named API method with the client each engine uses
+    if engine == 'sync':
+        return getattr(credentials.api, name)(*args)
+    async def call_async():
+        api = copier.AsyncVeracodeApiClient(credentials)
+        try:
+            return await getattr(api, name)(*args)
+        finally:
+            await api.close()
+    return asyncio.run(call_async())
+
+class SilentServer():
+    # reads each request and closes the connection without answering, as when a call is lost after it was sent
+    def __init__(self):
+        server = self
+        self.requests = 0
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            def do_GET(self):
+                server.requests += 1
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                self.close_connection = True
+            do_POST = do_GET
+            def log_message(self, format, *args):
+                pass
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/'.format(self._server.server_address[1])
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def closed_port_url():
+    with socket.socket() as unused:
+        unused.bind(('127.0.0.1', 0))
+        return 'http://127.0.0.1:{}/'.format(unused.getsockname()[1])
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_throttled_calls_wait_for_retry_after_and_are_retried(engine, platform, credentials):
+    throttle = credentials.api.throttle
+    platform.throttle_next = 2
+    platform.retry_after = '0.2'
+    started = time.monotonic()
+    assert call(engine, credentials, 'get_application', 'app-guid')['guid'] == 'app-guid'
+    assert time.monotonic() - started >= 0.4
+    assert (throttle.requests, throttle.throttled, throttle.retried) == (3, 2, 2)
+    assert throttle.concurrency < throttle.max_concurrency
+
+    platform.throttle_next = 1
+    platform.retry_after = '0'
+    call(engine, credentials, 'add_annotation', 'app-guid', [7], 'copied', 'APPDESIGN')
+    assert platform.flaw_posts() == {('app-guid', None, 7): [('APPDESIGN', 'copied')]}
+    assert (throttle.throttled, throttle.retried) == (3, 3)
+    assert platform.bad_signatures == 0
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_failed_reads_are_retried_until_max_retries(engine, platform, credentials):
+    platform.fail_reads_next = 2
+    assert call(engine, credentials, 'get_application', 'app-guid')['guid'] == 'app-guid'
+    assert credentials.api.throttle.retried == 2
+
+    platform.reset()
+    platform.fail_reads_next = 3
+    with pytest.raises(requests.exceptions.HTTPError):
+        call(engine, credentials, 'get_application', 'app-guid')
+    assert len(platform.requests) == 3
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_a_rejected_write_is_not_retried(engine, platform, credentials):
+    platform.rejected_ids = {7}
+    with pytest.raises(requests.exceptions.HTTPError) as error:
+        call(engine, credentials, 'add_annotation', 'app-guid', [7], 'copied', 'APPDESIGN')
+    assert copier.request_rejected(error.value)
+    assert len(platform.requests) == 1
+    assert credentials.api.throttle.retried == 0
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_a_write_is_sent_again_only_if_it_never_went_out(engine, credentials):
+    credentials.api.base_rest_url = closed_port_url()
+    with pytest.raises(requests.exceptions.ConnectionError) as error:
+        call(engine, credentials, 'add_annotation', 'app-guid', [7], 'copied', 'APPDESIGN')
+    if engine == 'sync':
+        assert copier.request_unsent(error.value)
+    assert credentials.api.throttle.retried == 2
+
+    silent = SilentServer()
+    try:
+        credentials.api.base_rest_url = silent.url
+        with pytest.raises(requests.exceptions.ConnectionError) as error:
+            call(engine, credentials, 'add_annotation', 'app-guid', [7], 'copied', 'APPDESIGN')
+        if engine == 'sync':
+            assert not copier.request_unsent(error.value)
+        assert silent.requests == 1
+        with pytest.raises(requests.exceptions.ConnectionError):
+            call(engine, credentials, 'get_application', 'app-guid')
+        # each attempt counts once, but aiohttp repeats a GET itself when the connection it kept alive is closed
+        assert silent.requests == 4 if engine == 'sync' else silent.requests >= 4
+    finally:
+        silent.close()
+
+def test_the_request_rate_is_limited(platform):
+    platform.add_app('app-guid', 'App')
+    credentials = copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET, rate_limit=10)
+    started = time.monotonic()
+    for _ in range(15):
+        credentials.api.get_application('app-guid')
+    assert time.monotonic() - started >= 0.45
+    assert credentials.api.throttle.requests == 15
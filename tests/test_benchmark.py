@@ -0,0 +1,12 @@
+import benchmark
+
+# the benchmark's checks, at scales small enough for the test suite
+
+def test_stream_lowers_peak_memory(tmp_path):
+    assert benchmark.check_memory(str(tmp_path), 5000, 1) == []
+
+def test_matching_time_grows_linearly_with_the_target(tmp_path):
+    assert benchmark.check_status(str(tmp_path), [3000, 6000]) == []
+
+def test_match_records_are_smaller_than_match_dicts():
+    assert benchmark.check_records(20000) == []
@@ -0,0 +1,63 @@
+import os
+
+import MitigationCopier as copier
+from fake_platform import findings, unmitigated
+
+# --cache_dir: a "from" result set is reused until it is older than --cache_ttl or its application has a new scan;
+# the least recently used entries go first when the cache outgrows --cache_max_mb
+
+KEY = ('app-guid', None, 'STATIC', 'TRUE')
+SCAN_DATE = '2026-01-01T00:00:00.000Z'
+
+def test_an_entry_expires_after_the_ttl(tmp_path, monkeypatch):
+    cache = copier.FindingsCache(str(tmp_path), ttl_hours=1)
+    cache.put(KEY, SCAN_DATE, [{'issue_id': 1}])
+    assert cache.get(KEY, SCAN_DATE) == [{'issue_id': 1}]
+    stored_at = copier.time.time()
+    monkeypatch.setattr(copier.time, 'time', lambda: stored_at + 3601)
+    assert cache.get(KEY, SCAN_DATE) is None
+
+def test_an_entry_is_stale_once_the_application_has_a_new_scan(tmp_path):
+    cache = copier.FindingsCache(str(tmp_path))
+    cache.put(KEY, SCAN_DATE, [{'issue_id': 1}])
+    assert cache.get(KEY, '2026-02-01T00:00:00.000Z') is None
+    assert cache.get(('app-guid', None, 'DYNAMIC', 'TRUE'), SCAN_DATE) is None
+
+def test_the_least_recently_used_entries_are_evicted(tmp_path):
+    cache = copier.FindingsCache(str(tmp_path), max_size_mb=1)
+    data = [{'issue_id': issue_id, 'comment': os.urandom(128).hex()} for issue_id in range(2000)] # about 300 KB compressed
+    keys = [('app-{}'.format(number), None, 'STATIC', 'TRUE') for number in range(4)]
+    for age, key in zip((40, 30, 20), keys):
+        cache.put(key, SCAN_DATE, data)
+        path = cache._path(key)
+        os.utime(path, (os.path.getmtime(path) - age,) * 2)
+    assert cache.get(keys[0], SCAN_DATE) == data # now the most recently used
+    cache.put(keys[3], SCAN_DATE, data)
+    assert [cache.get(key, SCAN_DATE) is not None for key in keys] == [True, False, True, True]
+    assert sum(os.path.getsize(os.path.join(tmp_path, name)) for name in os.listdir(tmp_path)) <= 1024 * 1024
+
+def test_an_entry_evicted_while_it_is_read_is_still_returned(tmp_path, monkeypatch):
+    cache = copier.FindingsCache(str(tmp_path))
+    cache.put(KEY, SCAN_DATE, [{'issue_id': 1}])
+    def evicted(path, *args):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(copier.os, 'utime', evicted)
+    assert cache.get(KEY, SCAN_DATE) == [{'issue_id': 1}]
+
+def test_a_run_reuses_the_cached_source_until_it_has_a_new_scan(platform, run_copier):
+    source = findings(100, seed=1)
+    platform.add_app('source-guid', 'Source App', static=source)
+    platform.add_app('target-guid', 'Target App', static=unmitigated(source))
+    copy = ['-f', 'source-guid', '-t', 'target-guid', '-st', 'SAST', '--cache_dir', 'cache', '--dry_run']
+
+    def source_reads():
+        return sum(1 for _, path, _ in platform.requests if path == '/appsec/v2/applications/source-guid/findings')
+    run_copier(*copy)
+    assert source_reads() == 1
+    platform.reset()
+    run_copier(*copy)
+    assert source_reads() == 0
+    platform.apps['source-guid']['last_completed_scan_date'] = '2026-02-01T00:00:00.000Z'
+    platform.reset()
+    run_copier(*copy)
+    assert source_reads() == 1
@@ -0,0 +1,71 @@
+from urllib import parse
+
+import pytest
+
+import MitigationCopier as copier
+from fake_platform import KEY_ID, KEY_SECRET
+
+# ApplicationDirectory answers name searches and GUID lookups from memory: from the whole application list when
+# loading it takes fewer calls than searching, or from a snapshot saved by an earlier run
+
+NAMES = ['Target App {}'.format(number) for number in range(12)] + ['Payments', 'Payments Gateway', 'Legacy Payments']
+
+@pytest.fixture
+def api(platform):
+    for number, name in enumerate(NAMES):
+        platform.add_app('guid-{}'.format(number), name)
+    return copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET).api
+
+def application_calls(platform):
+    return [query for method, path, query in platform.requests if path == '/appsec/v1/applications']
+
+@pytest.mark.parametrize('search', ['Target App 1', 'Payments', 'Gateway', 'App', 'Missing'])
+def test_a_loaded_directory_finds_what_the_api_search_finds(api, platform, search):
+    expected = sorted(app['guid'] for app in api.get_applications_by_name(search))
+    api.directory.load_all()
+    platform.reset()
+    assert sorted(app['guid'] for app in api.directory.find_applications(search)) == expected
+    assert platform.requests == []
+
+def test_a_snapshot_answers_the_next_run(api, platform, tmp_path):
+    snapshot = str(tmp_path / 'directory.json')
+    api.directory.load_all()
+    api.directory.save_snapshot(snapshot)
+
+    platform.add_app('guid-new', 'Payments Refunds') # created after the snapshot was taken
+    platform.reset()
+    later = copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET).api
+    later.directory.load_snapshot(snapshot)
+    assert later.directory.get_name('guid-3') == 'Target App 3'
+    assert [app['guid'] for app in later.directory.find_applications('Gateway')] == ['guid-13']
+    assert platform.requests == []
+    assert [app['guid'] for app in later.directory.find_applications('Refunds')] == ['guid-new']
+    assert len(application_calls(platform)) == 1
+
+    expired = copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET).api
+    expired.directory.load_snapshot(snapshot, ttl_hours=0)
+    platform.reset()
+    assert expired.directory.get_name('guid-3') == 'Target App 3'
+    assert len(platform.requests) == 1
+
+def test_the_application_list_is_loaded_only_when_that_takes_fewer_calls(api, platform, monkeypatch):
+    names = NAMES[0:6]
+    api.directory.prefetch(names[0:copier.DIRECTORY_BULK_NAMES - 1])
+    assert platform.requests == [] # too few names to be worth counting the applications
+
+    # 15 applications are one page: a count and one page beat six searches
+    api.directory.prefetch(names)
+    assert [query.get('size') for query in application_calls(platform)] == ['1', str(copier.PAGE_SIZE)]
+    platform.reset()
+    assert copier.get_application_guids_by_name(api, ', '.join(names)) == ['guid-{}'.format(number) for number in range(6)]
+    assert platform.requests == []
+
+    # with pages of 2 applications, 15 take 8 calls: six searches are fewer
+    monkeypatch.setattr(copier, 'PAGE_SIZE', 2)
+    fresh = copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET).api
+    platform.reset()
+    assert copier.get_application_guids_by_name(fresh, ', '.join(names)) == ['guid-{}'.format(number) for number in range(6)]
+    calls = application_calls(platform)
+    assert calls[0] == {'size': '1'}
+    assert all('name' in query for query in calls[1:]) # searches only, no page of the whole list
+    assert {parse.unquote(query['name']) for query in calls[1:]} == set(names)
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from fake_platform import findings, sca_annotations
+
+# --asyncio must write exactly what the synchronous engine writes
+
+pytest.importorskip('aiohttp')
+
+@pytest.fixture
+def tenant(platform):
+    platform.add_app('source-guid', 'Source App', static=findings(400, seed=1), dynamic=findings(80, seed=2, scan_type='DYNAMIC', first_id=10001),
+                     sca_vulnerabilities=sca_annotations(30), sca_licenses=sca_annotations(20, 'LICENSE'),
+                     sandboxes={'source-sandbox': ('dev', findings(200, seed=3))})
+    for number in range(3):
+        platform.add_app('target-{}'.format(number), 'Target App {}'.format(number), static=findings(300, seed=10 + number),
+                         dynamic=findings(60, seed=20 + number, scan_type='DYNAMIC', first_id=10001),
+                         sandboxes={'target-{}-sandbox'.format(number): ('qa', findings(150, seed=30 + number))})
+    return platform
+
+def copy_with_each_engine(run_copier, platform, *argv):
+    written = []
+    for engine in ([], ['--asyncio']):
+        platform.reset()
+        run_copier(*(list(argv) + engine))
+        written.append((platform.flaw_posts(), platform.sca_posts()))
+    assert platform.bad_signatures == 0
+    return written
+
+@pytest.mark.parametrize('argv', [
+    ['-fn', 'Source App', '-tn', 'Target App 0, Target App 1, Target App 2', '-st', 'SAST, DAST, SCA'],
+    ['-fn', 'Source App', '-tn', 'Target App 0, Target App 1', '-tsn', 'qa, qa', '--fuzzy_match', '-fw', '5', '--include_original_user'],
+    ['-f', 'source-guid', '-t', 'target-2', '--propose_only', '--include_proposed', '-st', 'SAST, DAST'],
+    ['-fn', 'Source App', '-tn', 'Target App 1, Target App 2', '-st', 'SAST, SCA', '-sit', 'licenses', '--workers', '4'],
+])
+def test_asyncio_writes_the_same_annotations(run_copier, tenant, argv):
+    (sync_flaws, sync_sca), (async_flaws, async_sca) = copy_with_each_engine(run_copier, tenant, *argv)
+    assert sync_flaws or sync_sca
+    assert async_flaws == sync_flaws
+    assert async_sca == sync_sca
+
+def test_dast_from_a_sandbox_is_copied_from_the_application(run_copier, tenant):
+    # DAST findings have no sandbox, so a "from" sandbox must not change their comments on either engine
+    (sync_flaws, _), (async_flaws, _) = copy_with_each_engine(run_copier, tenant, '-f', 'source-guid', '-fs', 'source-sandbox',
+                                                              '-t', 'target-0', '-st', 'SAST, DAST', '--include_profile_name')
+    dast = {key: history for key, history in sync_flaws.items() if key[2] > 10000}
+    assert dast
+    assert all('sandbox' not in comment for history in dast.values() for _, comment in history)
+    assert async_flaws == sync_flaws
+
+def test_asyncio_records_name_their_copy(run_copier, tenant, tmp_path):
+    # the event loop's tasks write the annotations, so their log lines and audit records must still carry the copy they belong to
+    audit_log = tmp_path / 'audit.jsonl'
+    output = run_copier('-fn', 'Source App', '-tn', 'Target App 0, Target App 1', '-st', 'SAST, SCA', '--workers', '2',
+                        '--verbosity', 'detail', '--audit_log', str(audit_log), '--asyncio')
+    updated = [line for line in output.splitlines() if 'Updated mitigation information' in line]
+    assert updated
+    assert all(line.startswith('[') for line in updated)
+    records = [json.loads(line) for line in audit_log.read_text().splitlines()]
+    assert any(record['event'] == 'applied' for record in records)
+    assert all(record['copy'] for record in records)
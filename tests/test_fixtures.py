@@ -0,0 +1,71 @@
+import gzip
+import json
+
+from fake_platform import findings, unmitigated
+
+# --record_dir saves sanitized responses: no names, file paths, procedures, comments or user names, but pseudonyms
+# consistent enough that --replay_dir of them matches the same flaws
+
+COPY = ['-f', 'source-guid', '-t', 'target-guid', '-st', 'SAST, DAST', '--fuzzy_match']
+KEPT_SEGMENTS = {'', 'teamcity', 'buildagent', 'work', '0123456789abcdef'}
+
+def add_apps(platform):
+    source = findings(120, seed=1) + findings(40, seed=1, scan_type='DYNAMIC', first_id=1000)
+    platform.add_app('source-guid', 'Source App', static=[f for f in source if f['scan_type'] == 'STATIC'],
+                     dynamic=[f for f in source if f['scan_type'] == 'DYNAMIC'])
+    target = unmitigated(source)
+    platform.add_app('target-guid', 'Target App', static=[f for f in target if f['scan_type'] == 'STATIC'],
+                     dynamic=[f for f in target if f['scan_type'] == 'DYNAMIC'])
+    return source
+
+def raw_values(source):
+    # the free text and paths of the source findings, as whole values and path segments
+    values = {'Source App', 'Target App'}
+    for finding in source:
+        details = finding['finding_details']
+        for annotation in finding['annotations']:
+            values.update([annotation['comment'], annotation['user_name']])
+        for field in ('file_path', 'procedure', 'path'):
+            if details.get(field):
+                values.add(details[field])
+                values.update(details[field].split('/'))
+        for segment in details.get('file_path', '').split('/'):
+            values.add(segment.rpartition('.')[0])
+    return values - KEPT_SEGMENTS
+
+def fixture_values(fixture_dir):
+    def strings(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                yield from strings(item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from strings(item)
+        elif isinstance(value, str):
+            yield value
+            yield from value.split('/')
+    values = set()
+    for path in fixture_dir.iterdir():
+        with gzip.open(path, 'rt', encoding='utf8') as f:
+            values.update(strings(json.load(f)['body']))
+    return values
+
+def planned_matches(plan_file):
+    with open(plan_file, encoding='utf8') as f:
+        return sorted((entry['flaw_id'], entry['source_id'], entry['action']) for entry in map(json.loads, f))
+
+def test_recorded_fixtures_hold_no_raw_text_and_replay_the_same_matches(platform, run_copier, tmp_path):
+    source = add_apps(platform)
+    output = run_copier(*COPY, '--record_dir', 'fixtures', '--plan', 'recorded.jsonl')
+    assert '[*] Recorded' in output
+    recorded = fixture_values(tmp_path / 'fixtures')
+    assert recorded
+    assert not recorded & raw_values(source)
+    assert not [value for value in recorded if 'note ' in value or 'App' in value]
+
+    requests = len(platform.requests)
+    run_copier(*COPY, '--replay_dir', 'fixtures', '--plan', 'replayed.jsonl')
+    assert len(platform.requests) == requests # answered by the fixtures alone
+    matches = planned_matches(tmp_path / 'recorded.jsonl')
+    assert matches
+    assert planned_matches(tmp_path / 'replayed.jsonl') == matches
@@ -0,0 +1,20 @@
+import subprocess
+import sys
+
+import MitigationCopier as copier
+
+# the optional and heavy modules are imported when first used, and not registered anywhere before that
+
+def test_importing_the_copier_leaves_lazy_modules_unloaded():
+    check = ('import importlib.util, sys, MitigationCopier as copier\n'
+             'assert not {"aiohttp", "yaml", "yarl"} & set(sys.modules)\n'
+             'assert not [name for name, module in list(sys.modules.items())\n'
+             '            if isinstance(getattr(getattr(module, "__spec__", None), "loader", None), importlib.util.LazyLoader)]\n')
+    subprocess.run([sys.executable, '-c', check], cwd=copier.os.path.dirname(copier.__file__), check=True)
+
+def test_a_lazy_module_is_the_imported_module():
+    assert copier.lazy_import('not_a_module_that_exists') is None
+    json_module = copier.lazy_import('json')
+    import json
+    assert json_module.loads is json.loads
+    assert copier.requests.exceptions.HTTPError is sys.modules['requests'].exceptions.HTTPError
@@ -0,0 +1,54 @@
+import pytest
+
+from fake_platform import findings, unmitigated
+
+# --incremental: a rerun with nothing new posts nothing, a changed target finding is evaluated again, and a change
+# to what would be copied evaluates every target finding again
+
+COPY = ['-f', 'source-guid', '-t', 'target-guid', '-st', 'SAST, DAST', '--incremental', 'state.json']
+NEW_SCAN_DATE = '2026-02-01T00:00:00.000Z'
+
+@pytest.fixture
+def tenant(platform):
+    static, dynamic = findings(200, seed=1), findings(40, seed=2, scan_type='DYNAMIC', first_id=1001)
+    platform.add_app('source-guid', 'Source App', static=static, dynamic=dynamic)
+    platform.add_app('target-guid', 'Target App', static=unmitigated(static), dynamic=unmitigated(dynamic))
+    return platform
+
+def test_a_rerun_with_nothing_new_posts_nothing(run_copier, tenant):
+    run_copier(*COPY)
+    assert tenant.flaw_posts()
+    tenant.reset()
+    output = run_copier(*COPY)
+    assert 'No new static scan in application Target App (guid: target-guid) and no change in "from"' in output
+    assert tenant.posts == []
+
+    # a new target scan that changed nothing is fetched, but none of its findings is evaluated again
+    tenant.apps['target-guid']['last_completed_scan_date'] = NEW_SCAN_DATE
+    run_copier(*COPY)
+    assert tenant.posts == []
+
+def test_a_changed_target_finding_is_evaluated_again(run_copier, tenant):
+    run_copier(*COPY)
+    first = tenant.flaw_posts()
+    # a flaw matched by its file and line, so a new relative location changes its details but not its match
+    target_finding = next(finding for finding in tenant.apps['target-guid']['findings']['STATIC']
+                          if ('target-guid', None, finding['issue_id']) in first and finding['finding_details']['file_path'])
+    target_finding['finding_details'] = dict(target_finding['finding_details'], relative_location=99)
+    changed = target_finding['issue_id']
+    tenant.apps['target-guid']['last_completed_scan_date'] = NEW_SCAN_DATE
+    tenant.reset()
+    run_copier(*COPY)
+    assert list(tenant.flaw_posts()) == [('target-guid', None, changed)]
+    assert tenant.flaw_posts()[('target-guid', None, changed)] == first[('target-guid', None, changed)]
+
+@pytest.mark.parametrize('option', [['--include_original_user'], ['--include_profile_name'], ['--id_list', '1', '2', '3'], ['--skip_id_list', '1']])
+def test_options_that_change_what_is_copied_evaluate_every_finding_again(run_copier, tenant, option):
+    run_copier(*COPY)
+    tenant.reset()
+    run_copier(*COPY, *option)
+    rerun = tenant.flaw_posts()
+    tenant.reset()
+    run_copier(*[arg for arg in COPY if arg not in ('--incremental', 'state.json')], *option)
+    assert rerun
+    assert rerun == tenant.flaw_posts()
@@ -0,0 +1,42 @@
+from fake_platform import findings, unmitigated
+
+# --journal/--resume: a run cut short by a failing platform is finished by a rerun that sends only what is left
+
+COPY = ['-fn', 'Source App', '-tn', 'Target App 0, Target App 1', '-st', 'SAST']
+
+def add_apps(platform):
+    source = findings(150, seed=1)
+    platform.add_app('source-guid', 'Source App', static=source)
+    for number in range(2):
+        platform.add_app('target-{}'.format(number), 'Target App {}'.format(number), static=unmitigated(source))
+
+def test_resume_sends_only_what_was_left(platform, run_copier):
+    add_apps(platform)
+    run_copier(*COPY)
+    expected = platform.flaw_posts()
+    first_target_calls = sum(1 for post in platform.posts if post[1] == 'target-0')
+
+    # the platform starts failing writes a few calls into the second target
+    platform.reset()
+    platform.fail_writes_after = first_target_calls + 3
+    run_copier(*COPY, '--journal', 'copy.journal')
+    interrupted = platform.flaw_posts()
+    assert {key for key in interrupted if key[0] == 'target-0'} == {key for key in expected if key[0] == 'target-0'}
+    assert sum(len(history) for key, history in interrupted.items() if key[0] == 'target-1') < \
+        sum(len(history) for key, history in expected.items() if key[0] == 'target-1')
+
+    platform.reset()
+    platform.fail_writes_after = None
+    output = run_copier(*COPY, '--journal', 'copy.journal', '--resume')
+    assert 'Resuming from journal copy.journal' in output
+    assert 'static mitigations were already copied to application target-0 by a previous run; skipped.' in output
+    resumed = platform.flaw_posts()
+    assert not [key for key in resumed if key[0] == 'target-0']
+    # every annotation went out exactly once over the two runs, each flaw's history in order
+    assert {key: interrupted.get(key, []) + resumed.get(key, []) for key in expected} == expected
+    assert set(interrupted) | set(resumed) == set(expected)
+
+def test_resume_needs_a_journal(platform, run_copier):
+    add_apps(platform)
+    assert '--resume needs --journal.' in run_copier(*COPY, '--resume')
+    assert platform.posts == []
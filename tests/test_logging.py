@@ -0,0 +1,51 @@
+import json
+
+from fake_platform import findings, unmitigated
+
+# logging goes through a queue to a listener thread: CR and LF in names and comments from the platform must
+# still be escaped on the console, in the log file and in --audit_log, and --verbosity picks what the console shows
+
+FORGED = '\r\n[*] Totals: FORGED'
+
+def add_apps(platform):
+    source = findings(60, seed=1, status='APPROVED')
+    for flaw in source:
+        for annotation in flaw['annotations']:
+            annotation['comment'] += FORGED
+    platform.add_app('source-guid', 'Source App', static=source)
+    platform.add_app('target-guid', 'Target App' + FORGED, static=unmitigated(findings(60, seed=1)))
+
+def test_crlf_is_escaped(platform, run_copier, tmp_path):
+    add_apps(platform)
+    output = run_copier('-fn', 'Source App', '-t', 'target-guid', '-st', 'SAST', '--verbosity', 'detail', '--audit_log', 'audit.jsonl')
+    log_text = (tmp_path / 'MitigationCopier.log').read_text(encoding='utf8')
+
+    for text in (output, log_text):
+        assert 'Target App\\r\\n[*] Totals: FORGED' in text
+        assert not any(line.startswith('[*] Totals: FORGED') for line in text.splitlines())
+        assert '\r' not in text
+
+    lines = (tmp_path / 'audit.jsonl').read_text(encoding='utf8').splitlines()
+    events = [json.loads(line) for line in lines]
+    applied = [event for event in events if event['event'] == 'applied']
+    assert applied and all(event['comment'].endswith(FORGED) for event in applied)
+    assert len(platform.flaw_posts()) == len({event['flaw_id'] for event in applied})
+
+def test_verbosity(platform, run_copier, tmp_path):
+    platform.add_app('source-guid', 'Source App', static=findings(60, seed=1))
+    platform.add_app('target-guid', 'Target App', static=unmitigated(findings(60, seed=1)))
+    run = lambda verbosity: run_copier('-f', 'source-guid', '-t', 'target-guid', '-st', 'SAST', '--verbosity', verbosity, '--dry_run')
+
+    quiet = run('quiet')
+    assert 'Getting static findings' not in quiet and '[*] Matched' not in quiet
+    progress = run('progress')
+    assert 'Getting static findings' in progress and '[*] Matched' in progress
+    assert 'has a possible target match' not in progress
+    detail = run('detail')
+    assert 'has a possible target match' in detail
+    assert '[*] Matched' in detail
+
+    # the log file keeps the per-flaw messages whatever the console shows
+    log_text = (tmp_path / 'MitigationCopier.log').read_text(encoding='utf8')
+    assert log_text.count('[*] Matched') == 3
+    assert log_text.count('has a possible target match') == 3 * detail.count('has a possible target match')
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from fake_platform import findings, unmitigated
+
+# --manifest: YAML and CSV manifests run in one process and end with one summary; a bad entry is reported as that
+# entry's failure and the others still run
+
+def add_apps(platform):
+    platform.add_app('source-guid', 'Source App', static=findings(120, seed=1))
+    for number in range(2):
+        platform.add_app('target-{}'.format(number), 'Target App {}'.format(number), static=unmitigated(findings(120, seed=1)))
+
+def summary_counts(output):
+    return {guid: counts for guid, counts in re.findall(r'\[\*\] Summary for application (.+?): (.*)', output)}
+
+def check_run(platform, output):
+    assert 'Manifest entry 2: id_list entry "abc" is not an issue id; skipped.' in output
+    summaries = summary_counts(output)
+    assert summaries['manifest entry 2'] == 'setup FAILED'
+    matched = {guid: int(re.search(r' (\d+)$', summaries[guid]).group(1)) for guid in ('target-0', 'target-1')}
+    assert matched['target-0'] == matched['target-1'] > 0
+    assert '[*] Totals: 3 mappings, 3 targets, 3 copies, {} matched, 1 failed'.format(sum(matched.values())) in output
+
+    posted = platform.flaw_posts()
+    for guid in ('target-0', 'target-1'):
+        assert len({key[2] for key in posted if key[0] == guid}) == matched[guid]
+
+def test_yaml_manifest(platform, run_copier, tmp_path):
+    pytest.importorskip('yaml')
+    add_apps(platform)
+    (tmp_path / 'mappings.yaml').write_text('\n'.join([
+        'mappings:',
+        '  - fromapp: source-guid',
+        '    toapp: target-0',
+        '  - fromapp: source-guid',
+        '    toapp: target-1',
+        '    id_list: [1, abc]',
+        '  - fromappname: Source App',
+        '    toappnames: [Target App 1]',
+        '    id_list: [{}]'.format(', '.join(str(id) for id in range(1, 41))),
+        '']), encoding='utf8')
+    check_run(platform, run_copier('--manifest', 'mappings.yaml', '-st', 'SAST'))
+
+def test_csv_manifest(platform, run_copier, tmp_path):
+    add_apps(platform)
+    (tmp_path / 'mappings.csv').write_text('\n'.join([
+        'fromapp,toapp,fromappname,toappnames,id_list',
+        'source-guid,target-0,,,',
+        'source-guid,target-1,,,"1, abc"',
+        ',,Source App,Target App 1,"{}"'.format(', '.join(str(id) for id in range(1, 41))),
+        '']), encoding='utf8')
+    check_run(platform, run_copier('--manifest', 'mappings.csv', '-st', 'SAST'))
@@ -0,0 +1,72 @@
+import pytest
+
+import MitigationCopier as copier
+from fake_platform import findings, static_finding
+
+# FindingsMatchIndex must return the "from" finding Findings().match would, except that a fuzzy match takes the
+# closest line in the window rather than the first one in source order
+
+Findings = pytest.importorskip('veracode_api_py.findings').Findings
+
+def match_id(match):
+    return None if match is None else match.id
+
+def library_match_id(origin, potential_matches, approved_matches_only, allow_fuzzy_match=False):
+    match = Findings().match(origin, potential_matches, approved_matches_only=approved_matches_only, allow_fuzzy_match=allow_fuzzy_match)
+    return None if match is None else match['id']
+
+@pytest.mark.parametrize('scan_type', ['STATIC', 'DYNAMIC'])
+@pytest.mark.parametrize('approved_matches_only', [True, False])
+def test_matches_are_those_of_findings_match(scan_type, approved_matches_only):
+    # few files, CWEs and lines, so most targets have several candidates and the first one must be chosen
+    source = findings(600, seed=1, scan_type=scan_type, files=6, cwes=3, lines=40)
+    targets = findings(400, seed=2, scan_type=scan_type, files=8, cwes=3, lines=45, first_id=1001)
+    index = copier.FindingsMatchIndex(source, scan_type, approved_matches_only=approved_matches_only)
+    matched = 0
+    for target in targets:
+        expected = library_match_id(target, source, approved_matches_only)
+        assert match_id(index.match(target)) == expected
+        matched += expected is not None
+    assert 0 < matched < len(targets)
+
+@pytest.mark.parametrize('approved_matches_only', [True, False])
+def test_fuzzy_matches_are_the_closest_line_in_the_window(approved_matches_only):
+    source = findings(600, seed=3, files=6, cwes=3, lines=200)
+    targets = findings(400, seed=4, files=8, cwes=3, lines=200, first_id=1001)
+    index = copier.FindingsMatchIndex(source, 'STATIC', approved_matches_only=approved_matches_only)
+    by_id = {finding['issue_id']: finding for finding in source}
+    fuzzy = 0
+    for target in targets:
+        expected = library_match_id(target, source, approved_matches_only, allow_fuzzy_match=True)
+        exact = library_match_id(target, source, approved_matches_only)
+        match = match_id(index.match(target, allow_fuzzy_match=True))
+        assert (match is None) == (expected is None)
+        if expected is None or expected == exact:
+            assert match == expected
+            continue
+        # a fuzzy match: the same kind of candidate, at least as close to the target line
+        fuzzy += 1
+        line = target['finding_details']['file_line_number']
+        distance = abs(by_id[match]['finding_details']['file_line_number'] - line)
+        assert by_id[match]['finding_details']['cwe'] == target['finding_details']['cwe']
+        assert distance <= min(copier.LINE_NUMBER_SLOP, abs(by_id[expected]['finding_details']['file_line_number'] - line))
+    assert fuzzy
+
+def test_fuzzy_ties_go_to_the_closest_line_then_the_lowest_issue_id():
+    target = static_finding(100, 40)
+    assert copier.FindingsMatchIndex([static_finding(9, 38), static_finding(4, 42)], 'STATIC').match(target, allow_fuzzy_match=True).id == 4
+    assert copier.FindingsMatchIndex([static_finding(9, 38), static_finding(12, 41), static_finding(4, 42)], 'STATIC').match(target, allow_fuzzy_match=True).id == 12
+    assert copier.FindingsMatchIndex([static_finding(9, 44)], 'STATIC').match(target, allow_fuzzy_match=True) is None
+    assert copier.FindingsMatchIndex([static_finding(9, 44)], 'STATIC', fuzzy_window=4).match(target, allow_fuzzy_match=True).id == 9
+
+def test_fuzzy_source_files_are_found_within_the_target_path_among_many():
+    # enough source files that the index looks up the target path's substrings instead of testing each file
+    source = [static_finding(number, 10, 'src/F{}.java'.format(number)) for number in range(1, 500)] + [static_finding(900, 11, 'main/F7.java')]
+    index = copier.FindingsMatchIndex(source, 'STATIC')
+    assert index.match(static_finding(1000, 12, 'build/src/main/F7.java'), allow_fuzzy_match=True).id == 900
+    assert index.match(static_finding(1001, 12, 'x/src/F77.java'), allow_fuzzy_match=True).id == 77
+    assert index.match(static_finding(1002, 12, 'x/src/F7.jav'), allow_fuzzy_match=True) is None
+
+def test_fuzzy_check_agrees_with_findings_match():
+    benchmark = pytest.importorskip('benchmark')
+    assert benchmark.check_fuzzy([2000], sample=200, min_speedup=None) == []
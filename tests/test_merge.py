@@ -0,0 +1,71 @@
+import copy
+import json
+
+import MitigationCopier as copier
+from fake_platform import findings, sca_annotations, unmitigated
+
+# several "from" applications merged into one target: each target flaw or SCA issue gets the history of the first
+# listed application that has it, and later ones that hold it differently are reported as conflicts
+
+def sca_issue(component_id, history):
+    return {'component': {'id': component_id}, 'vulnerability': {'cve_name': 'CVE-' + component_id},
+            'history': [{'annotation_action': action, 'comment': comment} for action, comment in reversed(history)]}
+
+def test_merge_sca_findings_takes_the_first_history_and_lists_conflicts():
+    first = [sca_issue('c1', [('FP', 'a'), ('APPROVE', 'b')]), sca_issue('c2', [('FP', 'a')])]
+    second = [sca_issue('c1', [('BYDESIGN', 'x'), ('APPROVE', 'y')]), sca_issue('c2', [('FP', 'a')]), sca_issue('c3', [('FP', 'z')])]
+    third = [sca_issue('c1', [('FP', 'a'), ('APPROVE', 'b')]), sca_issue('c3', [('COMMENT', 'z')])]
+    merged = {sca_finding['component']['id']: (number, sca_finding, conflicts)
+              for number, sca_finding, conflicts in copier.merge_sca_findings([first, second, third], 'vulnerability')}
+    assert merged['c1'] == (0, first[0], [1])
+    assert merged['c2'][0] == 0 and merged['c2'][2] == [] # the same history is no conflict
+    assert merged['c3'][0] == 1 and merged['c3'][2] == [2]
+
+def add_static_tenant(platform):
+    # the secondary source mitigates the same flaws with other comments, and one flaw the primary has left open
+    primary = findings(150, seed=1)
+    secondary = copy.deepcopy(primary)
+    for finding in secondary:
+        for annotation in finding['annotations']:
+            annotation['comment'] = 'secondary ' + annotation['comment']
+    open_flaw = next(finding for finding in primary if finding['finding_status']['resolution_status'] == 'APPROVED')
+    open_flaw['finding_status']['resolution_status'] = 'UNRESOLVED'
+    open_flaw['annotations'] = []
+    platform.add_app('primary-guid', 'Primary Source', static=primary)
+    platform.add_app('secondary-guid', 'Secondary Source', static=secondary)
+    platform.add_app('target-guid', 'Target App', static=unmitigated(primary))
+    return open_flaw['issue_id']
+
+def test_static_findings_take_the_first_listed_history(platform, run_copier, tmp_path):
+    open_flaw = add_static_tenant(platform)
+    output = run_copier('-fn', 'Primary Source, Secondary Source', '-tn', 'Target App', '-st', 'SAST', '--summary_json', 'summary.json')
+
+    posted = platform.flaw_posts()
+    assert posted
+    for (_, _, flaw_id), history in posted.items():
+        source = 'secondary-guid' if flaw_id == open_flaw else 'primary-guid'
+        assert all(comment.startswith('(COPIED FROM APP {}) '.format(source)) for _, comment in history)
+        assert all(('secondary ' in comment) == (flaw_id == open_flaw) for _, comment in history)
+
+    conflicts = len(posted) - 1 # every flaw both sources mitigate, but not the one only the secondary does
+    assert '[*] Matched {} flaws in application Target App (guid: target-guid), {} of them mitigated differently'.format(len(posted), conflicts) in output
+    summary = json.loads((tmp_path / 'summary.json').read_text(encoding='utf8'))
+    assert summary['totals']['conflicts'] == conflicts
+    listed = [conflict for copy_summary in summary['copies'] for conflict in copy_summary['conflicts']]
+    assert {conflict['flaw_id'] for conflict in listed} == {key[2] for key in posted} - {open_flaw}
+    assert all(conflict['from_app_guid'] == 'primary-guid' and [other['from_app_guid'] for other in conflict['overridden']] == ['secondary-guid']
+               for conflict in listed)
+
+def test_sca_issues_take_the_first_listed_history(platform, run_copier):
+    primary, secondary = sca_annotations(10, seed=1), sca_annotations(10, seed=2)
+    platform.add_app('primary-guid', 'Primary Source', sca_vulnerabilities=primary)
+    platform.add_app('secondary-guid', 'Secondary Source', sca_vulnerabilities=secondary)
+    platform.add_app('target-guid', 'Target App')
+    output = run_copier('-fn', 'Primary Source, Secondary Source', '-tn', 'Target App', '-st', 'SCA', '-sit', 'vulnerabilities')
+
+    conflicts = sum(1 for first, second in zip(primary, secondary) if first['history'] != second['history'])
+    assert 0 < conflicts < 10
+    assert '10 matched, 0 already mitigated, 10 applied, 0 failed, {} mitigated differently in lower-precedence'.format(conflicts) in output
+    expected = {(annotation['component']['id'], annotation['vulnerability']['cve_name']): [entry['annotation_action'] for entry in reversed(annotation['history'])]
+                for annotation in primary}
+    assert {key[1:]: [action for action, _ in history] for key, history in platform.sca_posts().items()} == expected
@@ -0,0 +1,50 @@
+import pytest
+
+from fake_platform import findings, sca_annotations
+
+# --plan then --apply must write what a direct run writes, whole or split into --apply_shard shares
+
+@pytest.fixture
+def tenant(platform):
+    platform.add_app('source-guid', 'Source App', static=findings(300, seed=1), dynamic=findings(60, seed=2, scan_type='DYNAMIC', first_id=10001),
+                     sca_vulnerabilities=sca_annotations(20))
+    for number in range(4):
+        platform.add_app('target-{}'.format(number), 'Target App {}'.format(number), static=findings(200, seed=10 + number),
+                         dynamic=findings(40, seed=20 + number, scan_type='DYNAMIC', first_id=10001))
+    return platform
+
+COPY = ['-fn', 'Source App', '-tn', 'Target App 0, Target App 1, Target App 2, Target App 3', '-st', 'SAST, DAST, SCA', '-sit', 'vulnerabilities']
+
+def posts(platform):
+    return platform.flaw_posts(), platform.sca_posts()
+
+def test_an_applied_plan_writes_what_a_direct_run_writes(run_copier, tenant, tmp_path):
+    run_copier(*COPY)
+    direct = posts(tenant)
+    assert direct[0] and direct[1]
+
+    tenant.reset()
+    run_copier(*COPY, '--plan', 'plan.jsonl')
+    assert tenant.posts == []
+    run_copier('--apply', 'plan.jsonl')
+    assert posts(tenant) == direct
+
+    flaws, sca = {}, {}
+    for shard in ('1/3', '2/3', '3/3'):
+        tenant.reset()
+        run_copier('--apply', 'plan.jsonl', '--apply_shard', shard)
+        assert not set(tenant.flaw_posts()) & set(flaws)
+        flaws.update(tenant.flaw_posts())
+        sca.update(tenant.sca_posts())
+    assert (flaws, sca) == direct
+
+def test_plan_and_apply_options_are_checked(run_copier, tenant, tmp_path):
+    run_copier(*COPY, '--plan', 'plan.jsonl')
+    planned = (tmp_path / 'plan.jsonl').read_text()
+    assert planned
+    assert '--plan cannot be combined with --apply' in run_copier('--plan', 'plan.jsonl', '--apply', 'plan.jsonl')
+    assert (tmp_path / 'plan.jsonl').read_text() == planned
+    for shard in ('2', '0/4', '5/4', 'a/b'):
+        assert '--apply_shard needs --apply and a value K/N' in run_copier('--apply', 'plan.jsonl', '--apply_shard', shard)
+    assert '--apply_shard needs --apply' in run_copier(*COPY, '--apply_shard', '1/2')
+    assert tenant.posts == []
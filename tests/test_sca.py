@@ -0,0 +1,51 @@
+import pytest
+
+import MitigationCopier as copier
+from fake_platform import findings, sca_annotations
+
+# SCA annotations belong to the target application: only the part of each history it does not hold yet, approved
+# or proposed, is copied, and once however many of its sandboxes are named
+
+def test_claim_returns_the_part_of_the_history_the_target_lacks():
+    target = copier.TargetScaIndex()
+    target.load(lambda: [{'component': {'id': 'c1'}, 'vulnerability': {'cve_name': 'CVE-1'},
+                          'history': [{'annotation_action': 'COMMENT', 'comment': 'b'}, {'annotation_action': 'FP', 'comment': 'a'}]}], 'vulnerability')
+    assert target.claim(('c1', 'CVE-1'), [('FP', 'a'), ('COMMENT', 'b'), ('APPROVE', 'c')]) == [('APPROVE', 'c')]
+    assert target.claim(('c1', 'CVE-1'), [('FP', 'a'), ('COMMENT', 'b'), ('APPROVE', 'c')]) == [] # now queued
+    assert target.claim(('c2', 'CVE-2'), [('FP', 'a')]) == [('FP', 'a')]
+
+def test_claim_copies_all_of_a_history_the_target_holds_differently():
+    target = copier.TargetScaIndex()
+    target.load(lambda: [{'component': {'id': 'c1'}, 'vulnerability': {'cve_name': 'CVE-1'},
+                          'history': [{'annotation_action': 'COMMENT', 'comment': 'b'}]}], 'vulnerability')
+    assert target.claim(('c1', 'CVE-1'), [('FP', 'a'), ('COMMENT', 'b')]) == [('FP', 'a'), ('COMMENT', 'b')]
+
+@pytest.fixture
+def tenant(platform):
+    platform.add_app('source-guid', 'Source App', sca_vulnerabilities=sca_annotations(12), sca_licenses=sca_annotations(5, 'LICENSE'))
+    platform.add_app('target-guid', 'Target App', static=findings(10), sandboxes={'target-qa': ('qa', []), 'target-dev': ('dev', [])})
+    platform.persist_sca = True
+    return platform
+
+def test_sca_is_copied_once_however_many_sandboxes_are_named(run_copier, tenant):
+    for argv in (['-f', 'source-guid', '-tn', 'Target App, Target App', '-tsn', 'qa, dev', '-st', 'SCA'],
+                 ['-f', 'source-guid', '-tn', 'Target App, Target App', '-tsn', 'qa, dev', '-st', 'SCA', '--asyncio']):
+        tenant.apps['target-guid']['sca'] = {'VULNERABILITY': [], 'LICENSE': []}
+        tenant.reset()
+        output = run_copier(*argv)
+        assert output.count('[*] SCA vulnerability issues in') == 1
+        assert output.count('[*] SCA license issues in') == 1
+        assert len(tenant.sca_posts()) == 17
+        assert all(len(history) == len(set(history)) for history in tenant.sca_posts().values())
+
+def test_sca_counts_and_proposed_annotations_are_read_back(run_copier, tenant):
+    output = run_copier('-f', 'source-guid', '-t', 'target-guid', '-st', 'SCA', '-sit', 'vulnerabilities')
+    assert 'SCA vulnerability issues in application Target App (guid: target-guid): 12 matched, 0 already mitigated, 12 applied, 0 failed' in output
+
+    # the copied annotations are only proposed in the target: they are read back, so nothing is written again
+    target = tenant.apps['target-guid']
+    target['proposed_sca'], target['sca'] = target['sca'], {'VULNERABILITY': [], 'LICENSE': []}
+    tenant.reset()
+    output = run_copier('-f', 'source-guid', '-t', 'target-guid', '-st', 'SCA', '-sit', 'vulnerabilities')
+    assert 'SCA vulnerability issues in application Target App (guid: target-guid): 12 matched, 12 already mitigated, 0 applied, 0 failed' in output
+    assert tenant.posts == []
@@ -0,0 +1,35 @@
+import pytest
+
+from fake_platform import findings, unmitigated
+
+# --stream keeps only the "from" match index, not the findings: it must copy what a run holding them copies
+
+@pytest.fixture
+def tenant(platform):
+    static, dynamic = findings(300, seed=1), findings(60, seed=2, scan_type='DYNAMIC', first_id=1001)
+    platform.add_app('source-guid', 'Source App', static=static, dynamic=dynamic)
+    platform.add_app('target-guid', 'Target App', static=unmitigated(static), dynamic=unmitigated(dynamic))
+    return platform
+
+@pytest.mark.parametrize('argv', [
+    [],
+    ['--include_proposed', '--propose_only'],
+    ['--id_list', '1', '2', '3', '4', '5', '6', '7', '8', '9', '10'],
+    ['--skip_id_list', '1', '2', '3'],
+])
+def test_stream_copies_the_same_annotations(run_copier, tenant, argv):
+    written = []
+    for stream in ([], ['--stream']):
+        tenant.reset()
+        run_copier('-f', 'source-guid', '-t', 'target-guid', '-st', 'SAST, DAST', *argv, *stream)
+        written.append(tenant.flaw_posts())
+    assert written[0]
+    assert written[1] == written[0]
+
+def test_stream_stops_when_no_listed_finding_is_approved(run_copier, tenant):
+    unapproved = [str(finding['issue_id']) for finding in findings(300, seed=1) if finding['finding_status']['resolution_status'] != 'APPROVED']
+    for stream in ([], ['--stream']):
+        tenant.reset()
+        output = run_copier('-f', 'source-guid', '-t', 'target-guid', '-st', 'SAST', '--id_list', *unapproved[0:5], *stream)
+        assert 'No approved static findings in "from" application Source App (guid: source-guid). Exiting.' in output
+        assert tenant.posts == []
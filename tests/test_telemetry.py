@@ -0,0 +1,69 @@
+import re
+
+import MitigationCopier as copier
+from fake_platform import findings, unmitigated
+
+# --metrics_file: Prometheus text format, as read by the node exporter's textfile collector
+
+LABEL = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*"'
+SAMPLE = re.compile(r'^(mitigation_copier_[a-z_]+)(?:\{' + LABEL + r'(?:,' + LABEL + r')*\})? (-?[0-9.]+(?:e[+-]?[0-9]+)?)$')
+
+def parse_metrics(text):
+    # {metric name: (type, [sample lines])}; fails on any line the textfile collector would reject
+    assert text.endswith('\n')
+    metrics = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            name = line.split(' ')[2]
+            assert name not in metrics, 'metric {} appears twice'.format(name)
+            current = name
+            metrics[name] = (None, [])
+        elif line.startswith('# TYPE '):
+            _, _, name, metric_type = line.split(' ')
+            assert name == current and metric_type in ('gauge', 'counter')
+            assert metric_type != 'counter' or name.endswith('_total')
+            metrics[name] = (metric_type, [])
+        else:
+            match = SAMPLE.match(line)
+            assert match, 'not a sample line: {!r}'.format(line)
+            assert match.group(1) == current and metrics[current][0] is not None
+            metrics[current][1].append(line)
+    return metrics
+
+def test_metrics_text_format(tmp_path):
+    telemetry = copier.RunTelemetry()
+    telemetry.start_copy('target-guid', 'SAST "main"\\branch\nnext')
+    telemetry.add_counts(matched=3, applied=2)
+    with telemetry.timer('match'):
+        pass
+    telemetry.record_http('GET', 'appsec/v2/applications/abc/findings', 200, 0.25, 1000)
+    telemetry.record_http('GET', 'appsec/v2/applications/def/findings', 200, 0.5, 500)
+    telemetry.record_http('POST', 'appsec/v2/applications/abc/annotations', 429, 0.1, 0)
+    telemetry.finish_copy(3, 1.5)
+    telemetry.write_metrics(str(tmp_path / 'metrics.prom'))
+
+    text = (tmp_path / 'metrics.prom').read_text(encoding='utf8')
+    metrics = parse_metrics(text)
+    assert set(metrics) == {'mitigation_copier_' + name for name in (
+        'run_start_timestamp_seconds', 'run_duration_seconds', 'phase_seconds', 'flaws', 'conflicts', 'copy_failed',
+        'http_requests_total', 'http_request_seconds_total', 'http_request_max_seconds', 'http_response_bytes_total')}
+    # label values escape backslashes, quotes and newlines
+    assert 'copy="SAST \\"main\\"\\\\branch\\nnext"' in text
+    assert 'mitigation_copier_flaws{to_app_guid="target-guid",copy="SAST \\"main\\"\\\\branch\\nnext",outcome="matched"} 3' in text
+    assert 'mitigation_copier_copy_failed{to_app_guid="target-guid",copy="SAST \\"main\\"\\\\branch\\nnext"} 0' in text
+    # calls to the same endpoint for different applications are one series
+    assert 'mitigation_copier_http_requests_total{method="GET",endpoint="appsec/v2/applications/{guid}/findings",status="200"} 2' in text
+    assert 'mitigation_copier_http_response_bytes_total{method="GET",endpoint="appsec/v2/applications/{guid}/findings",status="200"} 1500' in text
+    assert 'mitigation_copier_http_request_max_seconds{method="GET",endpoint="appsec/v2/applications/{guid}/findings",status="200"} 0.5' in text
+    assert 'mitigation_copier_http_requests_total{method="POST",endpoint="appsec/v2/applications/{guid}/annotations",status="429"} 1' in text
+
+def test_metrics_file_from_a_run(platform, run_copier, tmp_path):
+    platform.add_app('source-guid', 'Source App', static=findings(60, seed=1))
+    platform.add_app('target-guid', 'Target App', static=unmitigated(findings(60, seed=1)))
+    run_copier('-f', 'source-guid', '-t', 'target-guid', '-st', 'SAST', '--metrics_file', 'metrics.prom')
+
+    metrics = parse_metrics((tmp_path / 'metrics.prom').read_text(encoding='utf8'))
+    requests_total = metrics['mitigation_copier_http_requests_total'][1]
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in requests_total) == len(platform.requests)
+    assert any('copy_failed{to_app_guid="target-guid"' in line and line.endswith(' 0') for line in metrics['mitigation_copier_copy_failed'][1])
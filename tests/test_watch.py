@@ -0,0 +1,62 @@
+import json
+import threading
+from urllib import request
+
+import MitigationCopier as copier
+from fake_platform import findings, KEY_ID, KEY_SECRET
+
+# --watch: scans are found by polling only the watched applications, or announced on the webhook
+
+TARGETS = ['target-{}'.format(number) for number in range(6)]
+
+def add_tenant(platform, unwatched=20):
+    platform.add_app('source-guid', 'Source App', static=findings(200, seed=1))
+    for number, guid in enumerate(TARGETS):
+        platform.add_app(guid, 'Target App {}'.format(number), static=findings(150, seed=10 + number))
+    for number in range(unwatched):
+        platform.add_app('other-{}'.format(number), 'Other App {}'.format(number))
+
+def make_watcher(**kwargs):
+    credentials = copier.VeracodeApiCredentials(KEY_ID, KEY_SECRET)
+    mapping = {'fromapp': 'source-guid', 'toapp': ', '.join(TARGETS)}
+    return copier.MitigationWatcher([mapping], {'scan_types': 'SAST'}, credentials, credentials, coalesce=0, **kwargs)
+
+def test_poll_reads_only_the_watched_applications(platform):
+    add_tenant(platform)
+    watcher = make_watcher(workers=3)
+    watcher._build_copies()
+    platform.reset()
+    watcher.poll()
+    paths = [path for method, path, _ in platform.requests]
+    assert '/appsec/v1/applications' not in paths
+    assert sorted(paths) == sorted('/appsec/v1/applications/' + guid for guid in ['source-guid'] + TARGETS)
+
+    platform.apps['target-3']['last_completed_scan_date'] = '2026-02-01T00:00:00.000Z'
+    watcher.poll()
+    assert watcher._events.get_nowait() == 'target-3'
+    assert watcher._events.empty()
+
+def test_a_webhook_notification_copies_into_its_target(platform):
+    add_tenant(platform, unwatched=0)
+    watcher = make_watcher(poll_interval=0, webhook_port=0)
+    passes = []
+    first_pass = threading.Event()
+    def after_pass(results):
+        passes.append(results)
+        first_pass.set()
+    running = threading.Thread(target=watcher.run, kwargs={'max_passes': 2, 'after_pass': after_pass})
+    running.start()
+    assert first_pass.wait(30)
+    assert {key[0] for key in platform.flaw_posts()} == set(TARGETS)
+    platform.reset()
+
+    notification = request.Request('http://127.0.0.1:{}/'.format(watcher._webhook.port), data=json.dumps({'app_guid': 'target-1'}).encode('utf8'),
+                                   headers={'Content-Type': 'application/json'}, method='POST')
+    with request.urlopen(notification) as response:
+        assert response.status == 202
+    running.join(30)
+    assert not running.is_alive()
+    assert len(passes) == 2
+    assert list(passes[1]) == ['target-1']
+    assert all(count for count in passes[1]['target-1'].values())
+    assert {key[0] for key in platform.flaw_posts()} == {'target-1'}
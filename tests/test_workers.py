@@ -0,0 +1,74 @@
+import threading
+
+import MitigationCopier as copier
+from fake_platform import findings, static_finding
+
+# --workers: copies into many targets at once must write what a one-at-a-time run writes, and report each copy
+
+def add_tenant(platform, targets=8):
+    platform.add_app('source-guid', 'Source App', static=findings(300, seed=1), dynamic=findings(60, seed=2, scan_type='DYNAMIC', first_id=10001))
+    for number in range(targets):
+        platform.add_app('target-{}'.format(number), 'Target App {}'.format(number), static=findings(200, seed=10 + number),
+                         dynamic=findings(40, seed=30 + number, scan_type='DYNAMIC', first_id=10001),
+                         sandboxes={'target-{}-qa'.format(number): ('qa', findings(100, seed=50 + number)),
+                                    'target-{}-dev'.format(number): ('dev', findings(100, seed=70 + number))})
+
+def test_workers_write_the_same_annotations(run_copier, platform):
+    add_tenant(platform)
+    targets = ', '.join('Target App {}'.format(number) for number in range(8))
+    written = []
+    for workers in ('1', '6'):
+        platform.reset()
+        output = run_copier('-fn', 'Source App', '-tn', targets, '-st', 'SAST, DAST', '--workers', workers)
+        assert 'FAILED' not in output
+        written.append(platform.flaw_posts())
+    assert written[0]
+    assert written[1] == written[0]
+
+def test_copies_into_two_sandboxes_of_one_application_are_reported_apart(run_copier, platform):
+    add_tenant(platform, targets=1)
+    output = run_copier('-f', 'source-guid', '-tn', 'Target App 0, Target App 0', '-tsn', 'qa, dev', '-st', 'SAST', '--workers', '2')
+    assert 'SAST into sandbox target-0-qa' in output
+    assert 'SAST into sandbox target-0-dev' in output
+    assert {key[1] for key in platform.flaw_posts()} == {'target-0-qa', 'target-0-dev'}
+
+    results = copier.MitigationCopier(workers=2).copy(fromapp='source-guid', toapp='target-0, target-0', tosandbox='target-0-qa, target-0-dev',
+                                                       scan_types='SAST')['results']
+    labels = sorted(results['target-0'])
+    assert labels == ['SAST from source-guid into sandbox target-0-dev', 'SAST from source-guid into sandbox target-0-qa']
+    assert all(count is not None for count in results['target-0'].values())
+
+def test_a_fuzzy_window_of_zero_only_matches_the_same_line(platform):
+    platform.add_app('source-guid', 'Source App', static=[static_finding(1, 40)])
+    platform.add_app('target-guid', 'Target App', static=[static_finding(7, 41, status='UNRESOLVED')])
+    copied = {}
+    for fuzzy_window in (0, 1):
+        platform.reset()
+        copier.MitigationCopier(fuzzy_match=True, fuzzy_window=fuzzy_window).copy(fromapp='source-guid', toapp='target-guid', scan_types='SAST')
+        copied[fuzzy_window] = platform.flaw_posts()
+    assert copied[0] == {}
+    assert list(copied[1]) == [('target-guid', None, 7)]
+
+def test_library_instances_copy_concurrently_with_their_own_telemetry(platform, monkeypatch):
+    add_tenant(platform, targets=2)
+    # each run waits at the barrier until the other has started, so runs that blocked each other would time out
+    barrier = threading.Barrier(2, timeout=10)
+    run_manifest = copier.run_manifest
+    def run_manifest_together(*args, **kwargs):
+        barrier.wait()
+        return run_manifest(*args, **kwargs)
+    monkeypatch.setattr(copier, 'run_manifest', run_manifest_together)
+
+    copied = {}
+    def copy(target):
+        copied[target] = copier.MitigationCopier(workers=2).copy(fromapp='source-guid', toapp=target, scan_types='SAST')
+    threads = [threading.Thread(target=copy, args=(target,)) for target in ('target-0', 'target-1')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for target in ('target-0', 'target-1'):
+        assert list(copied[target]['results'][target].values()) != [None]
+        assert [copy['to_app_guid'] for copy in copied[target]['summary']['copies']] == [target]
+    assert sum(copied[target]['summary']['totals']['api_calls'] for target in copied) == len(platform.requests)